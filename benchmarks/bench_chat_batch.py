@@ -0,0 +1,52 @@
+"""/chat/batch throughput: wall time for N items against the ideal ceil(N / cap) * latency.
+
+Runs the full app in-process (TestClient) against a fake provider, with the response cache
+and coalescing off so every item is a real provider call.
+Usage: PYTHONPATH=src python benchmarks/bench_chat_batch.py [--items N] [--latency S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import time
+
+os.environ.update(
+    PRIMARY="fake:batch-bench",
+    FALLBACKS="[]",
+    RESPONSE_CACHE_TTL="0",
+    SINGLEFLIGHT_ENABLED="false",
+    CHAT_BATCH_MAX_CONCURRENCY="1000",
+)
+os.environ.pop("REDIS_URL", None)
+os.environ.pop("DATABASE_URL", None)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+from providers.fake_provider import FakeProvider  # noqa: E402
+from providers.registry import register_provider  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    register_provider(FakeProvider("fake:batch-bench", latency=args.latency))
+    items = [{"message": f"item {i}"} for i in range(args.items)]
+    print(f"{'cap':>5} {'seconds':>8} {'ideal':>7} {'items/s':>8}")
+    with TestClient(app) as client:
+        for cap in (16, 64, 128, 500):
+            start = time.perf_counter()
+            response = client.post("/api/v1/chat/batch", json={"items": items, "concurrency": cap})
+            elapsed = time.perf_counter() - start
+            done = sum(1 for line in response.text.splitlines() if '"error"' not in line)
+            assert done == args.items, f"{args.items - done} items failed"
+            ideal = math.ceil(args.items / cap) * args.latency
+            print(f"{cap:>5} {elapsed:>8.2f} {ideal:>7.2f} {args.items / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Prompt rendering: `string.Template.safe_substitute` vs the cached compiled template.
+
+Templates grow by repeating a RAG-style block with several variables per block.
+Usage: PYTHONPATH=src python benchmarks/bench_compile.py [--renders N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from string import Template
+
+from oven.compiler import compile_prompt, invalidate_compiled
+from oven.schemas import PromptRecord
+
+BLOCK = (
+    "Context document ${doc} (source: $source, retrieved $date):\n"
+    "Summarise the passages relevant to the question '$question' in $style style. "
+    "Ignore anything that does not concern $topic. Prices are quoted in $$USD.\n"
+)
+
+
+def variables() -> dict[str, str]:
+    return {
+        "doc": "kb-1042",
+        "source": "wiki",
+        "date": "2024-05-01",
+        "question": "How do refunds work?",
+        "style": "concise",
+        "topic": "billing",
+    }
+
+
+def bench(fn, renders: int) -> float:  # type: ignore[no-untyped-def]
+    start = time.perf_counter()
+    for _ in range(renders):
+        fn()
+    return renders / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=20000)
+    args = parser.parse_args()
+
+    values = variables()
+    print(f"{'blocks':>7} {'chars':>8} {'template/s':>12} {'compiled/s':>12} {'speedup':>8}")
+    for blocks in (1, 4, 16, 64, 256):
+        body = BLOCK * blocks
+        record = PromptRecord(name="rag_summary", version=str(blocks), system=body)
+        invalidate_compiled()
+        assert compile_prompt(record, values) == Template(body).safe_substitute(values)
+
+        baseline = bench(lambda b=body: Template(b).safe_substitute(values), args.renders)
+        compiled = bench(lambda r=record: compile_prompt(r, values), args.renders)
+        print(
+            f"{blocks:>7} {len(body):>8} {baseline:>12,.0f} {compiled:>12,.0f} "
+            f"{compiled / baseline:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
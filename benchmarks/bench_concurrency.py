@@ -0,0 +1,71 @@
+"""Outstanding upstream calls per worker: async route vs the sync shim on a threadpool.
+
+Usage: PYTHONPATH=src python benchmarks/bench_concurrency.py [--requests N] [--latency S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("PRIMARY", "fake:slow")
+os.environ.setdefault("FALLBACKS", "[]")
+
+from providers.fake_provider import FakeProvider  # noqa: E402
+from providers.registry import register_provider  # noqa: E402
+from router_engine.router import (  # noqa: E402
+    achoose_provider_and_respond,
+    choose_provider_and_respond,
+)
+
+# Starlette's default threadpool size, which caps sync endpoints
+THREADPOOL_SIZE = 40
+
+
+def run_sync(requests: int) -> float:
+    def call(_: int) -> None:
+        choose_provider_and_respond("ping", context_depth=0, output_format="raw")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        list(pool.map(call, range(requests)))
+    return time.perf_counter() - start
+
+
+async def run_async(requests: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            achoose_provider_and_respond("ping", context_depth=0, output_format="raw")
+            for _ in range(requests)
+        )
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sync-requests", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    register_provider(FakeProvider("fake:slow", latency=args.latency))
+
+    elapsed = run_sync(args.sync_requests)
+    print(
+        f"sync  ({THREADPOOL_SIZE} threads): {args.sync_requests} calls in {elapsed:.2f}s "
+        f"-> {args.sync_requests / elapsed:.0f} req/s"
+    )
+    elapsed = asyncio.run(run_async(args.requests))
+    print(
+        f"async (1 loop)    : {args.requests} calls in {elapsed:.2f}s "
+        f"-> {args.requests / elapsed:.0f} req/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Job API: time to accept a job vs. time to its result, with in-process consumers.
+
+Runs the app in-process on SQLite and fakeredis against a fake provider, so the numbers
+show the queue's own overhead rather than a real network's.
+Usage: PYTHONPATH=src python benchmarks/bench_jobs.py [--jobs N] [--workers W] [--latency S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import fakeredis
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--jobs", type=int, default=200)
+parser.add_argument("--workers", type=int, default=32)
+parser.add_argument("--latency", type=float, default=0.5)
+args = parser.parse_args()
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/jobs.db",
+    REDIS_URL="redis://stand-in",
+    PRIMARY="fake:jobs-bench",
+    FALLBACKS="[]",
+    RESPONSE_CACHE_TTL="0",
+    SINGLEFLIGHT_ENABLED="false",
+    METRICS_FLUSH_INTERVAL="0",
+    JOBS_WORKERS=str(args.workers),
+    JOBS_POLL_INTERVAL="0.05",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+from providers.fake_provider import FakeProvider  # noqa: E402
+from providers.registry import register_provider  # noqa: E402
+from threadcore import jobs  # noqa: E402
+from threadcore.database import get_engine  # noqa: E402
+from threadcore.models import Base  # noqa: E402
+
+
+def main() -> None:
+    server = fakeredis.FakeServer()
+    clients: list[fakeredis.FakeAsyncRedis] = []
+
+    def get_async_redis() -> fakeredis.FakeAsyncRedis:
+        # One client for the app's loop, as core.redis hands out
+        if not clients:
+            clients.append(fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        return clients[0]
+
+    jobs.get_async_redis = get_async_redis
+    register_provider(FakeProvider("fake:jobs-bench", latency=args.latency))
+    Base.metadata.create_all(get_engine())
+
+    with TestClient(app) as client:
+        accepted: list[float] = []
+        ids = []
+        start = time.perf_counter()
+        for i in range(args.jobs):
+            t0 = time.perf_counter()
+            response = client.post("/api/v1/jobs", json={"chat": {"message": f"job {i}"}})
+            accepted.append(time.perf_counter() - t0)
+            ids.append(response.json()["id"])
+        submitted = time.perf_counter() - start
+        for job_id in ids:
+            job = client.get(f"/api/v1/jobs/{job_id}", params={"wait": 60}).json()
+            assert job["status"] == "succeeded", job
+        finished = time.perf_counter() - start
+
+    ideal = -(-args.jobs // args.workers) * args.latency
+    print(
+        f"accept: p50 {statistics.median(accepted) * 1000:.1f} ms, "
+        f"max {max(accepted) * 1000:.1f} ms ({args.jobs} jobs in {submitted:.2f}s)"
+    )
+    print(f"all results: {finished:.2f}s (ideal {ideal:.2f}s with {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
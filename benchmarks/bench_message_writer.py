@@ -0,0 +1,90 @@
+"""Sustained chat-turn persistence: per-row add_message commits vs the write-behind queue.
+
+Runs against a temporary SQLite file by default; pass --database-url for PostgreSQL (the
+tables are created and dropped by the benchmark).
+Usage: PYTHONPATH=src python benchmarks/bench_message_writer.py [--turns N] [--database-url URL]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from core.config import get_settings
+from threadcore.database import db_session, get_engine
+from threadcore.models import Base
+from threadcore.repository import add_message
+from threadcore.writer import MessageWriter, turn_rows
+
+
+def per_row(turns: int) -> float:
+    thread_id = uuid4()
+    start = time.perf_counter()
+    for i in range(turns):
+        for row in turn_rows(thread_id, f"question {i}", f"answer {i}", provider="openai:gpt-4"):
+            # What a naive chat handler would do: one session and flush per message
+            with db_session() as s:
+                add_message(
+                    s,
+                    row["thread_id"],
+                    row["role"],
+                    row["content"],
+                    provider=row["provider"],
+                    token_count=row["token_count"],
+                )
+    return turns * 2 / (time.perf_counter() - start)
+
+
+def write_behind(turns: int, concurrency: int) -> tuple[float, float, dict]:
+    writer = MessageWriter()
+    thread_id = uuid4()
+
+    async def client(worker: int) -> float:
+        slowest = 0.0
+        for i in range(worker, turns, concurrency):
+            t = time.perf_counter()
+            await writer.put(turn_rows(thread_id, f"q {i}", f"a {i}", provider="openai:gpt-4"))
+            slowest = max(slowest, time.perf_counter() - t)
+        return slowest
+
+    async def run() -> float:
+        waits = await asyncio.gather(*(client(w) for w in range(concurrency)))
+        await writer.aclose()
+        return max(waits)
+
+    start = time.perf_counter()
+    slowest = asyncio.run(run())
+    return turns * 2 / (time.perf_counter() - start), slowest, writer.snapshot()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{Path(tmp.name) / 'bench.db'}"
+    get_settings.cache_clear()
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    print(f"per-row inserts : {per_row(args.turns):>10,.0f} messages/s")
+    rate, slowest, stats = write_behind(args.turns, args.concurrency)
+    print(
+        f"write-behind    : {rate:>10,.0f} messages/s "
+        f"(slowest enqueue {slowest * 1000:.1f} ms, {stats['batches']} batches)"
+    )
+    Base.metadata.drop_all(engine)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
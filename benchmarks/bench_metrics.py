@@ -0,0 +1,79 @@
+"""Sentinel overhead: the metric updates one chat request records, and a Redis-less flush.
+
+A request records five stage timings, a provider call, the routed provider, prompt and
+completion tokens and two cache lookups, which is what the chat route, oven and router do.
+Usage: PYTHONPATH=src python benchmarks/bench_metrics.py [--requests N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from sentinel.observer import (
+    CACHE_LOOKUPS,
+    PROVIDER_CALLS,
+    ROUTED_REQUESTS,
+    TOKENS,
+    observe_stage,
+    registry,
+    timed,
+)
+
+PROVIDERS = ("openai:gpt-4", "claude:opus")
+
+
+def one_request(i: int) -> None:
+    provider = PROVIDERS[i & 1]
+    CACHE_LOOKUPS.inc("prompt", "hit")
+    with timed("prompt_lookup"):
+        pass
+    with timed("compile"):
+        pass
+    with timed("budget", provider):
+        pass
+    CACHE_LOOKUPS.inc("response", "miss")
+    PROVIDER_CALLS.inc(provider, "ok")
+    observe_stage("provider_call", 0.8, provider)
+    ROUTED_REQUESTS.inc(provider, "false")
+    TOKENS.inc(provider, "prompt", amount=120)
+    observe_stage("format", 0.00002, provider)
+    TOKENS.inc(provider, "completion", amount=300)
+
+
+def run(requests: int, threads: int) -> float:
+    per_thread = requests // threads
+
+    def work() -> None:
+        for i in range(per_thread):
+            one_request(i)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} {'us/request':>11}")
+    for threads in (1, 4):
+        registry.reset()
+        print(f"{threads:>7} {run(args.requests, threads):>11.2f}")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        text = registry.render(registry.snapshot())
+    render_ms = (time.perf_counter() - start) / 100 * 1000
+    print(f"render: {render_ms:.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""/pipeline wall time for a fan-out/fan-in DAG against its critical path and step sum.
+
+The DAG is one step, `--branches` steps that each use it, and one step that merges them.
+It is run once as a client would chain /chat calls by hand (one round trip per step) and
+once through POST /pipeline, in-process against a fake provider with caching off.
+Usage: PYTHONPATH=src python benchmarks/bench_pipeline.py [--branches N] [--latency S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+os.environ.update(
+    PRIMARY="fake:pipeline-bench",
+    FALLBACKS="[]",
+    RESPONSE_CACHE_TTL="0",
+    SINGLEFLIGHT_ENABLED="false",
+    MAX_TOKENS="100000",
+)
+os.environ.pop("REDIS_URL", None)
+os.environ.pop("DATABASE_URL", None)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+from providers.fake_provider import FakeProvider  # noqa: E402
+from providers.registry import register_provider  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--branches", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    register_provider(FakeProvider("fake:pipeline-bench", latency=args.latency))
+    branches = [f"part_{i}" for i in range(args.branches)]
+    steps = [
+        {"id": "outline", "message": "outline $topic", "format": "raw"},
+        *({"id": b, "message": f"write {b} of $outline", "format": "raw"} for b in branches),
+        {"id": "merged", "message": " ".join(f"${b}" for b in branches), "format": "raw"},
+    ]
+    count = len(steps)
+
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        outline = client.post("/api/v1/chat", json={"message": "outline dags", "format": "raw"})
+        parts = [
+            client.post(
+                "/api/v1/chat",
+                json={"message": f"write {b} of {outline.json()['content']}", "format": "raw"},
+            ).json()["content"]
+            for b in branches
+        ]
+        client.post("/api/v1/chat", json={"message": " ".join(parts), "format": "raw"})
+        chained = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post(
+            "/api/v1/pipeline", json={"steps": steps, "inputs": {"topic": "dags"}}
+        )
+        pipelined = time.perf_counter() - start
+        assert response.json()["status"] == "succeeded", response.text
+
+    print(f"{count} steps, {args.latency:.2f}s per call")
+    print(f"  step sum       {count * args.latency:>6.2f}s")
+    print(f"  critical path  {3 * args.latency:>6.2f}s")
+    print(f"  chained /chat  {chained:>6.2f}s")
+    print(f"  /pipeline      {pipelined:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
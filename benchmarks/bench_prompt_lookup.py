@@ -0,0 +1,61 @@
+"""PromptOven.get lookups/s with and without the in-process prompt cache.
+
+Runs against an in-memory fakeredis by default (which understates real network cost);
+pass --redis-url to measure against a real server.
+Usage: PYTHONPATH=src python benchmarks/bench_prompt_lookup.py [--lookups N] [--redis-url URL]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+from core.config import get_settings
+from oven import cache, manager
+from oven.manager import PromptOven
+from oven.schemas import PromptRecord
+from oven.storage import redis_store
+
+
+def run(lookups: int, cache_size: int) -> float:
+    os.environ["PROMPT_CACHE_SIZE"] = str(cache_size)
+    get_settings.cache_clear()
+    cache.prompt_cache.invalidate()
+    manager._SEEDED = True  # the store is seeded by the benchmark itself
+    oven = PromptOven()
+    start = time.perf_counter()
+    for i in range(lookups):
+        oven.get("rag_summary", "latest" if i % 2 else None)
+    return lookups / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url or "redis://fake"
+    if args.redis_url is None:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        redis_store._client = lambda: fakeredis.FakeRedis(  # type: ignore[assignment]
+            server=server, decode_responses=True
+        )
+    get_settings.cache_clear()
+    for version in ("v1", "v2", "v3"):
+        redis_store.set_prompt(
+            "rag_summary",
+            PromptRecord(name="rag_summary", system="Summarize: $audience", version=version),
+        )
+
+    before = run(args.lookups, cache_size=0)
+    after = run(args.lookups, cache_size=1024)
+    print(f"redis on every lookup : {before:12,.0f} lookups/s")
+    print(f"in-process prompt LRU : {after:12,.0f} lookups/s ({after / before:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Persisting a prompt catalogue: per-row upserts vs the set-based bulk upsert.
+
+Runs against a temporary SQLite file by default; pass --database-url to measure a real
+PostgreSQL (15+, the tables are created and dropped by the benchmark).
+Usage: PYTHONPATH=src python benchmarks/bench_prompt_reload.py [--prompts N] [--database-url URL]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from oven.schemas import PromptRecord
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from threadcore.models import Base
+from threadcore.repository import bulk_upsert_prompts, upsert_prompt_version
+
+
+def catalogue(n: int, revision: int = 0, changed_every: int = 0) -> dict[str, PromptRecord]:
+    prompts = {}
+    for i in range(n):
+        rev = revision if changed_every and i % changed_every == 0 else 0
+        prompts[f"prompt_{i:05d}"] = PromptRecord(
+            name=f"prompt_{i:05d}",
+            version="v1",
+            system=f"You are assistant {i} (rev {rev}). Answer about $topic in $style.",
+            description=f"Catalogue entry {i}",
+        )
+    return prompts
+
+
+def per_row(session: Session, prompts: dict[str, PromptRecord]) -> str:
+    for name, rec in prompts.items():
+        upsert_prompt_version(session, name, rec.version, rec.system, rec.description, rec.template)
+    return f"{len(prompts)} rows"
+
+
+def bulk(session: Session, prompts: dict[str, PromptRecord]) -> str:
+    c = bulk_upsert_prompts(session, prompts)
+    return f"+{c.inserted} ~{c.updated} ={c.unchanged}"
+
+
+def timed(engine: Engine, fn: Callable[..., str], prompts: dict[str, PromptRecord]) -> str:
+    start = time.perf_counter()
+    with Session(engine) as session:
+        detail = fn(session, prompts)
+        session.commit()
+    return f"{time.perf_counter() - start:>8.3f}s  {detail}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=10_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    url = args.database_url or f"sqlite:///{Path(tmp.name) / 'bench.db'}"
+    engine = create_engine(url)
+    scenarios = [
+        ("cold load", catalogue(args.prompts)),
+        ("unchanged reload", catalogue(args.prompts)),
+        ("10% changed", catalogue(args.prompts, revision=1, changed_every=10)),
+    ]
+    for label, fn in (("per-row upsert", per_row), ("bulk upsert", bulk)):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        print(f"{label} ({args.prompts} prompts)")
+        for scenario, prompts in scenarios:
+            print(f"  {scenario:<17} {timed(engine, fn, prompts)}")
+    Base.metadata.drop_all(engine)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Rate-limit admission cost: latency per admit and Redis round trips per request.
+
+Runs the client + two-provider admission against in-process buckets and against
+fakeredis (the Lua script runs for real, the network does not). Half the clients are over
+their limit, so the in-process denial cache shows up in the round-trip count.
+Usage: PYTHONPATH=src python benchmarks/bench_rate_limit.py [--requests N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+import fakeredis
+from core.config import get_settings
+from router_engine import rate_limit
+from router_engine.rate_limit import RateLimited, rate_limiter
+
+PROVIDERS = ("openai:gpt-4", "claude:opus")
+
+
+async def run(requests: int) -> tuple[float, float, int]:
+    rate_limiter.reset()
+    denied = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        # Even clients stay well under their limit, odd ones run out after a few requests
+        client = f"tenant-{i % 20}"
+        try:
+            await rate_limiter.admit(client, PROVIDERS, 600)
+        except RateLimited:
+            denied += 1
+    elapsed = time.perf_counter() - start
+    return elapsed / requests * 1e6, rate_limiter.round_trips / requests, denied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    limits = {f"tenant-{i}": {"rpm": 5} for i in range(1, 20, 2)}
+    os.environ.update(
+        RATE_LIMIT_ENABLED="true",
+        CLIENT_RATE_LIMIT='{"rpm": 1000000, "tpm": 1000000000}',
+        CLIENT_RATE_LIMITS=str(limits).replace("'", '"'),
+        PROVIDER_RATE_LIMITS='{"openai:gpt-4": {"tpm": 1000000000}}',
+    )
+    server = fakeredis.FakeServer()
+    rate_limit.get_async_redis = lambda: fakeredis.FakeAsyncRedis(server=server)
+
+    print(f"{'buckets':>8} {'us/admit':>9} {'trips/req':>10} {'denied':>7}")
+    for mode in ("local", "redis"):
+        if mode == "redis":
+            os.environ["REDIS_URL"] = "redis://stand-in"
+        else:
+            os.environ.pop("REDIS_URL", None)
+        get_settings.cache_clear()
+        us, trips, denied = asyncio.run(run(args.requests))
+        print(f"{mode:>8} {us:>9.1f} {trips:>10.2f} {denied:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Interactive latency under overload, with and without the admission scheduler.
+
+The simulated upstream serves `capacity` calls at full speed; beyond that every call slows
+down in proportion to the excess, like a saturated provider. A burst of batch requests
+arrives first, then a steady trickle of interactive ones.
+Usage: PYTHONPATH=src python benchmarks/bench_scheduler.py [--batch N] [--interactive N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+from core.config import get_settings
+from providers.base import Provider
+from providers.registry import register_provider
+from router_engine.router import achoose_provider_and_respond
+from router_engine.scheduler import Overloaded, scheduler
+
+NAME = "sim:saturating"
+
+
+class SaturatingProvider(Provider):
+    def __init__(self, capacity: int, service: float) -> None:
+        self.name = NAME
+        self.capacity = capacity
+        self.service = service
+        self.inflight = 0
+
+    def generate(self, prompt: str, **_: object) -> tuple[str, str]:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, **_: object) -> tuple[str, str]:
+        self.inflight += 1
+        try:
+            await asyncio.sleep(self.service * max(1.0, self.inflight / self.capacity))
+        finally:
+            self.inflight -= 1
+        return prompt, self.name
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+async def run(batch: int, interactive: int, gap: float) -> dict[str, list[float] | int]:
+    latencies: dict[str, list[float] | int] = {"interactive": [], "batch": [], "rejected": 0}
+
+    async def one(priority: str) -> None:
+        started = time.perf_counter()
+        try:
+            await achoose_provider_and_respond(
+                "hi", context_depth=0, output_format="raw", priority=priority
+            )
+        except Overloaded:
+            latencies["rejected"] += 1  # type: ignore[operator]
+            return
+        latencies[priority].append(time.perf_counter() - started)  # type: ignore[union-attr]
+
+    tasks = [asyncio.create_task(one("batch")) for _ in range(batch)]
+    for _ in range(interactive):
+        await asyncio.sleep(gap)
+        tasks.append(asyncio.create_task(one("interactive")))
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=400)
+    parser.add_argument("--interactive", type=int, default=100)
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--service-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    register_provider(SaturatingProvider(args.capacity, args.service_ms / 1000))
+    os.environ.update(
+        PRIMARY=NAME,
+        FALLBACKS="[]",
+        PROVIDER_CONCURRENCY=f'{{"{NAME}": {args.capacity}}}',
+        SCHEDULER_QUEUE_TIMEOUT='{"interactive": 5, "batch": 600}',
+    )
+    os.environ.pop("REDIS_URL", None)
+
+    print(f"{'scheduler':>9} {'inter p50':>10} {'inter p95':>10} {'batch p95':>10} {'rejected':>8}")
+    for enabled in ("false", "true"):
+        os.environ["SCHEDULER_ENABLED"] = enabled
+        get_settings.cache_clear()
+        scheduler.reset()
+        result = asyncio.run(run(args.batch, args.interactive, args.service_ms / 1000 / 4))
+        inter, batch = result["interactive"], result["batch"]
+        print(
+            f"{enabled:>9} {percentile(inter, 0.5) * 1000:>8.0f}ms "  # type: ignore[arg-type]
+            f"{percentile(inter, 0.95) * 1000:>8.0f}ms "  # type: ignore[arg-type]
+            f"{percentile(batch, 0.95) * 1000:>8.0f}ms {result['rejected']:>8}"  # type: ignore[arg-type]
+        )
+
+
+if __name__ == "__main__":
+    main()
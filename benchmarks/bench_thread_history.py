@@ -0,0 +1,81 @@
+"""Context fetch cost vs thread length: full ORM load vs the keyset history window.
+
+Runs against a temporary SQLite file by default; pass --database-url for PostgreSQL (the
+tables are created and dropped by the benchmark).
+Usage: PYTHONPATH=src python benchmarks/bench_thread_history.py [--window N] [--database-url URL]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from threadcore.models import Base
+from threadcore.repository import get_recent_messages, get_thread_messages, insert_messages
+
+
+def seed(engine: Any, n: int) -> UUID:
+    thread_id = uuid4()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "id": uuid4(),
+            "thread_id": thread_id,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i} " * 20,
+            "token_count": 60,
+            "created_at": start + timedelta(milliseconds=i),
+        }
+        for i in range(n)
+    ]
+    with Session(engine) as s:
+        insert_messages(s, rows)
+        s.commit()
+    return thread_id
+
+
+def timed(engine: Any, fn: Callable[[Session], list[Any]], repeat: int) -> float:
+    with Session(engine) as s:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(s)
+            s.expunge_all()
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    engine = create_engine(args.database_url or f"sqlite:///{Path(tmp.name) / 'bench.db'}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    print(f"{'messages':>9} {'full load ms':>13} {'window ms':>10}")
+    for n in (10, 1_000, 10_000):
+        thread_id = seed(engine, n)
+        full = timed(engine, lambda s, t=thread_id: get_thread_messages(s, t), args.repeat)
+        window = timed(
+            engine,
+            lambda s, t=thread_id: get_recent_messages(s, t, limit=args.window),
+            args.repeat,
+        )
+        print(f"{n:>9} {full:>13.2f} {window:>10.2f}")
+    Base.metadata.drop_all(engine)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Per-request cost of the token budget pass.
+
+Usage: PYTHONPATH=src python benchmarks/bench_token_budget.py [--iterations N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from router_engine.passes.token_budget import (
+    _encoder,
+    count_tokens,
+    ensure_within_budget,
+    warm_encoders,
+)
+
+SYSTEM = "You are a helpful support agent for ACME. Keep answers concise and actionable. " * 20
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant", "content": "Some earlier message text " * 8}
+    for i in range(20)
+]
+
+
+def bench(label: str, fn: object, iterations: int) -> None:
+    assert callable(fn)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations
+    print(f"{label:<40} {per_call * 1e6:8.1f} us/call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(warm_encoders())
+
+    for provider in ("openai:gpt-4", "claude:opus"):
+        backend = "tiktoken" if _encoder(provider) is not None else "approximate"
+        print(f"[{provider}] tokenizer: {backend}")
+        bench(
+            "count_tokens(user prompt)",
+            lambda p=provider: count_tokens("How do I reset my password?", provider=p),
+            args.iterations,
+        )
+        bench(
+            "count_tokens(system, uncached)",
+            lambda p=provider: count_tokens(SYSTEM, provider=p),
+            args.iterations // 10,
+        )
+        bench(
+            "ensure_within_budget(system cached)",
+            lambda p=provider: ensure_within_budget(
+                "How do I reset my password?", context_depth=0, system=SYSTEM, provider=p
+            ),
+            args.iterations,
+        )
+        bench(
+            "ensure_within_budget(+20 turns)",
+            lambda p=provider: ensure_within_budget(
+                "How do I reset my password?",
+                context_depth=20,
+                system=SYSTEM,
+                history=HISTORY,
+                provider=p,
+            ),
+            args.iterations // 10,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+-- Bulk prompt upserts: unique (name, version) for ON CONFLICT and a content hash to skip
+-- no-op writes. NULLS NOT DISTINCT needs PostgreSQL 15+.
+BEGIN;
+
+ALTER TABLE prompt_versions ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+-- Earlier per-row upserts could race into duplicates; keep the newest row of each pair
+DELETE FROM prompt_versions p
+USING prompt_versions q
+WHERE p.name = q.name
+  AND p.version IS NOT DISTINCT FROM q.version
+  AND (p.created_at, p.id) < (q.created_at, q.id);
+
+ALTER TABLE prompt_versions
+  ADD CONSTRAINT uq_prompt_versions_name_version UNIQUE NULLS NOT DISTINCT (name, version);
+
+COMMIT;
@@ -0,0 +1,5 @@
+-- Composite index for keyset-paginated thread history: newest-N messages of a thread
+-- are read straight from the index in (created_at, id) order. CONCURRENTLY cannot run in
+-- a transaction block, so run this file on its own (e.g. psql -f).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_thread_created_id
+  ON messages (thread_id, created_at, id);
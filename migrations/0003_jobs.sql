@@ -0,0 +1,21 @@
+-- Durable job records for POST /api/v1/jobs. The queue itself is a Redis stream; this
+-- table holds each job's request, status and result.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id UUID PRIMARY KEY,
+  kind VARCHAR(32) NOT NULL,
+  status VARCHAR(16) NOT NULL,
+  client VARCHAR(160),
+  payload TEXT NOT NULL,
+  result TEXT,
+  error TEXT,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status);
+
+COMMIT;
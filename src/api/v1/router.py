@@ -1,9 +1,17 @@
 from api.v1.routes.chat import router as chat_router
 from api.v1.routes.config import router as config_router
+from api.v1.routes.jobs import router as jobs_router
+from api.v1.routes.pipeline import router as pipeline_router
 from api.v1.routes.prompts import router as prompts_router
+from api.v1.routes.status import router as status_router
+from api.v1.routes.threads import router as threads_router
 from fastapi import APIRouter
 
 api_router = APIRouter()
 api_router.include_router(config_router, prefix="/config", tags=["config"])
 api_router.include_router(chat_router, prefix="/chat", tags=["chat"])
 api_router.include_router(prompts_router, prefix="/prompts", tags=["prompts"])
+api_router.include_router(status_router, prefix="/status", tags=["status"])
+api_router.include_router(threads_router, prefix="/threads", tags=["threads"])
+api_router.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(pipeline_router, prefix="/pipeline", tags=["pipeline"])
@@ -1,11 +1,37 @@
-from fastapi import APIRouter
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, Literal
+from uuid import UUID
+
+from backend.formatter import format_output_stream
+from core.config import get_settings
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from memorylane.context_injector import ThreadContext, arefresh_summary, build_context
 from oven.compiler import compile_prompt
 from oven.manager import PromptOven
-from pydantic import BaseModel
-from router_engine.router import choose_provider_and_respond
+from oven.schemas import PromptRecord
+from providers.base import History
+from pydantic import BaseModel, Field
+from router_engine.passes.token_budget import TokenBudgetExceeded, count_tokens
+from router_engine.rate_limit import RateLimited, is_trusted_proxy
+from router_engine.response_cache import CachedResponse, cache_key, response_cache
+from router_engine.router import achoose_provider_and_respond, astream_provider_and_respond
+from router_engine.scheduler import Overloaded, resolve_priority
+from router_engine.singleflight import SingleFlight, SingleFlightTimeout
+from sentinel.observer import CACHE_LOOKUPS, COALESCED, TOKENS, observe_stage, timed
+from threadcore.writer import message_writer, turn_rows
 
 router = APIRouter()
 
+# Coalesces concurrent identical chats in this worker (and across workers when distributed)
+flights = SingleFlight()
+
 
 class ChatRequest(BaseModel):
     message: str
@@ -14,6 +40,11 @@ class ChatRequest(BaseModel):
     prompt_name: str | None = None
     prompt_vars: dict[str, str] | None = None
     prompt_version: str | None = None
+    stream: bool = False
+    # Persist the turn to this thread (write-behind, after the response is sent)
+    thread_id: UUID | None = None
+    # Scheduling class when providers are saturated; defaults to the client's configured one
+    priority: Literal["interactive", "batch"] | None = None
 
 
 class ChatResponse(BaseModel):
@@ -21,19 +52,454 @@ class ChatResponse(BaseModel):
     provider: str
 
 
-@router.post("", response_model=ChatResponse)
-def chat(body: ChatRequest) -> ChatResponse:
-    system_prompt: str | None = None
-    if body.prompt_name:
-        oven = PromptOven()
-        record = oven.get(body.prompt_name, body.prompt_version)
-        if record:
-            system_prompt = compile_prompt(record, body.prompt_vars or {})
-
-    content, provider = choose_provider_and_respond(
-        prompt=body.message,
-        context_depth=body.context_depth or 0,
-        output_format=body.format or "markdown",
+class ChatBatchRequest(BaseModel):
+    # Items are answered like non-streaming chats; `stream` on an item is ignored
+    items: list[ChatRequest] = Field(min_length=1)
+    concurrency: int | None = Field(default=None, ge=1)
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@dataclass
+class _StreamedTurn:
+    parts: list[str] = field(default_factory=list)
+    complete: bool = False
+
+
+async def _sse_events(
+    deltas: AsyncIterator[str], provider: str, turn: _StreamedTurn | None = None
+) -> AsyncIterator[str]:
+    yield _sse("start", {"provider": provider})
+    # Formatters pass deltas through, so the per-chunk work is the SSE framing
+    framing = 0.0
+    try:
+        async for chunk in deltas:
+            if turn is not None:
+                turn.parts.append(chunk)
+            started = time.perf_counter()
+            event = _sse("delta", {"content": chunk})
+            framing += time.perf_counter() - started
+            yield event
+    except Exception as exc:  # noqa: BLE001
+        # Headers are already sent; report mid-stream failures in-band
+        yield _sse("error", {"detail": str(exc)})
+        return
+    finally:
+        observe_stage("format", framing, provider)
+    if turn is not None:
+        turn.complete = True
+    yield _sse("done", {})
+
+
+async def _persist_turn(
+    body: ChatRequest, record: PromptRecord | None, content: str | _StreamedTurn, provider: str
+) -> None:
+    if body.thread_id is None:
+        return
+    if isinstance(content, _StreamedTurn):
+        if not content.complete:
+            return
+        content = "".join(content.parts)
+    await message_writer.put(
+        turn_rows(
+            body.thread_id,
+            body.message,
+            content,
+            provider=provider,
+            prompt_name=record.name if record else body.prompt_name,
+            prompt_version=record.version if record else body.prompt_version,
+        )
+    )
+
+
+async def _thread_context(body: ChatRequest) -> ThreadContext | None:
+    depth = body.context_depth or 0
+    if body.thread_id is None or depth <= 0 or not get_settings().database_url:
+        return None
+    try:
+        return await build_context(body.thread_id, context_depth=depth)
+    except Exception:  # noqa: BLE001
+        return None  # history is best effort; answer without it rather than fail the turn
+
+
+def _observe_completion(content: str | _StreamedTurn, provider: str) -> None:
+    if isinstance(content, _StreamedTurn):
+        content = "".join(content.parts)
+    TOKENS.inc(provider, "completion", amount=count_tokens(content, provider=provider))
+
+
+def _client_id(request: Request) -> str:
+    """Rate-limit identity: the client header when a trusted proxy set it, else the IP.
+
+    Callers could otherwise pick their own bucket (or claim another client's limits)
+    just by sending the header. Behind a proxy, run uvicorn with `--forwarded-allow-ips`
+    so the address is the caller's rather than the proxy's.
+    """
+    host = request.client.host if request.client else None
+    client = request.headers.get(get_settings().rate_limit_client_header)
+    if client and is_trusted_proxy(host):
+        return client[:128]
+    return f"ip:{host}" if host else "anonymous"
+
+
+def _cache_directives(cache_control: str | None) -> set[str]:
+    if not cache_control:
+        return set()
+    return {part.strip().lower() for part in cache_control.split(",")}
+
+
+async def _resolve_prompt(body: ChatRequest) -> tuple[PromptRecord | None, str | None]:
+    if not body.prompt_name:
+        return None, None
+    # Hot prompts are an in-process dict hit; misses read Redis asynchronously and only
+    # the Postgres/file fallbacks run in a thread
+    with timed("prompt_lookup"):
+        record = await PromptOven().aget(body.prompt_name, body.prompt_version)
+    if record is None:
+        return None, None
+    with timed("compile"):
+        return record, compile_prompt(record, body.prompt_vars or {})
+
+
+@dataclass
+class _Plan:
+    """Everything a chat needs before calling the router, shared by /chat and /chat/batch."""
+
+    system: str | None
+    history: History | None
+    output_format: str
+    key: str
+    coalesce: bool
+
+    def flight_key(self, *, client: str, priority: str) -> str:
+        """Single-flight key: requests only coalesce with the same client and priority.
+
+        Waiters share the leader's scheduler ticket, so an interactive request must never
+        wait out a batch leader's queue timeout. They also share its rate-limit admission
+        and errors, so one client's 429 must not reach another client, and a throttled
+        client must not be answered on another client's quota.
+        """
+        scope = hashlib.sha256(client.encode()).hexdigest()[:16]
+        return f"{self.key}:{scope}:{priority}"
+
+
+async def _plan(
+    body: ChatRequest,
+    system_prompt: str | None,
+    directives: set[str],
+    background: BackgroundTasks,
+) -> _Plan:
+    settings = get_settings()
+    context = await _thread_context(body)
+    history = context.history if context else None
+    if context is not None:
+        system_prompt = context.system(system_prompt)
+        if context.needs_refresh and body.thread_id is not None:
+            # Summarizing runs after the response, so it never adds latency to this turn
+            background.add_task(
+                arefresh_summary, body.thread_id, context_depth=body.context_depth or 0
+            )
+    output_format = body.format or "markdown"
+    # Canonical request key shared by the response cache and single-flight coalescing
+    key = cache_key(
+        message=body.message,
         system=system_prompt,
+        route=[settings.primary, *settings.fallbacks],
+        output_format=output_format,
+        context_depth=body.context_depth or 0,
+        history=history,
+    )
+    # Clients asking for a fresh answer are neither served from cache nor coalesced
+    coalesce = settings.singleflight_enabled and not directives & {"no-cache", "no-store"}
+    return _Plan(system_prompt, history, output_format, key, coalesce)
+
+
+async def _answer(
+    body: ChatRequest,
+    record: PromptRecord | None,
+    plan: _Plan,
+    *,
+    client: str,
+    priority: str,
+    directives: set[str],
+    background: BackgroundTasks,
+) -> tuple[ChatResponse, dict[str, str]]:
+    """Answer a non-streaming chat; returns the response and its cache/coalescing headers."""
+    headers: dict[str, str] = {}
+    # Exact-match response cache; `Cache-Control: no-cache` skips the lookup but still
+    # stores the fresh answer, `no-store` bypasses the cache entirely.
+    ttl = response_cache.ttl_for(record)
+    use_cache = ttl > 0 and "no-store" not in directives
+    if use_cache and "no-cache" not in directives:
+        hit = await response_cache.get(plan.key)
+        CACHE_LOOKUPS.inc("response", "miss" if hit is None else "hit")
+        if hit is not None:
+            cached, tier = hit
+            headers.update({"X-Cache": "HIT", "X-Cache-Tier": tier})
+            background.add_task(_persist_turn, body, record, cached.content, cached.provider)
+            return ChatResponse(content=cached.content, provider=cached.provider), headers
+
+    async def generate() -> tuple[str, str]:
+        return await achoose_provider_and_respond(
+            prompt=body.message,
+            context_depth=body.context_depth or 0,
+            output_format=plan.output_format,
+            system=plan.system,
+            history=plan.history,
+            client=client,
+            priority=priority,
+        )
+
+    shared = False
+    try:
+        if plan.coalesce:
+            (content, provider), shared = await flights.do(
+                plan.flight_key(client=client, priority=priority), generate, decode=tuple
+            )
+            headers["X-Coalesced"] = "true" if shared else "false"
+            if shared:
+                COALESCED.inc("generate")
+        else:
+            content, provider = await generate()
+    except SingleFlightTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
+    if use_cache:
+        if not shared:
+            await response_cache.set(
+                plan.key, CachedResponse(content=content, provider=provider), ttl
+            )
+        headers["X-Cache"] = "MISS"
+    elif ttl > 0:
+        headers["X-Cache"] = "BYPASS"
+        CACHE_LOOKUPS.inc("response", "bypass")
+    background.add_task(_persist_turn, body, record, content, provider)
+    if not shared:
+        background.add_task(_observe_completion, content, provider)
+    return ChatResponse(content=content, provider=provider), headers
+
+
+@router.post("", response_model=ChatResponse)
+async def chat(
+    body: ChatRequest,
+    request: Request,
+    response: Response,
+    background: BackgroundTasks,
+    cache_control: str | None = Header(default=None),
+) -> ChatResponse | StreamingResponse:
+    record, system_prompt = await _resolve_prompt(body)
+    directives = _cache_directives(cache_control)
+    plan = await _plan(body, system_prompt, directives, background)
+    client = _client_id(request)
+    priority = resolve_priority(body.priority, client)
+
+    if body.stream:
+
+        async def start() -> tuple[AsyncIterator[str], str]:
+            return await astream_provider_and_respond(
+                prompt=body.message,
+                context_depth=body.context_depth or 0,
+                output_format=plan.output_format,
+                system=plan.system,
+                history=plan.history,
+                client=client,
+                priority=priority,
+            )
+
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        shared = False
+        try:
+            if plan.coalesce:
+                deltas, provider, shared = await flights.do_stream(
+                    plan.flight_key(client=client, priority=priority), start
+                )
+                headers["X-Coalesced"] = "true" if shared else "false"
+                if shared:
+                    COALESCED.inc("stream")
+            else:
+                deltas, provider = await start()
+        except SingleFlightTimeout as exc:
+            raise HTTPException(status_code=504, detail=str(exc)) from exc
+        turn = _StreamedTurn()
+        # Background tasks run once the stream has been fully sent
+        background.add_task(_persist_turn, body, record, turn, provider)
+        if not shared:
+            background.add_task(_observe_completion, turn, provider)
+        return StreamingResponse(
+            _sse_events(
+                format_output_stream(deltas, output_format=plan.output_format), provider, turn
+            ),
+            media_type="text/event-stream",
+            headers=headers,
+        )
+
+    answer, headers = await _answer(
+        body,
+        record,
+        plan,
+        client=client,
+        priority=priority,
+        directives=directives,
+        background=background,
+    )
+    response.headers.update(headers)
+    return answer
+
+
+def _item_error(exc: Exception) -> dict[str, Any]:
+    """A failed batch item, shaped like the error response /chat would have returned."""
+    if isinstance(exc, HTTPException):
+        return {"status": exc.status_code, "detail": exc.detail}
+    if isinstance(exc, RateLimited):
+        return {"status": 429, "detail": str(exc), "retry_after": exc.retry_after}
+    if isinstance(exc, Overloaded):
+        return {"status": 503, "detail": str(exc), "retry_after": exc.retry_after}
+    if isinstance(exc, TokenBudgetExceeded):
+        return {"status": 413, "detail": str(exc)}
+    return {"status": 500, "detail": str(exc)}
+
+
+async def _fan_out(
+    items: Sequence[ChatRequest],
+    run: Callable[[int, ChatRequest], Awaitable[dict[str, Any]]],
+    concurrency: int,
+) -> AsyncIterator[dict[str, Any]]:
+    """Run items on `concurrency` workers and yield each item's result as it finishes.
+
+    Workers pull from a shared iterator, so at most `concurrency` items are in flight and
+    no task exists for items not yet started. Closing the iterator cancels the workers.
+    """
+    pending = iter(enumerate(items))
+    results: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, item in pending:
+            await results.put(await run(index, item))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def _ndjson(lines: AsyncIterator[dict[str, Any]]) -> AsyncIterator[str]:
+    async with aclosing(lines):  # type: ignore[type-var]
+        async for line in lines:
+            yield json.dumps(line) + "\n"
+
+
+async def _batch(
+    body: ChatBatchRequest, *, client: str, directives: set[str], background: BackgroundTasks
+) -> AsyncIterator[dict[str, Any]]:
+    """Resolve the batch's prompts once, then answer its items with bounded concurrency."""
+    settings = get_settings()
+    if len(body.items) > settings.chat_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(body.items)} exceeds {settings.chat_batch_max_items} items",
+        )
+    wanted = list(
+        dict.fromkeys((i.prompt_name, i.prompt_version) for i in body.items if i.prompt_name)
+    )
+    oven = PromptOven()
+    with timed("prompt_lookup"):
+        found = await asyncio.gather(*(oven.aget(name, version) for name, version in wanted))
+    records = dict(zip(wanted, found, strict=True))
+    compiled: dict[tuple[Any, ...], str] = {}
+    concurrency = min(
+        body.concurrency or settings.chat_batch_concurrency, settings.chat_batch_max_concurrency
+    )
+
+    def system_for(item: ChatRequest, record: PromptRecord) -> str:
+        variables = item.prompt_vars or {}
+        key = (record.name, record.version, tuple(sorted(variables.items())))
+        if key not in compiled:
+            compiled[key] = compile_prompt(record, variables)
+        return compiled[key]
+
+    async def run(index: int, item: ChatRequest) -> dict[str, Any]:
+        try:
+            record = (
+                records.get((item.prompt_name, item.prompt_version)) if item.prompt_name else None
+            )
+            system_prompt = system_for(item, record) if record else None
+            plan = await _plan(item, system_prompt, directives, background)
+            answer, headers = await _answer(
+                item,
+                record,
+                plan,
+                client=client,
+                priority=resolve_priority(item.priority, client, default="batch"),
+                directives=directives,
+                background=background,
+            )
+        except Exception as exc:  # noqa: BLE001
+            return {"index": index, "error": _item_error(exc)}
+        line: dict[str, Any] = {"index": index, **answer.model_dump()}
+        if "X-Cache" in headers:
+            line["cache"] = headers["X-Cache"]
+        return line
+
+    return _fan_out(body.items, run, concurrency)
+
+
+@router.post("/batch")
+async def chat_batch(
+    body: ChatBatchRequest,
+    request: Request,
+    background: BackgroundTasks,
+    cache_control: str | None = Header(default=None),
+) -> StreamingResponse:
+    """Answer many chats in one request, streaming `{"index", ...}` NDJSON lines.
+
+    Each distinct prompt is resolved once and each distinct (prompt, vars) compiled once.
+    Items run with bounded concurrency through the same cache, coalescing, rate limits and
+    scheduler as /chat, and default to the batch priority. A failed item yields an
+    `error` line instead of failing the batch.
+    """
+    lines = await _batch(
+        body,
+        client=_client_id(request),
+        directives=_cache_directives(cache_control),
+        background=background,
+    )
+    return StreamingResponse(
+        _ndjson(lines), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"}
     )
-    return ChatResponse(content=content, provider=provider)
+
+
+# Entry points for work done outside an HTTP request (the job queue). Background work that
+# a response would have run afterwards (turn persistence, summaries) runs before returning.
+
+
+async def complete_chat(body: ChatRequest, *, client: str, priority: str) -> ChatResponse:
+    background = BackgroundTasks()
+    record, system_prompt = await _resolve_prompt(body)
+    plan = await _plan(body, system_prompt, set(), background)
+    answer, _ = await _answer(
+        body,
+        record,
+        plan,
+        client=client,
+        priority=priority,
+        directives=set(),
+        background=background,
+    )
+    await background()
+    return answer
+
+
+async def complete_batch(body: ChatBatchRequest, *, client: str) -> list[dict[str, Any]]:
+    """Every item's result line, in item order."""
+    background = BackgroundTasks()
+    lines = [
+        line
+        async for line in await _batch(body, client=client, directives=set(), background=background)
+    ]
+    await background()
+    return sorted(lines, key=lambda line: line["index"])
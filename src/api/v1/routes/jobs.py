@@ -0,0 +1,113 @@
+import json
+from typing import Any, Literal
+from uuid import UUID
+
+from api.v1.routes.chat import (
+    ChatBatchRequest,
+    ChatRequest,
+    _client_id,
+    complete_batch,
+    complete_chat,
+)
+from core.config import get_settings
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel, model_validator
+from router_engine.passes.token_budget import TokenBudgetExceeded
+from router_engine.scheduler import resolve_priority
+from threadcore import jobs
+from threadcore.models import Job
+from threadcore.schemas import JobOut
+
+router = APIRouter()
+
+
+class JobCreate(BaseModel):
+    """Exactly one of `chat` (a /chat request) or `batch` (a /chat/batch request)."""
+
+    chat: ChatRequest | None = None
+    batch: ChatBatchRequest | None = None
+
+    @model_validator(mode="after")
+    def _one_request(self) -> "JobCreate":
+        if (self.chat is None) == (self.batch is None):
+            raise ValueError("provide exactly one of `chat` or `batch`")
+        return self
+
+    @property
+    def kind(self) -> Literal["chat", "batch"]:
+        return "chat" if self.chat is not None else "batch"
+
+    @property
+    def request(self) -> BaseModel:
+        return self.chat if self.chat is not None else self.batch  # type: ignore[return-value]
+
+
+def _job_out(job: Job) -> JobOut:
+    return JobOut(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        attempts=job.attempts,
+        result=json.loads(job.result) if job.result else None,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _require_queue() -> None:
+    settings = get_settings()
+    if not settings.redis_url or not settings.database_url:
+        raise HTTPException(status_code=503, detail="Jobs need REDIS_URL and DATABASE_URL")
+
+
+async def run_job(kind: str, payload: dict[str, Any], client: str | None) -> Any:
+    """Job handler: answers a queued chat or batch as the client that submitted it."""
+    client = client or "jobs"
+    try:
+        if kind == "chat":
+            body = ChatRequest.model_validate(payload)
+            priority = resolve_priority(body.priority, client, default="batch")
+            answer = await complete_chat(body, client=client, priority=priority)
+            return answer.model_dump()
+        if kind == "batch":
+            return {
+                "items": await complete_batch(
+                    ChatBatchRequest.model_validate(payload), client=client
+                )
+            }
+    except HTTPException as exc:
+        if exc.status_code >= 500:
+            raise  # e.g. a coalescing timeout; worth another attempt
+        raise jobs.JobFailed(str(exc.detail)) from exc
+    except (TokenBudgetExceeded, ValueError) as exc:
+        # Retrying the same request cannot change these outcomes
+        raise jobs.JobFailed(str(exc)) from exc
+    raise jobs.JobFailed(f"unknown job kind {kind!r}")
+
+
+@router.post("", response_model=JobOut, status_code=202)
+async def create_job(body: JobCreate, request: Request, response: Response) -> JobOut:
+    """Queue a chat or batch; poll `GET /jobs/{id}` (optionally with `wait`) for the result."""
+    _require_queue()
+    job = await jobs.enqueue(
+        body.kind, body.request.model_dump(mode="json"), client=_client_id(request)
+    )
+    response.headers["Location"] = f"{request.url.path.rstrip('/')}/{job.id}"
+    return _job_out(job)
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: UUID, wait: float = Query(0.0, ge=0)) -> JobOut:
+    """The job's status and, once it has succeeded, its result.
+
+    With `wait`, long-polls up to that many seconds (capped by `jobs_max_wait`) for the
+    job to finish before answering.
+    """
+    _require_queue()
+    timeout = min(wait, get_settings().jobs_max_wait)
+    job = await (jobs.wait_for(job_id, timeout) if timeout > 0 else jobs.get(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
@@ -0,0 +1,125 @@
+import math
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from typing import Any, Literal
+
+from api.v1.routes.chat import (
+    ChatRequest,
+    _answer,
+    _cache_directives,
+    _client_id,
+    _item_error,
+    _plan,
+    _sse,
+)
+from core.config import get_settings
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from router_engine.pipeline import (
+    Pipeline,
+    PipelineError,
+    PipelineStep,
+    StepCall,
+    StepFailed,
+    StepResult,
+)
+from router_engine.scheduler import resolve_priority
+
+router = APIRouter()
+
+
+class PipelineRequest(BaseModel):
+    steps: list[PipelineStep] = Field(min_length=1)
+    # Values available to every step's templates as `$name`
+    inputs: dict[str, str] = Field(default_factory=dict)
+    # Stream `step` events as steps finish, then a `done` event (SSE)
+    stream: bool = False
+    priority: Literal["interactive", "batch"] | None = None
+
+
+class PipelineResponse(BaseModel):
+    status: Literal["succeeded", "failed"]
+    outputs: dict[str, str]
+    steps: list[dict[str, Any]]
+    elapsed_ms: float
+    failed: str | None = None
+    error: dict[str, Any] | None = None
+    skipped: list[str] = Field(default_factory=list)
+
+
+async def _sse_events(events: AsyncIterator[dict[str, Any]]) -> AsyncIterator[str]:
+    async with aclosing(events):  # type: ignore[type-var]
+        async for event in events:
+            name = event.pop("event")
+            yield _sse(name, event)
+
+
+@router.post("", response_model=PipelineResponse)
+async def run_pipeline(
+    body: PipelineRequest,
+    request: Request,
+    background: BackgroundTasks,
+    cache_control: str | None = Header(default=None),
+) -> PipelineResponse | JSONResponse | StreamingResponse:
+    """Run a DAG of chat steps, each step starting as soon as the steps it uses finish.
+
+    Steps go through the same cache, coalescing, rate limits and scheduler as /chat.
+    Without `stream`, a failed step answers with that step's error status and the
+    outputs of the steps that did finish.
+    """
+    settings = get_settings()
+    if len(body.steps) > settings.pipeline_max_steps:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Pipeline of {len(body.steps)} steps exceeds {settings.pipeline_max_steps}",
+        )
+    try:
+        pipeline = Pipeline(body.steps, body.inputs)
+        await pipeline.resolve_prompts()
+    except PipelineError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    client = _client_id(request)
+    priority = resolve_priority(body.priority, client)
+    directives = _cache_directives(cache_control)
+
+    async def execute(call: StepCall) -> StepResult:
+        item = ChatRequest(message=call.message, format=call.output_format, priority=priority)
+        try:
+            plan = await _plan(item, call.system, directives, background)
+            answer, headers = await _answer(
+                item,
+                call.record,
+                plan,
+                client=client,
+                priority=priority,
+                directives=directives,
+                background=background,
+            )
+        except Exception as exc:  # noqa: BLE001
+            raise StepFailed(_item_error(exc)) from exc
+        return StepResult(answer.content, answer.provider, headers.get("X-Cache"))
+
+    events = pipeline.run(execute, concurrency=settings.pipeline_concurrency)
+    if body.stream:
+        return StreamingResponse(
+            _sse_events(events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    steps: list[dict[str, Any]] = []
+    async with aclosing(events):  # type: ignore[type-var]
+        async for event in events:
+            if event.pop("event") == "step":
+                steps.append(event)
+            else:
+                result = PipelineResponse(steps=steps, **event)
+    if result.error is None:
+        return result
+    retry_after = result.error.get("retry_after")
+    return JSONResponse(
+        status_code=result.error.get("status", 500),
+        content=result.model_dump(),
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after else None,
+    )
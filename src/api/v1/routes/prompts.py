@@ -2,14 +2,23 @@ from __future__ import annotations
 
 from core.config import get_settings
 from fastapi import APIRouter, HTTPException, Query
-from oven.loader import load_prompts_from_file
+from oven.loader import load_prompts
 from oven.manager import PromptOven
 from oven.storage import redis_store
+from pydantic import BaseModel, Field
 from threadcore.database import db_session
 from threadcore.repository import list_prompt_versions as db_list_prompt_versions
 
 router = APIRouter()
 
+MAX_BATCH = 1000
+
+
+class PromptBatchRequest(BaseModel):
+    names: list[str] = Field(max_length=MAX_BATCH)
+    # Optional per-name version ("latest" or an explicit version); others get the default
+    versions: dict[str, str] | None = None
+
 
 @router.get("")
 def list_prompts() -> dict:
@@ -38,10 +47,21 @@ def get_prompt(name: str, version: str | None = Query(default=None)) -> dict:
     return rec.model_dump()
 
 
+@router.post("/batch")
+def get_prompts_batch(body: PromptBatchRequest) -> dict:
+    records = PromptOven().get_many(body.names, body.versions)
+    return {
+        "prompts": {name: rec.model_dump() for name, rec in records.items()},
+        "missing": [name for name in dict.fromkeys(body.names) if name not in records],
+    }
+
+
 @router.post("/reload")
-def reload_prompts(path: str | None = Query(default=None)) -> dict:
+def reload_prompts(
+    path: str | None = Query(default=None), full: bool = Query(default=False)
+) -> dict:
     oven = PromptOven()
-    info = oven.reload(path)
+    info = oven.reload(path, full=full)
     return {"reloaded": True, **info}
 
 
@@ -69,7 +89,7 @@ def list_versions(name: str) -> dict:
     settings = get_settings()
     if settings.prompts_file:
         try:
-            prompts = load_prompts_from_file(settings.prompts_file)
+            prompts = load_prompts(settings.prompts_file)
             rec = prompts.get(name)
             if rec and rec.version:
                 return {"name": name, "versions": [rec.version]}
@@ -0,0 +1,61 @@
+from core.config import get_settings
+from fastapi import APIRouter, Query
+from router_engine.router import breakers, hedge_stats
+from router_engine.scheduler import scheduler
+from sentinel.tracing import otlp_payload, trace_buffer
+from threadcore.database import pool_stats
+from threadcore.jobs import job_worker
+from threadcore.writer import message_writer
+
+router = APIRouter()
+
+
+@router.get("/providers")
+def provider_status() -> dict:
+    settings = get_settings()
+    return {
+        "route": [settings.primary, *settings.fallbacks],
+        "providers": breakers.snapshot(),
+        "hedging": {"enabled": settings.hedge_enabled, **hedge_stats.snapshot()},
+    }
+
+
+@router.get("/scheduler")
+def scheduler_status() -> dict:
+    """Per-provider concurrency caps, in-flight calls and queue depth by priority."""
+    return {"enabled": get_settings().scheduler_enabled, "providers": scheduler.snapshot()}
+
+
+@router.get("/messages")
+def message_status() -> dict:
+    return message_writer.snapshot()
+
+
+@router.get("/jobs")
+def job_status() -> dict:
+    return job_worker.snapshot()
+
+
+@router.get("/db")
+def database_status() -> dict:
+    return pool_stats()
+
+
+@router.get("/traces")
+def trace_status(
+    limit: int = Query(50, ge=1, le=1000),
+    min_ms: float = Query(0.0, ge=0),
+    format: str = Query("json", pattern="^(json|otlp)$"),
+) -> dict:
+    """Most recent slow or sampled request traces; `format=otlp` returns OTLP/JSON."""
+    traces = trace_buffer.recent(limit, min_ms=min_ms)
+    if format == "otlp":
+        return otlp_payload(traces)
+    settings = get_settings()
+    return {
+        "slow_ms": settings.trace_slow_ms,
+        "sample_rate": settings.trace_sample_rate,
+        "seen": trace_buffer.seen,
+        "slow": trace_buffer.slow,
+        "traces": [t.to_dict() for t in traces],
+    }
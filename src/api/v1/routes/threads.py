@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from uuid import UUID
+
+from core.config import get_settings
+from fastapi import APIRouter, HTTPException, Query
+from threadcore.database import async_db_session
+from threadcore.repository import acreate_session, acreate_thread, aget_recent_messages, aget_thread
+from threadcore.schemas import MessageOut, MessagePage, ThreadCreate, ThreadOut
+
+router = APIRouter()
+
+
+def _require_db() -> None:
+    settings = get_settings()
+    if not settings.database_url and not settings.database_async_url:
+        raise HTTPException(status_code=503, detail="Thread storage is not configured")
+
+
+def encode_cursor(created_at: datetime, message_id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(message_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, message_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
+@router.post("", response_model=ThreadOut, status_code=201)
+async def create_thread(body: ThreadCreate) -> ThreadOut:
+    _require_db()
+    async with async_db_session() as s:
+        session_id = body.session_id
+        if session_id is None:
+            session_id = (await acreate_session(s, body.user_id)).id
+        thread = await acreate_thread(s, session_id, body.title)
+        await s.refresh(thread)
+    return ThreadOut.model_validate(thread)
+
+
+@router.get("/{thread_id}", response_model=ThreadOut)
+async def get_thread(thread_id: UUID) -> ThreadOut:
+    _require_db()
+    async with async_db_session() as s:
+        thread = await aget_thread(s, thread_id)
+    if thread is None:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    return ThreadOut.model_validate(thread)
+
+
+@router.get("/{thread_id}/messages", response_model=MessagePage)
+async def list_messages(
+    thread_id: UUID,
+    limit: int = Query(default=50, ge=1, le=500),
+    before: str | None = Query(default=None, description="next_cursor of the previous page"),
+    max_tokens: int | None = Query(default=None, ge=1),
+) -> MessagePage:
+    """The newest messages of the thread (oldest first), paging back with `before`."""
+    _require_db()
+    cursor = decode_cursor(before) if before else None
+    async with async_db_session() as s:
+        rows = await aget_recent_messages(
+            s, thread_id, limit=limit, before=cursor, max_tokens=max_tokens
+        )
+    items = [MessageOut.model_validate(row._mapping) for row in rows]
+    # A full (or token-cut) page may have older messages behind it; a short page without a
+    # token limit is the start of the history
+    next_cursor = None
+    if rows and (len(rows) == limit or max_tokens is not None):
+        next_cursor = encode_cursor(rows[0].created_at, rows[0].id)
+    return MessagePage(items=items, next_cursor=next_cursor)
@@ -1,2 +1,10 @@
+from collections.abc import AsyncIterator
+
+
 def _identity(value: str) -> str:
     return value
+
+
+async def _identity_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    async for chunk in chunks:
+        yield chunk
@@ -1,5 +1,15 @@
 import json
+from collections.abc import AsyncIterator
 
 
 def format_json(content: str) -> str:
     return json.dumps({"content": content})
+
+
+async def format_json_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    # Emit the same envelope as format_json piecewise: concatenating the
+    # pieces yields exactly format_json(full_content).
+    yield '{"content": "'
+    async for chunk in chunks:
+        yield json.dumps(chunk)[1:-1]
+    yield '"}'
@@ -0,0 +1,11 @@
+from collections.abc import AsyncIterator
+
+from backend.formats.base import _identity, _identity_stream
+
+
+def format_markdown(content: str) -> str:
+    return _identity(content)
+
+
+def format_markdown_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    return _identity_stream(chunks)
@@ -1,6 +1,8 @@
-from backend.formats.json_format import format_json
-from backend.formats.markdown_format import format_markdown
-from backend.formats.raw_format import format_raw
+from collections.abc import AsyncIterator
+
+from backend.formats.json_format import format_json, format_json_stream
+from backend.formats.markdown_format import format_markdown, format_markdown_stream
+from backend.formats.raw_format import format_raw, format_raw_stream
 
 
 def format_output(content: str, *, output_format: str) -> str:
@@ -9,3 +11,12 @@ def format_output(content: str, *, output_format: str) -> str:
     if output_format == "json":
         return format_json(content)
     return format_markdown(content)
+
+
+def format_output_stream(chunks: AsyncIterator[str], *, output_format: str) -> AsyncIterator[str]:
+    """Incremental counterpart of `format_output` for streamed deltas."""
+    if output_format == "raw":
+        return format_raw_stream(chunks)
+    if output_format == "json":
+        return format_json_stream(chunks)
+    return format_markdown_stream(chunks)
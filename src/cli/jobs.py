@@ -0,0 +1,52 @@
+"""Standalone job consumer, for running workers apart from the API tier.
+
+Usage: PYTHONPATH=src python -m cli.jobs [--workers N]
+Set `jobs_workers: 0` on the API processes so they only accept and serve jobs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import signal
+
+from api.v1.routes.jobs import run_job
+from core.config import get_settings
+from core.redis import aclose_redis
+from providers.clients import aclose_clients
+from router_engine.passes.token_budget import warm_encoders
+from threadcore.database import aclose_database
+from threadcore.jobs import job_worker
+from threadcore.writer import message_writer
+
+
+async def consume(workers: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    # Jobs count tokens approximately until the tokenizers have loaded, as in the API
+    warmup = asyncio.create_task(warm_encoders())
+    job_worker.start(run_job, workers)
+    if not job_worker.running:
+        warmup.cancel()
+        raise SystemExit("Jobs need REDIS_URL and DATABASE_URL")
+    print(f"{job_worker.consumer}: consuming jobs with {workers} workers")
+    await stop.wait()
+    warmup.cancel()
+    await job_worker.aclose()
+    await message_writer.aclose()
+    await aclose_database()
+    await aclose_clients()
+    await aclose_redis()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=max(get_settings().jobs_workers, 1))
+    args = parser.parse_args()
+    asyncio.run(consume(args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,44 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, SettingsConfigDict
 
 
+class HttpClientSettings(BaseModel):
+    """Connection pool and timeout settings for one upstream provider API."""
+
+    base_url: str
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    http2: bool = True
+
+
+class DatabasePoolSettings(BaseModel):
+    """Connection pool sizing shared by the sync and async ThreadCore engines."""
+
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30.0  # seconds to wait for a connection before failing
+    pool_recycle: int = 1800  # seconds; recycle before server/proxy idle timeouts
+    pool_pre_ping: bool = True
+
+
+class RateLimitSettings(BaseModel):
+    """Token-bucket limits for one client or provider; 0 leaves a dimension unlimited."""
+
+    rpm: int = 0  # requests per minute
+    tpm: int = 0  # prompt + completion tokens per minute
+    tpd: int = 0  # tokens per day (quota)
+
+
 class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
+    model_config = SettingsConfigDict(
+        env_file=".env", env_file_encoding="utf-8", env_nested_delimiter="__", extra="ignore"
+    )
 
     app_name: str = "LOR-3000"
     environment: str = "development"
@@ -18,9 +51,14 @@ class Settings(BaseSettings):
     # Providers
     openai_api_key: str | None = None
     anthropic_api_key: str | None = None
+    openai_http: HttpClientSettings = HttpClientSettings(base_url="https://api.openai.com/v1")
+    anthropic_http: HttpClientSettings = HttpClientSettings(base_url="https://api.anthropic.com/v1")
 
     # Datastores
     database_url: str | None = None
+    # Async driver URL; derived from database_url when unset (psycopg 3 / aiosqlite)
+    database_async_url: str | None = None
+    database_pool: DatabasePoolSettings = DatabasePoolSettings()
     redis_url: str | None = None
 
     # Routing & Output
@@ -29,6 +67,105 @@ class Settings(BaseSettings):
     format: str = "markdown"
     max_tokens: int = 4000
     prompts_file: str | None = None
+    prompt_cache_size: int = 1024  # in-process PromptRecord LRU; 0 disables
+    prompt_cache_ttl: float = 300.0
+    # Watch prompts_file (a file or a directory of YAML/JSON files) and push edits live
+    prompts_watch: bool = False
+    prompts_watch_interval: float = 2.0  # polling fallback when watchfiles is unavailable
+
+    # Hedging: fire the next provider in the route if the current one is slow
+    hedge_enabled: bool = False
+    hedge_delay_ms: float = 1000.0
+    hedge_delays_ms: dict[str, float] = {}
+    hedge_adaptive: bool = False  # derive per-provider delay from observed p95 latency
+    hedge_max_concurrent: int = 1  # extra in-flight calls allowed per request
+
+    # Circuit breaker & provider health (shared through Redis when redis_url is set)
+    breaker_window_seconds: int = 30
+    breaker_min_calls: int = 10
+    breaker_error_threshold: float = 0.5
+    breaker_slow_call_ms: float = 15000.0
+    breaker_slow_threshold: float = 0.8
+    breaker_cooldown_seconds: float = 30.0
+    health_demote_below: float = 0.7
+    health_sync_interval: float = 1.0
+
+    # Exact-match response cache (opt-in); Redis tier is used when redis_url is set
+    response_cache_enabled: bool = False
+    response_cache_ttl: int = 300
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+
+    # Single-flight: concurrent identical chats share one upstream call
+    singleflight_enabled: bool = True
+    singleflight_distributed: bool = False  # coordinate across workers through Redis
+    singleflight_max_waiters: int = 1000
+    singleflight_timeout: float = 120.0
+
+    # Write-behind persistence of chat turns (requests carrying a thread_id)
+    message_queue_max: int = 10_000  # queued messages before enqueueing waits
+    message_batch_size: int = 500
+    message_flush_interval: float = 0.2  # max seconds a message waits for its batch
+    message_enqueue_timeout: float = 1.0  # backpressure wait before a turn is dropped
+    message_drain_timeout: float = 10.0  # shutdown budget for flushing the queue
+    message_write_retries: int = 3
+    # Cost in cents per 1k tokens by provider name, e.g. {"openai:gpt-4": 3.0}
+    provider_cost_cents_per_1k: dict[str, float] = {}
+
+    # MemoryLane: older thread turns are folded into a rolling summary cached per thread
+    memory_summary_provider: str | None = None  # defaults to `primary`
+    memory_summary_batch: int = 40  # aged-out messages sent per summarization call
+    memory_summary_words: int = 200
+    memory_summary_ttl: int = 7 * 24 * 3600  # seconds a thread summary stays in Redis
+
+    # Sentinel metrics; with redis_url each worker pushes deltas so /metrics shows the fleet
+    metrics_flush_interval: float = 5.0  # seconds between flushes; 0 disables the flusher
+
+    # Rate limits, enforced before any upstream call (shared through Redis when configured)
+    rate_limit_enabled: bool = False
+    rate_limit_client_header: str = "X-Client-Id"  # unidentified clients are keyed by IP
+    # Peers (IPs, CIDRs or host names) allowed to assert the client header, e.g. the gateway
+    # that authenticates callers; from anyone else the header is ignored
+    rate_limit_trusted_proxies: list[str] = []
+    client_rate_limit: RateLimitSettings = RateLimitSettings()  # default for every client
+    client_rate_limits: dict[str, RateLimitSettings] = {}  # per-client overrides
+    provider_rate_limits: dict[str, RateLimitSettings] = {}  # e.g. {"openai:gpt-4": {...}}
+    # Completion tokens assumed at admission; reconciled with actual usage afterwards
+    rate_limit_completion_tokens: int = 500
+
+    # POST /chat/batch: items run concurrently and stream back as NDJSON as they finish
+    chat_batch_max_items: int = 1000
+    chat_batch_concurrency: int = 16  # default in-flight items per batch
+    chat_batch_max_concurrency: int = 128  # ceiling for a batch's own `concurrency`
+
+    # Admission control: per-provider concurrency caps with a priority queue in front
+    scheduler_enabled: bool = False
+    provider_concurrency: dict[str, int] = {}  # max in-flight calls, e.g. {"openai:gpt-4": 32}
+    default_provider_concurrency: int = 0  # for providers not listed; 0 = uncapped
+    scheduler_max_queue: int = 256  # queued requests per provider before rejecting outright
+    # Seconds a request of each priority may wait for a slot, across its whole route
+    scheduler_queue_timeout: dict[str, float] = {"interactive": 5.0, "batch": 120.0}
+    scheduler_default_priority: str = "interactive"
+    client_priorities: dict[str, str] = {}  # client id -> priority, e.g. {"etl": "batch"}
+
+    # Jobs: chat/batch requests queued on a Redis stream, results kept in ThreadCore
+    jobs_workers: int = 2  # jobs run at once per process; 0 on an enqueue-only API tier
+    jobs_visibility_timeout: float = 60.0  # seconds before an unacknowledged job is reclaimed
+    jobs_max_attempts: int = 3
+    jobs_retry_backoff: float = 2.0  # seconds before the first retry, doubled per attempt
+    jobs_timeout: float = 900.0  # per attempt
+    jobs_poll_interval: float = 1.0  # long-poll re-check interval for jobs finished elsewhere
+    jobs_max_wait: float = 60.0  # longest GET /jobs/{id}?wait= allowed
+
+    # POST /pipeline: a DAG of chat steps, independent branches run concurrently
+    pipeline_max_steps: int = 64
+    pipeline_concurrency: int = 16  # in-flight steps per pipeline
+
+    # Request tracing: Server-Timing headers plus a ring buffer of slow/sampled traces
+    tracing_enabled: bool = True
+    trace_slow_ms: float = 2000.0  # requests at least this slow are always kept
+    trace_sample_rate: float = 0.0  # fraction of faster requests also kept
+    trace_buffer_size: int = 200
+    trace_export_path: str | None = None  # append kept traces as OTLP/JSON lines
 
     @classmethod
     def settings_customise_sources(
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import secrets
+import threading
+from collections.abc import Awaitable
+from typing import Any, cast
+
+import redis  # type: ignore[import-untyped]
+import redis.asyncio as aioredis  # type: ignore[import-untyped]
+from core.config import get_settings
+from redis.exceptions import NoScriptError  # type: ignore[import-untyped]
+
+# One connection pool per Redis URL for the whole process
+_CLIENTS: dict[str, redis.Redis] = {}
+# asyncio pools are bound to the event loop that created them
+_ASYNC_CLIENTS: dict[str, tuple[asyncio.AbstractEventLoop, aioredis.Redis]] = {}
+_LOCK = threading.Lock()
+
+# Deletes a lock only while it still holds the caller's token, so an owner that overran the
+# lock's TTL cannot release the lock another worker has since taken
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_RELEASE_SHA = hashlib.sha1(_RELEASE_LUA.encode()).hexdigest()
+
+
+def get_redis() -> redis.Redis:
+    settings = get_settings()
+    if not settings.redis_url:
+        raise RuntimeError("REDIS_URL not configured")
+    client = _CLIENTS.get(settings.redis_url)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(settings.redis_url)
+        if client is None:
+            pool = redis.ConnectionPool.from_url(settings.redis_url, decode_responses=True)
+            client = redis.Redis(connection_pool=pool)
+            _CLIENTS[settings.redis_url] = client
+    return client
+
+
+def get_async_redis() -> aioredis.Redis:
+    settings = get_settings()
+    if not settings.redis_url:
+        raise RuntimeError("REDIS_URL not configured")
+    loop = asyncio.get_running_loop()
+    entry = _ASYNC_CLIENTS.get(settings.redis_url)
+    if entry is not None and entry[0] is loop:
+        return entry[1]
+    with _LOCK:
+        entry = _ASYNC_CLIENTS.get(settings.redis_url)
+        if entry is None or entry[0] is not loop:
+            client = aioredis.Redis.from_url(settings.redis_url, decode_responses=True)
+            entry = (loop, client)
+            _ASYNC_CLIENTS[settings.redis_url] = entry
+    return entry[1]
+
+
+async def aclose_redis() -> None:
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        entries = list(_ASYNC_CLIENTS.values())
+        _ASYNC_CLIENTS.clear()
+    for owner, client in entries:
+        if owner is loop:
+            await client.aclose()
+    close_redis()
+
+
+def close_redis() -> None:
+    with _LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
+        client.connection_pool.disconnect()
+
+
+def lock_token() -> str:
+    """A value identifying one holder of a `SET NX PX` lock, for `arelease_lock`."""
+    return secrets.token_hex(16)
+
+
+async def arelease_lock(r: aioredis.Redis, key: str, token: str) -> bool:
+    """Delete `key` if it still holds `token`; returns whether it did."""
+    try:
+        # The async client's stubs share the sync client's `Awaitable | value` return types
+        released = await cast(Awaitable[Any], r.evalsha(_RELEASE_SHA, 1, key, token))
+    except NoScriptError:
+        released = await cast(Awaitable[Any], r.eval(_RELEASE_LUA, 1, key, token))
+    return bool(released)
@@ -1,10 +1,84 @@
+import asyncio
+import math
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from api.v1.router import api_router
+from api.v1.routes.jobs import run_job
 from core.config import get_settings
-from fastapi import FastAPI
+from core.redis import aclose_redis
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from oven.cache import stop_invalidation_listener
+from oven.watcher import ensure_prompt_watcher, stop_prompt_watcher
+from providers.clients import aclose_clients
+from router_engine.passes.token_budget import TokenBudgetExceeded, warm_encoders
+from router_engine.rate_limit import RateLimited
+from router_engine.scheduler import Overloaded
+from sentinel.observer import ensure_metrics_flusher, registry, stop_metrics_flusher
+from sentinel.tracing import TraceMiddleware
+from threadcore.database import aclose_database
+from threadcore.jobs import job_worker
+from threadcore.writer import message_writer
 
 settings = get_settings()
 
-app = FastAPI(title=settings.app_name, version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    ensure_prompt_watcher()
+    ensure_metrics_flusher()
+    job_worker.start(run_job)
+    # Requests count tokens approximately until the tokenizers have loaded
+    warmup = asyncio.create_task(warm_encoders())
+    yield
+    warmup.cancel()
+    # Stop taking jobs (unfinished ones are reclaimed by other workers), flush queued chat
+    # turns, then release pooled connections on shutdown
+    await job_worker.aclose()
+    await message_writer.aclose()
+    await aclose_database()
+    stop_metrics_flusher()
+    stop_prompt_watcher()
+    stop_invalidation_listener()
+    await aclose_clients()
+    await aclose_redis()
+
+
+app = FastAPI(title=settings.app_name, version="0.1.0", lifespan=lifespan)
+# Per-request spans: Server-Timing header plus the slow-request buffer at /status/traces
+app.add_middleware(TraceMiddleware)
+
+
+@app.exception_handler(TokenBudgetExceeded)
+async def token_budget_exceeded(_request: Request, exc: TokenBudgetExceeded) -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={"detail": str(exc), "needed": exc.needed, "budget": exc.budget},
+    )
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited(_request: Request, exc: RateLimited) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "scope": exc.scope, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(_request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": str(exc),
+            "provider": exc.provider,
+            "reason": exc.reason,
+            "retry_after": exc.retry_after,
+        },
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
 
 
 @app.get("/healthz")
@@ -12,4 +86,11 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    # Reading the fleet totals is a Redis round trip; keep it off the event loop
+    body = await asyncio.to_thread(registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 app.include_router(api_router, prefix="/api/v1")
@@ -1 +1,242 @@
-# Placeholder for thread context injection utilities
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from core.config import get_settings
+from core.redis import arelease_lock, get_async_redis, lock_token
+from providers.registry import get_provider
+from router_engine.router import achoose_provider_and_respond
+from threadcore.database import async_db_session
+from threadcore.repository import aget_messages_after, aget_recent_messages
+
+PREFIX = "lor3:memory"
+# Summaries kept in process when Redis is not configured (or unreachable)
+MAX_LOCAL_SUMMARIES = 10_000
+# A refresh holds the per-thread lock at most this long, even if the worker dies mid-way
+REFRESH_LOCK_MS = 120_000
+
+SUMMARY_SYSTEM = (
+    "You maintain a running summary of a conversation. Merge the new messages into the "
+    "existing summary, keeping facts, decisions, names and open questions. Reply with the "
+    "updated summary only."
+)
+
+Cursor = tuple[datetime, UUID]
+
+
+@dataclass(frozen=True)
+class ThreadSummary:
+    """Rolling summary of a thread up to and including the message keyed `through`."""
+
+    text: str = ""
+    through: Cursor | None = None
+
+    def dumps(self) -> str:
+        through = None
+        if self.through is not None:
+            through = [self.through[0].isoformat(), str(self.through[1])]
+        return json.dumps({"text": self.text, "through": through})
+
+    @classmethod
+    def loads(cls, raw: str | bytes) -> ThreadSummary:
+        data = json.loads(raw)
+        through = data.get("through")
+        if through is None:
+            return cls(text=data.get("text", ""))
+        return cls(
+            text=data.get("text", ""),
+            through=(datetime.fromisoformat(through[0]), UUID(through[1])),
+        )
+
+
+@dataclass
+class ThreadContext:
+    """What a chat turn sends upstream: the verbatim window plus the summary before it."""
+
+    history: list[dict[str, str]] = field(default_factory=list)
+    summary: ThreadSummary = field(default_factory=ThreadSummary)
+    # Messages have aged out of the window since the summary was last brought up to date
+    needs_refresh: bool = False
+
+    def system(self, base: str | None) -> str | None:
+        if not self.summary.text:
+            return base
+        block = f"Conversation summary so far:\n{self.summary.text}"
+        return f"{base}\n\n{block}" if base else block
+
+
+_LOCAL: OrderedDict[str, str] = OrderedDict()
+_LOCAL_LOCK = threading.Lock()
+# Threads with a refresh running in this process, with the token of their Redis lock
+_REFRESHING: dict[UUID, str] = {}
+
+
+def _key(thread_id: UUID) -> str:
+    return f"{PREFIX}:{thread_id}"
+
+
+def _cursor(row: Any) -> Cursor:
+    return (row.created_at, row.id)
+
+
+async def load_summary(thread_id: UUID) -> ThreadSummary:
+    raw: str | bytes | None = None
+    if get_settings().redis_url:
+        with suppress(Exception):
+            raw = await get_async_redis().get(_key(thread_id))
+    if raw is None:
+        raw = _LOCAL.get(_key(thread_id))
+    if raw is None:
+        return ThreadSummary()
+    try:
+        return ThreadSummary.loads(raw)
+    except (ValueError, KeyError, TypeError, IndexError):
+        return ThreadSummary()
+
+
+async def save_summary(thread_id: UUID, summary: ThreadSummary) -> None:
+    settings = get_settings()
+    raw = summary.dumps()
+    if settings.redis_url:
+        try:
+            await get_async_redis().set(_key(thread_id), raw, ex=settings.memory_summary_ttl)
+            return
+        except Exception:  # noqa: BLE001
+            pass  # keep the summary in process rather than lose the work
+    with _LOCAL_LOCK:
+        _LOCAL[_key(thread_id)] = raw
+        _LOCAL.move_to_end(_key(thread_id))
+        while len(_LOCAL) > MAX_LOCAL_SUMMARIES:
+            _LOCAL.popitem(last=False)
+
+
+def clear_local_summaries() -> None:
+    with _LOCAL_LOCK:
+        _LOCAL.clear()
+
+
+async def build_context(thread_id: UUID, *, context_depth: int) -> ThreadContext:
+    """Last `context_depth` turns of the thread verbatim, plus its cached rolling summary.
+
+    Only messages newer than the summary are read, and at most one more than the window,
+    so the cost is bounded by `context_depth` however long the thread grows.
+    """
+    window = max(context_depth, 0) * 2
+    summary = await load_summary(thread_id)
+    if window == 0:
+        return ThreadContext(summary=summary)
+    async with async_db_session() as session:
+        rows = await aget_recent_messages(
+            session, thread_id, limit=window + 1, after=summary.through
+        )
+    return ThreadContext(
+        history=[{"role": row.role, "content": row.content} for row in rows[-window:]],
+        summary=summary,
+        needs_refresh=len(rows) > window,
+    )
+
+
+def _summary_prompt(previous: str, rows: Sequence[Any], words: int) -> str:
+    lines = "\n".join(f"{row.role}: {row.content}" for row in rows)
+    return (
+        f"Current summary:\n{previous or '(empty)'}\n\n"
+        f"New messages:\n{lines}\n\n"
+        f"Write the updated summary in at most {words} words."
+    )
+
+
+def _lock_key(thread_id: UUID) -> str:
+    return f"{_key(thread_id)}:lock"
+
+
+async def _acquire(thread_id: UUID) -> bool:
+    if thread_id in _REFRESHING:
+        return False
+    token = _REFRESHING[thread_id] = lock_token()
+    if not get_settings().redis_url:
+        return True
+    try:
+        acquired = await get_async_redis().set(
+            _lock_key(thread_id), token, nx=True, px=REFRESH_LOCK_MS
+        )
+    except Exception:  # noqa: BLE001
+        return True  # Redis down: the in-process guard still prevents local duplicates
+    if not acquired:
+        _REFRESHING.pop(thread_id, None)
+    return bool(acquired)
+
+
+async def _release(thread_id: UUID) -> None:
+    token = _REFRESHING.pop(thread_id, None)
+    if token is not None and get_settings().redis_url:
+        # Only our own lock: after REFRESH_LOCK_MS another worker may have taken it over
+        with suppress(Exception):
+            await arelease_lock(get_async_redis(), _lock_key(thread_id), token)
+
+
+async def refresh_summary(thread_id: UUID, *, context_depth: int) -> ThreadSummary | None:
+    """Fold messages that aged out of the verbatim window into the thread's summary.
+
+    Only the messages between the summary's cursor and the window are sent to the
+    summarizer, in batches of `memory_summary_batch`; the summary and its cursor are saved
+    after each batch so a failure only loses the batch in flight. Summaries go through the
+    router at batch priority, so they share rate limits, scheduler slots and circuit
+    breakers with chat traffic. Returns the new summary, or None when another refresh owns
+    the thread or nothing had aged out.
+    """
+    settings = get_settings()
+    window = max(context_depth, 0) * 2
+    route = [settings.memory_summary_provider] if settings.memory_summary_provider else None
+    if window == 0 or get_provider(settings.memory_summary_provider or settings.primary) is None:
+        return None
+    if not await _acquire(thread_id):
+        return None
+    try:
+        summary = await load_summary(thread_id)
+        async with async_db_session() as session:
+            recent = await aget_recent_messages(
+                session, thread_id, limit=window, after=summary.through
+            )
+        if len(recent) < window:
+            return None
+        boundary = _cursor(recent[0])
+        updated: ThreadSummary | None = None
+        while True:
+            async with async_db_session() as session:
+                rows = await aget_messages_after(
+                    session,
+                    thread_id,
+                    after=summary.through,
+                    before=boundary,
+                    limit=settings.memory_summary_batch,
+                )
+            if not rows:
+                return updated
+            prompt = _summary_prompt(summary.text, rows, settings.memory_summary_words)
+            text, _ = await achoose_provider_and_respond(
+                prompt,
+                context_depth=0,
+                output_format="raw",
+                system=SUMMARY_SYSTEM,
+                priority="batch",
+                providers=route,
+            )
+            summary = ThreadSummary(text=text.strip(), through=_cursor(rows[-1]))
+            await save_summary(thread_id, summary)
+            updated = summary
+    finally:
+        await _release(thread_id)
+
+
+async def arefresh_summary(thread_id: UUID, *, context_depth: int) -> None:
+    """Background-task wrapper: a failed refresh keeps the previous summary."""
+    with suppress(Exception):
+        await refresh_summary(thread_id, context_depth=context_depth)
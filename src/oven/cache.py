@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from contextlib import suppress
+from typing import Any
+
+from core.config import get_settings
+from core.redis import get_redis
+from oven.compiler import invalidate_compiled
+from oven.schemas import PromptRecord
+
+INVALIDATION_CHANNEL = "lor3:prompts:invalidate"
+
+
+class PromptCache:
+    """Bounded LRU of PromptRecords with a TTL, keyed by (name, requested version).
+
+    Entries for a name are dropped as soon as an invalidation for it arrives; the TTL only
+    bounds staleness if an invalidation message is ever missed.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[tuple[str, str], tuple[float, PromptRecord]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, version: str | None) -> tuple[str, str]:
+        return (name, version or "")
+
+    def get(self, name: str, version: str | None = None) -> PromptRecord | None:
+        key = self._key(name, version)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at <= time.monotonic():
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return record
+
+    def set(self, name: str, version: str | None, record: PromptRecord) -> None:
+        settings = get_settings()
+        if settings.prompt_cache_size <= 0:
+            return
+        with self._lock:
+            self._entries[self._key(name, version)] = (
+                time.monotonic() + settings.prompt_cache_ttl,
+                record,
+            )
+            self._entries.move_to_end(self._key(name, version))
+            while len(self._entries) > settings.prompt_cache_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, names: Iterable[str] | None = None) -> None:
+        """Drop cached entries (and compiled templates) for `names`, or all when None."""
+        targets = None if names is None else set(names)
+        invalidate_compiled(targets)
+        with self._lock:
+            if targets is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] in targets]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+prompt_cache = PromptCache()
+
+_LISTENER: Any | None = None
+_LISTENER_LOCK = threading.Lock()
+# After a pub/sub failure, lookups re-subscribe no sooner than this, doubling per failure
+LISTENER_RETRY_MIN = 1.0
+LISTENER_RETRY_MAX = 30.0
+_RETRY_AT = 0.0
+_RETRY_DELAY = 0.0
+
+
+def encode_invalidation(names: Iterable[str] | None) -> str:
+    return json.dumps(None if names is None else sorted(set(names)))
+
+
+def _on_invalidation(message: dict[str, Any]) -> None:
+    try:
+        names = json.loads(message["data"])
+    except Exception:
+        names = None
+    prompt_cache.invalidate(names)
+
+
+def _schedule_retry() -> None:
+    # Caller holds _LISTENER_LOCK
+    global _RETRY_AT, _RETRY_DELAY
+    _RETRY_DELAY = min(max(_RETRY_DELAY * 2, LISTENER_RETRY_MIN), LISTENER_RETRY_MAX)
+    _RETRY_AT = time.monotonic() + _RETRY_DELAY
+
+
+def _on_listener_error(exc: BaseException, pubsub: Any, thread: Any) -> None:
+    global _LISTENER
+    _ = exc
+    # Updates may have been missed while disconnected; start clean. The next prompt lookup
+    # after the backoff re-subscribes (see ensure_invalidation_listener)
+    prompt_cache.invalidate()
+    thread.stop()
+    with suppress(Exception):
+        pubsub.close()
+    with _LISTENER_LOCK:
+        if _LISTENER is thread:
+            _LISTENER = None
+            _schedule_retry()
+
+
+def ensure_invalidation_listener() -> None:
+    """Start the background thread applying Redis invalidations, if it is not running.
+
+    Cheap when the listener is up; prompt lookups call it so a listener lost to a Redis
+    error is restarted (with backoff) instead of leaving the cache deaf until restart.
+    """
+    global _LISTENER, _RETRY_DELAY
+    if _LISTENER is not None or time.monotonic() < _RETRY_AT or not get_settings().redis_url:
+        return
+    with _LISTENER_LOCK:
+        if _LISTENER is not None or time.monotonic() < _RETRY_AT:
+            return
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: _on_invalidation})
+            _LISTENER = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=_on_listener_error
+            )
+        except Exception:
+            _LISTENER = None
+            _schedule_retry()
+            return
+        _RETRY_DELAY = 0.0
+    # Anything cached before the subscription existed (or while it was down) may be stale
+    prompt_cache.invalidate()
+
+
+def stop_invalidation_listener() -> None:
+    global _LISTENER, _RETRY_AT, _RETRY_DELAY
+    with _LISTENER_LOCK:
+        listener, _LISTENER = _LISTENER, None
+        _RETRY_AT = _RETRY_DELAY = 0.0
+    if listener is not None:
+        listener.stop()
@@ -1,14 +1,66 @@
 from __future__ import annotations
 
-from string import Template
+import threading
+from collections.abc import Iterable
 from typing import Mapping
 
 from oven.schemas import PromptRecord
+from oven.template import CompiledTemplate, parse_template
 
+# Compiled bodies keyed by (name, version); a changed body under the same key recompiles
+_COMPILED: dict[tuple[str, str | None], CompiledTemplate] = {}
+_LOCK = threading.Lock()
+MAX_COMPILED = 4096
 
-def compile_prompt(record: PromptRecord, variables: Mapping[str, str] | None = None) -> str:
+
+class MissingPromptVariables(ValueError):
+    def __init__(self, name: str, missing: list[str]) -> None:
+        super().__init__(f"Prompt '{name}' is missing variables: {', '.join(missing)}")
+        self.missing = missing
+
+
+def get_compiled(record: PromptRecord) -> CompiledTemplate:
+    key = (record.name, record.version)
+    compiled = _COMPILED.get(key)
+    if compiled is not None and (
+        compiled.source is record.system or compiled.source == record.system
+    ):
+        return compiled
+    compiled = parse_template(record.system)
+    with _LOCK:
+        if len(_COMPILED) >= MAX_COMPILED:
+            _COMPILED.clear()
+        _COMPILED[key] = compiled
+    return compiled
+
+
+def invalidate_compiled(names: Iterable[str] | None = None) -> None:
+    with _LOCK:
+        if names is None:
+            _COMPILED.clear()
+            return
+        targets = set(names)
+        for key in [k for k in _COMPILED if k[0] in targets]:
+            del _COMPILED[key]
+
+
+def missing_variables(record: PromptRecord, variables: Mapping[str, str] | None) -> list[str]:
+    return get_compiled(record).missing(variables or {})
+
+
+def compile_prompt(
+    record: PromptRecord, variables: Mapping[str, str] | None = None, *, strict: bool = False
+) -> str:
+    """Render the record's system prompt.
+
+    Missing variables are left as their placeholders (safe substitution) unless `strict`,
+    in which case `MissingPromptVariables` is raised before rendering.
+    """
     base = record.system
+    if strict:
+        missing = missing_variables(record, variables)
+        if missing:
+            raise MissingPromptVariables(record.name, missing)
     if not variables:
         return base
-    # Use safe substitution to avoid KeyErrors for missing vars
-    return Template(base).safe_substitute(**variables)
+    return get_compiled(record).render(variables)
@@ -1,22 +1,59 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import yaml  # type: ignore[import-untyped]
 from oven.schemas import PromptRecord
 
+PROMPT_SUFFIXES = {".yaml", ".yml", ".json"}
+
+
+@dataclass
+class _ParsedFile:
+    mtime_ns: int
+    size: int
+    digest: str
+    prompts: dict[str, PromptRecord]
+
+
+@dataclass
+class PromptDiff:
+    added: dict[str, PromptRecord] = field(default_factory=dict)
+    changed: dict[str, PromptRecord] = field(default_factory=dict)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def upserts(self) -> dict[str, PromptRecord]:
+        return {**self.added, **self.changed}
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+# Parsed prompt files keyed by resolved path; re-parsed only when their content changes
+_PARSED: dict[Path, _ParsedFile] = {}
+_LOCK = threading.Lock()
+
 
 def load_prompts_from_file(path: str | Path) -> dict[str, PromptRecord]:
     file_path = Path(path)
     if not file_path.exists():
         raise FileNotFoundError(f"Prompt file not found: {file_path}")
+    if file_path.suffix.lower() not in PROMPT_SUFFIXES:
+        raise ValueError("Unsupported prompt file format; use YAML or JSON")
+    return _parse(file_path, file_path.read_text(encoding="utf-8"))
+
+
+def _parse(file_path: Path, text: str) -> dict[str, PromptRecord]:
     if file_path.suffix.lower() in {".yaml", ".yml"}:
-        data = yaml.safe_load(file_path.read_text(encoding="utf-8"))
-    elif file_path.suffix.lower() == ".json":
-        data = json.loads(file_path.read_text(encoding="utf-8"))
+        data = yaml.safe_load(text)
     else:
-        raise ValueError("Unsupported prompt file format; use YAML or JSON")
+        data = json.loads(text)
 
     if not isinstance(data, dict):
         raise ValueError("Prompt file must be a mapping of name -> record")
@@ -27,3 +64,65 @@ def load_prompts_from_file(path: str | Path) -> dict[str, PromptRecord]:
             raise ValueError(f"Prompt record for '{name}' must be a mapping")
         prompts[name] = PromptRecord(name=name, **record)
     return prompts
+
+
+def prompt_files(path: str | Path) -> list[Path]:
+    """The prompt file itself, or every YAML/JSON file under a prompt directory."""
+    root = Path(path)
+    if root.is_dir():
+        return sorted(
+            p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in PROMPT_SUFFIXES
+        )
+    if not root.exists():
+        raise FileNotFoundError(f"Prompt file not found: {root}")
+    return [root]
+
+
+def _load_cached_file(file_path: Path) -> dict[str, PromptRecord]:
+    key = file_path.resolve()
+    stat = key.stat()
+    cached = _PARSED.get(key)
+    if cached is not None and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+        return cached.prompts
+    raw = key.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached is not None and cached.digest == digest:
+        # Touched but not edited: keep the parse, remember the new mtime
+        prompts = cached.prompts
+    else:
+        if key.suffix.lower() not in PROMPT_SUFFIXES:
+            raise ValueError("Unsupported prompt file format; use YAML or JSON")
+        prompts = _parse(key, raw.decode("utf-8"))
+    with _LOCK:
+        _PARSED[key] = _ParsedFile(stat.st_mtime_ns, stat.st_size, digest, prompts)
+    return prompts
+
+
+def load_prompts(path: str | Path) -> dict[str, PromptRecord]:
+    """Load a prompt file or directory through the parsed-file cache.
+
+    Only files whose mtime/size changed are re-read, and only files whose content hash
+    changed are re-parsed, so repeated loads cost a stat per file. Later files (in path
+    order) win when a prompt name is defined twice. Callers must not mutate the result.
+    """
+    prompts: dict[str, PromptRecord] = {}
+    for file_path in prompt_files(path):
+        prompts.update(_load_cached_file(file_path))
+    return prompts
+
+
+def diff_prompts(old: Mapping[str, PromptRecord], new: Mapping[str, PromptRecord]) -> PromptDiff:
+    diff = PromptDiff()
+    for name, rec in new.items():
+        previous = old.get(name)
+        if previous is None:
+            diff.added[name] = rec
+        elif previous is not rec and previous != rec:
+            diff.changed[name] = rec
+    diff.removed = sorted(name for name in old if name not in new)
+    return diff
+
+
+def clear_parsed_cache() -> None:
+    with _LOCK:
+        _PARSED.clear()
@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+from collections.abc import Iterable, Mapping
 from contextlib import suppress
 
 from core.config import get_settings
-from oven.loader import load_prompts_from_file
+from oven.cache import ensure_invalidation_listener, prompt_cache
+from oven.loader import PromptDiff, diff_prompts, load_prompts
 from oven.schemas import PromptRecord
 from oven.storage import redis_store
+from sentinel.observer import CACHE_LOOKUPS
+from sentinel.tracing import annotate, span
 from threadcore.database import db_session
+from threadcore.repository import (
+    bulk_upsert_prompts as db_bulk_upsert_prompts,
+)
 from threadcore.repository import (
     get_prompt_record as db_get_prompt_record,
 )
+from threadcore.repository import (
+    get_prompt_records as db_get_prompt_records,
+)
 from threadcore.repository import (
     list_prompt_names as db_list_prompt_names,
 )
@@ -20,31 +32,48 @@ from threadcore.repository import (
 # Shared in-process store
 _STORE: dict[str, PromptRecord] = {}
 _SOURCE_PATH: str | None = None
+# Prompts last pushed to the backing stores from _SOURCE_PATH; reloads only push the diff
+_APPLIED: dict[str, PromptRecord] = {}
+_RELOAD_LOCK = threading.Lock()
+# Backing stores are probed and seeded once per process, not on every PromptOven(); an
+# unreachable Redis leaves this unset so the next PromptOven() tries again
+_SEEDED = False
 
 
 class PromptOven:
     def __init__(self) -> None:
-        global _STORE, _SOURCE_PATH
+        global _STORE, _SOURCE_PATH, _SEEDED, _APPLIED
+        if _SEEDED:
+            return
         settings = get_settings()
-        use_redis = bool(settings.redis_url)
-        if use_redis:
-            # Attempt to read names from Redis; if empty and file provided, seed Redis
-            with suppress(Exception):
-                names = redis_store.list_names()
-                if not names and settings.prompts_file:
-                    prompts = load_prompts_from_file(settings.prompts_file)
-                    with suppress(Exception):
-                        redis_store.load_many(prompts)
+        if settings.redis_url:
+            ensure_invalidation_listener()
+            try:
+                # Prompts stored before the version index existed get indexed once
+                redis_store.migrate_version_index()
+                # Seed Redis from the file when it holds no prompts yet
+                if not redis_store.list_names() and settings.prompts_file:
+                    prompts = load_prompts(settings.prompts_file)
+                    redis_store.load_many(prompts)
+                    _APPLIED = prompts
                     _SOURCE_PATH = settings.prompts_file
-            if "names" not in locals():
-                use_redis = False
+            except Exception:
+                # Redis unreachable: serve the file for now and probe, migrate and seed
+                # again on the next PromptOven()
+                pass
+            else:
+                _SEEDED = True
+                return
 
-        if not use_redis and not _STORE and settings.prompts_file:
+        if not _STORE and settings.prompts_file:
             try:
-                _STORE = load_prompts_from_file(settings.prompts_file)
+                _APPLIED = load_prompts(settings.prompts_file)
+                _STORE = dict(_APPLIED)
                 _SOURCE_PATH = settings.prompts_file
             except Exception:
                 _STORE = {}
+        # Without Redis the file is the store for good
+        _SEEDED = not settings.redis_url
 
     @property
     def store(self) -> dict[str, PromptRecord]:
@@ -68,7 +97,7 @@ class PromptOven:
         # As a last resort, seed from YAML if available
         if settings.prompts_file:
             with suppress(Exception):
-                prompts = load_prompts_from_file(settings.prompts_file)
+                prompts = load_prompts(settings.prompts_file)
                 # Save to DB
                 with suppress(Exception), db_session() as s:
                     db_save_many_prompts(s, prompts)
@@ -77,53 +106,159 @@ class PromptOven:
                     with suppress(Exception):
                         redis_store.load_many(prompts)
                 global _STORE, _SOURCE_PATH
-                _STORE = prompts
+                _STORE = dict(prompts)
                 _SOURCE_PATH = settings.prompts_file
                 return sorted(list(prompts.keys()))
         return sorted(list(_STORE.keys()))
 
+    def get_cached(self, name: str, version: str | None = None) -> PromptRecord | None:
+        """In-process cache lookup only; never touches Redis, Postgres or the prompt file."""
+        return prompt_cache.get(name, version)
+
     def get(self, name: str, version: str | None = None) -> PromptRecord | None:
+        ensure_invalidation_listener()
+        rec = prompt_cache.get(name, version)
+        CACHE_LOOKUPS.inc("prompt", "miss" if rec is None else "hit")
+        if rec is not None:
+            annotate("tier", "memory")
+            return rec
+        return self._load(name, version)
+
+    def _load(self, name: str, version: str | None) -> PromptRecord | None:
+        rec = self._get_uncached(name, version)
+        if rec is not None:
+            prompt_cache.set(name, version, rec)
+        return rec
+
+    async def aget(self, name: str, version: str | None = None) -> PromptRecord | None:
+        """Async `get`: Redis is read on the shared asyncio pool, slower fallbacks in a thread."""
+        ensure_invalidation_listener()
+        rec = prompt_cache.get(name, version)
+        CACHE_LOOKUPS.inc("prompt", "miss" if rec is None else "hit")
+        if rec is not None:
+            annotate("tier", "memory")
+            return rec
+        if get_settings().redis_url:
+            with suppress(Exception), span("oven.redis"):
+                if version == "latest":
+                    rec = await redis_store.aget_prompt_latest(name)
+                else:
+                    rec = await redis_store.aget_prompt(name, version)
+            if rec is not None:
+                annotate("tier", "redis")
+                prompt_cache.set(name, version, rec)
+                return rec
+        return await asyncio.to_thread(self._load, name, version)
+
+    def get_many(
+        self, names: Iterable[str], versions: Mapping[str, str | None] | None = None
+    ) -> dict[str, PromptRecord]:
+        """Batch `get`: one Redis round trip and one Postgres query for all cache misses.
+
+        `versions` maps names to a version (or "latest"); unlisted names get the default
+        record, as with `get(name)`. Names that cannot be resolved are left out.
+        """
+        ensure_invalidation_listener()
+        versions = versions or {}
+        wanted = {name: versions.get(name) for name in dict.fromkeys(names)}
+        found: dict[str, PromptRecord] = {}
+        for name, version in wanted.items():
+            rec = prompt_cache.get(name, version)
+            if rec is not None:
+                found[name] = rec
+        cached = set(found)
+        CACHE_LOOKUPS.inc("prompt", "hit", amount=len(cached))
+        CACHE_LOOKUPS.inc("prompt", "miss", amount=len(wanted) - len(cached))
+        missing = {n: v for n, v in wanted.items() if n not in found}
+
+        settings = get_settings()
+        if missing and settings.redis_url:
+            with suppress(Exception):
+                records = redis_store.get_many(list(missing.items()))
+                for (name, _), rec in zip(missing.items(), records, strict=True):
+                    if rec is not None:
+                        found[name] = rec
+                missing = {n: v for n, v in missing.items() if n not in found}
+        if missing:
+            with suppress(Exception), db_session() as s:
+                from_db = db_get_prompt_records(s, missing)
+                found.update(from_db)
+                missing = {n: v for n, v in missing.items() if n not in found}
+                # warm Redis if configured
+                if from_db and settings.redis_url:
+                    with suppress(Exception):
+                        redis_store.load_many(from_db)
+        if missing and settings.prompts_file:
+            with suppress(Exception):
+                prompts = load_prompts(settings.prompts_file)
+                for name, version in list(missing.items()):
+                    rec = prompts.get(name)
+                    if rec is not None and version in (None, "latest", rec.version):
+                        found[name] = rec
+                        del missing[name]
+        for name in list(missing):
+            if name in _STORE:
+                found[name] = _STORE[name]
+
+        for name, rec in found.items():
+            if name not in cached:
+                prompt_cache.set(name, wanted[name], rec)
+        return {name: found[name] for name in wanted if name in found}
+
+    def _get_uncached(self, name: str, version: str | None = None) -> PromptRecord | None:
+        rec = self._lookup_tiers(name, version)
+        if rec is None:
+            rec = _STORE.get(name)
+            annotate("tier", "store" if rec is not None else "none")
+        return rec
+
+    def _lookup_tiers(self, name: str, version: str | None) -> PromptRecord | None:
         settings = get_settings()
         if settings.redis_url:
-            try:
+            rec = None
+            with suppress(Exception), span("oven.redis"):
                 if version == "latest":
                     rec = redis_store.get_prompt_latest(name)
                 else:
-                    effective_version = None if version is None else version
-                    rec = redis_store.get_prompt(name, effective_version)
-                if rec is not None:
-                    return rec
-            except Exception:
-                pass
-        with suppress(Exception), db_session() as s:
-            rec = db_get_prompt_record(s, name, None if version in (None, "latest") else version)
+                    rec = redis_store.get_prompt(name, version)
             if rec is not None:
-                # warm Redis if configured
-                if settings.redis_url:
-                    with suppress(Exception):
-                        redis_store.set_prompt(name, rec)
+                annotate("tier", "redis")
                 return rec
+        rec = None
+        with suppress(Exception), span("oven.db"), db_session() as s:
+            rec = db_get_prompt_record(s, name, None if version in (None, "latest") else version)
+        if rec is not None:
+            annotate("tier", "db")
+            # warm Redis if configured
+            if settings.redis_url:
+                with suppress(Exception):
+                    redis_store.set_prompt(name, rec)
+            return rec
         # As a last resort, load from YAML and persist
         if settings.prompts_file:
-            with suppress(Exception):
-                prompts = load_prompts_from_file(settings.prompts_file)
+            with suppress(Exception), span("oven.file"):
+                # Parsed-file cache: a stat per file, no YAML parsing unless it changed
+                prompts = load_prompts(settings.prompts_file)
                 rec = prompts.get(name)
-                if rec:
-                    # Save to DB
-                    with suppress(Exception), db_session() as s:
-                        db_save_many_prompts(s, {name: rec})
-                    # Save to Redis
-                    if settings.redis_url:
-                        with suppress(Exception):
-                            redis_store.set_prompt(name, rec)
-                    global _STORE, _SOURCE_PATH
-                    _STORE[name] = rec
-                    _SOURCE_PATH = settings.prompts_file
-                    return rec
-        return _STORE.get(name)
+            if rec:
+                annotate("tier", "file")
+                # Save to DB
+                with suppress(Exception), db_session() as s:
+                    db_save_many_prompts(s, {name: rec})
+                # Save to Redis
+                if settings.redis_url:
+                    with suppress(Exception):
+                        redis_store.set_prompt(name, rec)
+                global _STORE, _SOURCE_PATH
+                _STORE[name] = rec
+                _SOURCE_PATH = settings.prompts_file
+                return rec
+        return None
 
     def set(self, name: str, prompt: PromptRecord) -> None:
         settings = get_settings()
+        # Other workers are invalidated through the Redis channel published by set_prompt
+        prompt_cache.invalidate([name])
         if settings.redis_url:
             try:
                 redis_store.set_prompt(name, prompt)
@@ -132,26 +267,61 @@ class PromptOven:
                 pass
         _STORE[name] = prompt
 
-    def reload(self, path: str | None = None) -> dict[str, int | str | None]:
-        global _STORE, _SOURCE_PATH
+    def reload(self, path: str | None = None, *, full: bool = False) -> dict[str, int | str | None]:
+        """Re-read the prompt file or directory and push only what changed.
+
+        Unchanged files are served from the parsed-file cache and the result is diffed
+        against what this process last applied, so the cost scales with the changeset;
+        `full` pushes every record regardless.
+        """
+        global _STORE, _SOURCE_PATH, _APPLIED
         file_path = path or _SOURCE_PATH or get_settings().prompts_file
-        if not file_path:
-            _STORE = {}
-            _SOURCE_PATH = None
-            return {"count": 0, "source": None}
+        with _RELOAD_LOCK:
+            if not file_path:
+                prompt_cache.invalidate()
+                _STORE = {}
+                _SOURCE_PATH = None
+                _APPLIED = {}
+                return {"count": 0, "source": None}
+            prompts = load_prompts(file_path)
+            diff = diff_prompts(_APPLIED, prompts)
+            if full:
+                diff.changed.update({n: r for n, r in prompts.items() if n not in diff.added})
+            info = self._apply(diff)
+            _SOURCE_PATH = file_path
+            _APPLIED = prompts
+            return {
+                "count": len(prompts),
+                "source": file_path,
+                "added": len(diff.added),
+                "changed": len(diff.changed),
+                "removed": len(diff.removed),
+                **info,
+            }
+
+    def _apply(self, diff: PromptDiff) -> dict[str, int]:
+        global _STORE
+        if not diff:
+            return {}
+        upserts = diff.upserts
+        # Other workers are invalidated through the Redis channel published by load_many
+        prompt_cache.invalidate([*upserts, *diff.removed])
+        for name in diff.removed:
+            _STORE.pop(name, None)
         settings = get_settings()
-        prompts = load_prompts_from_file(file_path)
         if settings.redis_url:
             try:
-                count = redis_store.load_many(prompts)
-                _SOURCE_PATH = file_path
-                return {"count": count, "source": _SOURCE_PATH}
+                if upserts:
+                    redis_store.load_many(upserts)
+                return {}
             except Exception:
                 pass
         with suppress(Exception), db_session() as s:
-            count = db_save_many_prompts(s, prompts)
-            _SOURCE_PATH = file_path
-            return {"count": count, "source": _SOURCE_PATH}
-        _STORE = prompts
-        _SOURCE_PATH = file_path
-        return {"count": len(_STORE), "source": _SOURCE_PATH}
+            counts = db_bulk_upsert_prompts(s, upserts)
+            return {
+                "inserted": counts.inserted,
+                "updated": counts.updated,
+                "unchanged": counts.unchanged,
+            }
+        _STORE = {**_STORE, **upserts}
+        return {}
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from functools import cached_property
+
+from oven.template import parse_template
 from pydantic import BaseModel
 
 
@@ -9,3 +12,10 @@ class PromptRecord(BaseModel):
     version: str | None = None
     description: str | None = None
     template: str | None = None
+    # Response cache TTL in seconds for chats using this prompt (None: default, 0: disabled)
+    cache_ttl: int | None = None
+
+    @cached_property
+    def variables(self) -> list[str]:
+        """Template variables declared by the system prompt, in first-use order."""
+        return parse_template(self.system).variables
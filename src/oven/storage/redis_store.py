@@ -1,19 +1,42 @@
 from __future__ import annotations
 
+import hashlib
 import json
+from collections.abc import Sequence
+from typing import Any
 
 import redis  # type: ignore[import-untyped]
-from core.config import get_settings
+import redis.asyncio as aioredis  # type: ignore[import-untyped]
+from core.redis import get_async_redis, get_redis
+from oven.cache import INVALIDATION_CHANNEL, encode_invalidation
 from oven.schemas import PromptRecord
+from redis.exceptions import NoScriptError  # type: ignore[import-untyped]
 
 PREFIX = "lor3:prompts"
 
+# Records a version in the name's index and, when it ranks highest, stores its payload as
+# the name's latest record, so reads need no script. KEYS = (version index, latest record),
+# which share the name's hash tag (one Redis Cluster slot); ARGV = (version, score, payload)
+_INDEX_LUA = """
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+if redis.call('ZREVRANGE', KEYS[1], 0, 0)[1] == ARGV[1] then
+  redis.call('SET', KEYS[2], ARGV[3])
+end
+return 1
+"""
+_INDEX_SHA = hashlib.sha1(_INDEX_LUA.encode()).hexdigest()
+# Bumped when the version index layout changes; see migrate_version_index
+SCHEMA_KEY = f"{PREFIX}:schema"
+SCHEMA_VERSION = "2"
+
 
 def _client() -> redis.Redis:
-    settings = get_settings()
-    if not settings.redis_url:
-        raise RuntimeError("REDIS_URL not configured")
-    return redis.from_url(settings.redis_url, decode_responses=True)
+    # Process-wide pooled client; raises RuntimeError when REDIS_URL is not configured
+    return get_redis()
+
+
+def _aclient() -> aioredis.Redis:
+    return get_async_redis()
 
 
 def _key(name: str, version: str | None = None) -> str:
@@ -22,6 +45,44 @@ def _key(name: str, version: str | None = None) -> str:
     return f"{PREFIX}:{name}"
 
 
+def _index_key(name: str) -> str:
+    return f"{PREFIX}:index:{{{name}}}"
+
+
+def _latest_key(name: str) -> str:
+    return f"{PREFIX}:latest:{{{name}}}"
+
+
+def _legacy_versions_key(name: str) -> str:
+    # Unordered version set written before the index existed; still written for old workers
+    return f"{PREFIX}:versions:{name}"
+
+
+def _version_score(version: str) -> int:
+    """Numeric versions ("3", "v12") rank by value above every non-numeric version.
+
+    Non-numeric versions share score -1, so among themselves the sorted set orders them
+    lexicographically, matching the old in-Python resolution of `latest_version`.
+    """
+    vv = version.lower().lstrip("v")
+    return int(vv) if vv.isdigit() else -1
+
+
+def _latest_keys(names: Sequence[str]) -> list[str]:
+    # Latest record first, then the unversioned key as the fallback
+    return [key for name in names for key in (_latest_key(name), _key(name))]
+
+
+def _first(raws: Sequence[str | None]) -> list[str | None]:
+    return [raws[i] or raws[i + 1] for i in range(0, len(raws), 2)]
+
+
+def _decode(raw: str | None) -> PromptRecord | None:
+    if not raw:
+        return None
+    return PromptRecord(**json.loads(raw))
+
+
 def list_names() -> list[str]:
     r = _client()
     names = r.smembers(f"{PREFIX}:names")
@@ -30,74 +91,166 @@ def list_names() -> list[str]:
 
 def list_versions(name: str) -> list[str]:
     r = _client()
-    versions = r.smembers(f"{PREFIX}:versions:{name}")
-    return sorted(list(versions)) if versions else []
+    versions = r.zrange(_index_key(name), 0, -1)
+    return sorted(versions) if versions else []
 
 
 def get_prompt(name: str, version: str | None = None) -> PromptRecord | None:
-    r = _client()
-    raw = r.get(_key(name, version))
-    if not raw:
-        return None
-    data = json.loads(raw)
-    return PromptRecord(**data)
+    return _decode(_client().get(_key(name, version)))
+
+
+async def aget_prompt(name: str, version: str | None = None) -> PromptRecord | None:
+    return _decode(await _aclient().get(_key(name, version)))
 
 
 def latest_version(name: str) -> str | None:
-    versions = list_versions(name)
-    if not versions:
-        return None
-    numeric_pairs: list[tuple[int, str]] = []
-    for v in versions:
-        vv = v.lower().lstrip("v")
-        if vv.isdigit():
-            numeric_pairs.append((int(vv), v))
-    if numeric_pairs:
-        return max(numeric_pairs, key=lambda x: x[0])[1]
-    return versions[-1]
+    top = _client().zrevrange(_index_key(name), 0, 0)
+    return top[0] if top else None
 
 
 def get_prompt_latest(name: str) -> PromptRecord | None:
-    ver = latest_version(name)
-    # Prefer explicit latest version if available; otherwise fall back to unversioned key
-    rec = get_prompt(name, ver) if ver is not None else None
-    if rec is not None:
-        return rec
-    return get_prompt(name, None)
+    """Latest version of `name` (else the unversioned key) in a single round trip."""
+    with _client().pipeline(transaction=False) as p:
+        for key in _latest_keys([name]):
+            p.get(key)
+        return _decode(_first(p.execute())[0])
 
 
-def set_prompt(name: str, record: PromptRecord) -> None:
+async def aget_prompt_latest(name: str) -> PromptRecord | None:
+    async with _aclient().pipeline(transaction=False) as p:
+        for key in _latest_keys([name]):
+            p.get(key)
+        return _decode(_first(await p.execute())[0])
+
+
+def get_many(requests: Sequence[tuple[str, str | None]]) -> list[PromptRecord | None]:
+    """Fetch many (name, version) pairs in one pipelined round trip, in request order.
+
+    Explicit and unversioned lookups share one MGET; "latest" lookups read each name's
+    latest record with its unversioned key as the fallback.
+    """
+    if not requests:
+        return []
+    exact = [
+        (i, _key(name, version))
+        for i, (name, version) in enumerate(requests)
+        if version != "latest"
+    ]
+    latest = [(i, name) for i, (name, version) in enumerate(requests) if version == "latest"]
+    with _client().pipeline(transaction=False) as p:
+        if exact:
+            p.mget([key for _, key in exact])
+        for key in _latest_keys([name for _, name in latest]):
+            p.get(key)
+        replies = p.execute()
+
+    out: list[PromptRecord | None] = [None] * len(requests)
+    if exact:
+        for (i, _), raw in zip(exact, replies[0], strict=True):
+            out[i] = _decode(raw)
+    for (i, _), raw in zip(latest, _first(replies[1 if exact else 0 :]), strict=True):
+        out[i] = _decode(raw)
+    return out
+
+
+def _index(p: Any, name: str, version: str, payload: str) -> None:
+    p.sadd(_legacy_versions_key(name), version)
+    keys = (_index_key(name), _latest_key(name))
+    p.evalsha(_INDEX_SHA, len(keys), *keys, version, _version_score(version), payload)
+
+
+def _execute_writes(build: Any) -> None:
+    """Run a write pipeline that indexes versions, loading the script on NOSCRIPT.
+
+    Every write in it is idempotent, so replaying the batch after loading is safe.
+    """
     r = _client()
-    with r.pipeline(transaction=False) as p:
-        payload = json.dumps(record.model_dump())
+    try:
+        with r.pipeline(transaction=False) as p:
+            build(p)
+            p.execute()
+    except NoScriptError:
+        r.script_load(_INDEX_LUA)
+        with r.pipeline(transaction=False) as p:
+            build(p)
+            p.execute()
+
+
+def set_prompt(name: str, record: PromptRecord) -> None:
+    payload = json.dumps(record.model_dump())
+
+    def build(p: Any) -> None:
         # Set versioned key
         p.set(_key(name, record.version), payload)
         # Also set unversioned "latest" key for convenience
         p.set(_key(name, None), payload)
         p.sadd(f"{PREFIX}:names", name)
         if record.version:
-            p.sadd(f"{PREFIX}:versions:{name}", record.version)
-        p.execute()
+            _index(p, name, record.version, payload)
+        # Tell every worker's in-process prompt cache to drop this name
+        p.publish(INVALIDATION_CHANNEL, encode_invalidation([name]))
+
+    _execute_writes(build)
 
 
 def load_many(prompts: dict[str, PromptRecord]) -> int:
     if not prompts:
         return 0
-    r = _client()
-    with r.pipeline(transaction=False) as p:
+    payloads = {name: json.dumps(rec.model_dump()) for name, rec in prompts.items()}
+
+    def build(p: Any) -> None:
         for name, rec in prompts.items():
-            payload = json.dumps(rec.model_dump())
             # Set versioned key
-            p.set(_key(name, rec.version), payload)
+            p.set(_key(name, rec.version), payloads[name])
             # Set unversioned "latest" key
-            p.set(_key(name, None), payload)
+            p.set(_key(name, None), payloads[name])
             p.sadd(f"{PREFIX}:names", name)
             if rec.version:
-                p.sadd(f"{PREFIX}:versions:{name}", rec.version)
-        p.execute()
+                _index(p, name, rec.version, payloads[name])
+        p.publish(INVALIDATION_CHANNEL, encode_invalidation(prompts.keys()))
+
+    _execute_writes(build)
     return len(prompts)
 
 
+def migrate_version_index() -> int:
+    """Build the version index and latest records for prompts stored before they existed.
+
+    Earlier deployments kept versions only in an unordered set per name (and briefly in an
+    index without a hash tag). One-shot: guarded by `SCHEMA_KEY`, and safe to re-run.
+    Returns the number of names indexed.
+    """
+    r = _client()
+    if r.get(SCHEMA_KEY) == SCHEMA_VERSION:
+        return 0
+    names = list_names()
+    with r.pipeline(transaction=False) as p:
+        for name in names:
+            p.smembers(_legacy_versions_key(name))
+            p.zrange(f"{PREFIX}:index:{name}", 0, -1)
+        found = p.execute()
+    versions = {
+        name: set(found[2 * i]) | set(found[2 * i + 1])
+        for i, name in enumerate(names)
+        if found[2 * i] or found[2 * i + 1]
+    }
+    latest = {name: max(vs, key=lambda v: (_version_score(v), v)) for name, vs in versions.items()}
+    with r.pipeline(transaction=False) as p:
+        for name, version in latest.items():
+            p.get(_key(name, version))
+        payloads = dict(zip(latest, p.execute(), strict=True))
+    with r.pipeline(transaction=False) as p:
+        for name, vs in versions.items():
+            p.zadd(_index_key(name), {v: _version_score(v) for v in vs})
+            if payloads[name]:
+                p.set(_latest_key(name), payloads[name])
+        p.set(SCHEMA_KEY, SCHEMA_VERSION)
+        if versions:
+            p.publish(INVALIDATION_CHANNEL, encode_invalidation(versions))
+        p.execute()
+    return len(versions)
+
+
 def clear() -> None:
     r = _client()
     names = list_names()
@@ -105,9 +258,14 @@ def clear() -> None:
         return
     with r.pipeline(transaction=False) as p:
         for name in names:
-            p.delete(_key(name))
+            # One key per DEL: a name's keys live in different cluster slots
+            for key in (
+                _key(name),
+                _index_key(name),
+                _latest_key(name),
+                _legacy_versions_key(name),
+            ):
+                p.delete(key)
         p.delete(f"{PREFIX}:names")
+        p.publish(INVALIDATION_CHANNEL, encode_invalidation(None))
         p.execute()
-
-
-# Placeholder for Redis-backed prompt cache implementation
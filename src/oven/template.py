@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from string import Template
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A `string.Template` body pre-split into literal segments and variable slots.
+
+    `literals` always has one more element than `slots`; rendering interleaves them, so a
+    render is a single join. Each slot keeps its original placeholder text, which is
+    emitted for missing variables exactly like `Template.safe_substitute`.
+    """
+
+    source: str
+    literals: tuple[str, ...]
+    slots: tuple[tuple[str, str], ...]
+
+    @property
+    def variables(self) -> list[str]:
+        """Declared variable names in first-use order."""
+        return list(dict.fromkeys(name for name, _ in self.slots))
+
+    def missing(self, variables: Mapping[str, object]) -> list[str]:
+        return [name for name in self.variables if name not in variables]
+
+    def render(self, variables: Mapping[str, object]) -> str:
+        parts = [self.literals[0]]
+        for (name, placeholder), literal in zip(self.slots, self.literals[1:], strict=True):
+            value = variables.get(name)
+            parts.append(placeholder if value is None else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+
+def parse_template(text: str) -> CompiledTemplate:
+    literals: list[str] = []
+    slots: list[tuple[str, str]] = []
+    buf: list[str] = []
+    pos = 0
+    for mo in Template.pattern.finditer(text):
+        buf.append(text[pos : mo.start()])
+        pos = mo.end()
+        name = mo.group("named") or mo.group("braced")
+        if name is not None:
+            literals.append("".join(buf))
+            buf = []
+            slots.append((name, mo.group()))
+        elif mo.group("escaped") is not None:
+            buf.append(Template.delimiter)
+        else:
+            # Invalid placeholder: safe_substitute leaves it untouched
+            buf.append(mo.group())
+    buf.append(text[pos:])
+    literals.append("".join(buf))
+    return CompiledTemplate(source=text, literals=tuple(literals), slots=tuple(slots))
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterator
+from contextlib import suppress
+from pathlib import Path
+
+from core.config import get_settings
+from oven.loader import prompt_files
+from oven.manager import PromptOven
+
+_WATCHER: threading.Thread | None = None
+_STOP = threading.Event()
+_LOCK = threading.Lock()
+
+
+def _watchfiles_available() -> bool:
+    try:
+        import watchfiles  # type: ignore[import-not-found]  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _signature(path: str) -> tuple[tuple[str, int, int], ...]:
+    try:
+        files = prompt_files(path)
+    except FileNotFoundError:
+        return ()
+    sig = []
+    for f in files:
+        with suppress(FileNotFoundError):
+            stat = f.stat()
+            sig.append((str(f), stat.st_mtime_ns, stat.st_size))
+    return tuple(sig)
+
+
+def _changes(path: str, interval: float, stop: threading.Event) -> Iterator[None]:
+    """Yield once per batch of filesystem changes under `path` until `stop` is set."""
+    if _watchfiles_available():
+        import watchfiles  # type: ignore[import-not-found]
+
+        # inotify/FSEvents through watchfiles; watch the parent so file replacement
+        # (editors writing a temp file and renaming it) is seen too
+        target = path if Path(path).is_dir() else str(Path(path).parent)
+        for _ in watchfiles.watch(target, stop_event=stop, rust_timeout=int(interval * 1000)):
+            yield
+        return
+    last = _signature(path)
+    while not stop.wait(interval):
+        current = _signature(path)
+        if current != last:
+            last = current
+            yield
+
+
+def _run(path: str, interval: float, stop: threading.Event) -> None:
+    oven = PromptOven()
+    for _ in _changes(path, interval, stop):
+        # A half-written or invalid file keeps the last good catalogue until the next edit
+        with suppress(Exception):
+            oven.reload(path)
+
+
+def ensure_prompt_watcher() -> None:
+    """Start (once per process) the thread applying prompt file edits when enabled."""
+    global _WATCHER
+    settings = get_settings()
+    if not settings.prompts_watch or not settings.prompts_file:
+        return
+    with _LOCK:
+        if _WATCHER is not None and _WATCHER.is_alive():
+            return
+        _STOP.clear()
+        _WATCHER = threading.Thread(
+            target=_run,
+            args=(settings.prompts_file, settings.prompts_watch_interval, _STOP),
+            name="prompt-watcher",
+            daemon=True,
+        )
+        _WATCHER.start()
+
+
+def stop_prompt_watcher(timeout: float = 5.0) -> None:
+    global _WATCHER
+    with _LOCK:
+        watcher, _WATCHER = _WATCHER, None
+    if watcher is not None:
+        _STOP.set()
+        watcher.join(timeout)
@@ -1,6 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Mapping, Sequence
 from typing import Tuple
 
+# Earlier conversation turns sent before the prompt: [{"role": "user"|"assistant", ...}]
+History = Sequence[Mapping[str, str]]
+
 
 class Provider(ABC):
     name: str
@@ -12,6 +17,42 @@ class Provider(ABC):
         *,
         output_format: str = "markdown",
         system: str | None = None,
+        history: History | None = None,
     ) -> Tuple[str, str]:
         """Return (content, provider_name)."""
         raise NotImplementedError
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        """Async variant of `generate`.
+
+        Providers with a native async client should override this; the default runs the
+        blocking `generate` in a worker thread so sync-only providers keep working.
+        """
+        return await asyncio.to_thread(
+            self.generate, prompt, output_format=output_format, system=system, history=history
+        )
+
+    async def astream(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield content deltas as they arrive.
+
+        The default yields the whole `agenerate` result as a single delta; providers with
+        a native streaming API override this.
+        """
+        content, _ = await self.agenerate(
+            prompt, output_format=output_format, system=system, history=history
+        )
+        yield content
@@ -1,14 +1,125 @@
-from typing import Tuple
+from collections.abc import AsyncIterator
+from typing import Any, Tuple
 
-from providers.base import Provider
+from core.config import get_settings
+from providers.base import History, Provider
+from providers.clients import get_async_client, get_client
+from providers.sse import iter_sse_data
+
+ANTHROPIC_VERSION = "2023-06-01"
+MAX_OUTPUT_TOKENS = 1024
+
+
+def _turns(history: History | None) -> list[dict[str, str]]:
+    """History as Messages API turns: user first, roles alternating (merging repeats)."""
+    turns: list[dict[str, str]] = []
+    for turn in history or []:
+        role = turn.get("role")
+        if role not in ("user", "assistant") or (not turns and role != "user"):
+            continue
+        if turns and turns[-1]["role"] == role:
+            turns[-1]["content"] += "\n\n" + turn["content"]
+        else:
+            turns.append({"role": role, "content": turn["content"]})
+    return turns
+
+
+def _messages(prompt: str, history: History | None) -> list[dict[str, str]]:
+    turns = _turns(history)
+    # The prompt is the final user turn; a dangling user turn in history is merged into it
+    if turns and turns[-1]["role"] == "user":
+        prompt = f"{turns.pop()['content']}\n\n{prompt}"
+    return [*turns, {"role": "user", "content": prompt}]
 
 
 class ClaudeProvider(Provider):
     name = "claude:opus"
 
+    def _placeholder(self, prompt: str, output_format: str) -> Tuple[str, str]:
+        # Placeholder implementation for local development without a key (system ignored)
+        return (f"[Claude response in {output_format}] {prompt}", self.name)
+
+    def _request(
+        self, prompt: str, system: str | None, history: History | None
+    ) -> tuple[dict[str, str], dict[str, Any]]:
+        settings = get_settings()
+        headers = {
+            "x-api-key": settings.anthropic_api_key or "",
+            "anthropic-version": ANTHROPIC_VERSION,
+            "content-type": "application/json",
+        }
+        payload: dict[str, Any] = {
+            "model": "claude-3-opus-20240229",
+            "max_tokens": MAX_OUTPUT_TOKENS,
+            "messages": _messages(prompt, history),
+        }
+        if system:
+            payload["system"] = system
+        return headers, payload
+
+    def _parse(self, data: dict[str, Any]) -> Tuple[str, str]:
+        try:
+            content = "".join(
+                block["text"] for block in data["content"] if block.get("type") == "text"
+            )
+        except Exception as exc:  # noqa: BLE001
+            raise RuntimeError(f"Claude response parsing failed: {data}") from exc
+        return (content, self.name)
+
     def generate(
-        self, prompt: str, *, output_format: str = "markdown", system: str | None = None
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
     ) -> Tuple[str, str]:
-        # Placeholder implementation (system ignored for now)
-        _ = system
-        return (f"[Claude response in {output_format}] {prompt}", self.name)
+        if not get_settings().anthropic_api_key:
+            return self._placeholder(prompt, output_format)
+        headers, payload = self._request(prompt, system, history)
+        resp = get_client("anthropic").post("/messages", headers=headers, json=payload)
+        resp.raise_for_status()
+        return self._parse(resp.json())
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        if not get_settings().anthropic_api_key:
+            return self._placeholder(prompt, output_format)
+        headers, payload = self._request(prompt, system, history)
+        resp = await get_async_client("anthropic").post("/messages", headers=headers, json=payload)
+        resp.raise_for_status()
+        return self._parse(resp.json())
+
+    async def astream(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> AsyncIterator[str]:
+        if not get_settings().anthropic_api_key:
+            yield self._placeholder(prompt, output_format)[0]
+            return
+        headers, payload = self._request(prompt, system, history)
+        payload["stream"] = True
+        async with get_async_client("anthropic").stream(
+            "POST", "/messages", headers=headers, json=payload
+        ) as resp:
+            resp.raise_for_status()
+            async for event in iter_sse_data(resp):
+                kind = event.get("type")
+                if kind == "content_block_delta":
+                    text = event.get("delta", {}).get("text")
+                    if text:
+                        yield text
+                elif kind == "error":
+                    raise RuntimeError(f"Claude stream error: {event.get('error')}")
+                elif kind == "message_stop":
+                    return
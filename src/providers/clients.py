@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any
+
+import httpx
+from core.config import HttpClientSettings, get_settings
+
+# One pooled client per upstream, shared by every request in the process
+_CLIENTS: dict[str, httpx.Client] = {}
+# Async clients are bound to the event loop that created them
+_ASYNC_CLIENTS: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+_LOCK = threading.Lock()
+
+_UPSTREAM_SETTINGS = {
+    "openai": "openai_http",
+    "anthropic": "anthropic_http",
+}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # type: ignore[import-untyped]  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def http_settings(upstream: str) -> HttpClientSettings:
+    attr = _UPSTREAM_SETTINGS.get(upstream)
+    if attr is None:
+        raise KeyError(f"Unknown upstream: {upstream}")
+    cfg: HttpClientSettings = getattr(get_settings(), attr)
+    return cfg
+
+
+def client_options(cfg: HttpClientSettings) -> dict[str, Any]:
+    return {
+        "base_url": cfg.base_url,
+        # HTTP/2 needs the optional `h2` package; fall back to pooled HTTP/1.1 without it
+        "http2": cfg.http2 and _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive_connections,
+            keepalive_expiry=cfg.keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(
+            connect=cfg.connect_timeout,
+            read=cfg.read_timeout,
+            write=cfg.read_timeout,
+            pool=cfg.connect_timeout,
+        ),
+    }
+
+
+def get_client(upstream: str) -> httpx.Client:
+    client = _CLIENTS.get(upstream)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(upstream)
+        if client is None:
+            client = httpx.Client(**client_options(http_settings(upstream)))
+            _CLIENTS[upstream] = client
+    return client
+
+
+def get_async_client(upstream: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    entry = _ASYNC_CLIENTS.get(upstream)
+    if entry is not None and entry[0] is loop:
+        return entry[1]
+    with _LOCK:
+        entry = _ASYNC_CLIENTS.get(upstream)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, httpx.AsyncClient(**client_options(http_settings(upstream))))
+            _ASYNC_CLIENTS[upstream] = entry
+    return entry[1]
+
+
+async def aclose_clients() -> None:
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        entries = list(_ASYNC_CLIENTS.values())
+        _ASYNC_CLIENTS.clear()
+    for owner, client in entries:
+        if owner is loop:
+            await client.aclose()
+    close_clients()
+
+
+def close_clients() -> None:
+    with _LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
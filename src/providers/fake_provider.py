@@ -0,0 +1,76 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from typing import Tuple
+
+from providers.base import History, Provider
+
+
+class FakeProvider(Provider):
+    """Deterministic in-process provider for tests and benchmarks.
+
+    Echoes the prompt after `latency` seconds, or raises when `fail` is set.
+    """
+
+    def __init__(self, name: str = "fake:echo", *, latency: float = 0.0, fail: bool = False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        # Last request seen, for tests asserting on what the router sent
+        self.last_prompt: str | None = None
+        self.last_system: str | None = None
+        self.last_history: list[dict[str, str]] = []
+
+    def _record(self, prompt: str, system: str | None, history: History | None) -> None:
+        self.calls += 1
+        self.last_prompt = prompt
+        self.last_system = system
+        self.last_history = [dict(turn) for turn in history or []]
+
+    def _respond(self, prompt: str, output_format: str) -> Tuple[str, str]:
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return (f"[{self.name} {output_format}] {prompt}", self.name)
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        self._record(prompt, system, history)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt, output_format)
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        self._record(prompt, system, history)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt, output_format)
+
+    async def astream(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> AsyncIterator[str]:
+        content, _ = await self.agenerate(
+            prompt, output_format=output_format, system=system, history=history
+        )
+        # Emit word-sized deltas so consumers see a multi-chunk stream
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else f"{word} "
@@ -1,16 +1,26 @@
-from typing import Tuple
+from collections.abc import AsyncIterator
+from typing import Any, Tuple
 
-import httpx
 from core.config import get_settings
-from providers.base import Provider
+from providers.base import History, Provider
+from providers.clients import get_async_client, get_client
+from providers.sse import iter_sse_data
+
+
+def _turns(history: History | None) -> list[dict[str, str]]:
+    return [
+        {"role": turn["role"], "content": turn["content"]}
+        for turn in history or []
+        if turn.get("role") in ("user", "assistant")
+    ]
 
 
 class OpenAIProvider(Provider):
     name = "openai:gpt-4"
 
-    def generate(
-        self, prompt: str, *, _output_format: str = "markdown", system: str | None = None
-    ) -> Tuple[str, str]:
+    def _request(
+        self, prompt: str, system: str | None, history: History | None
+    ) -> tuple[dict[str, str], dict[str, Any]]:
         settings = get_settings()
         if not settings.openai_api_key:
             raise RuntimeError("OPENAI_API_KEY not configured")
@@ -24,20 +34,69 @@ class OpenAIProvider(Provider):
         messages = []
         if system:
             messages.append({"role": "system", "content": system})
+        messages.extend(_turns(history))
         messages.append({"role": "user", "content": prompt})
         payload = {
             "model": "gpt-4o-mini",  # a small default; can be switched via config later
             "messages": messages,
         }
-        with httpx.Client(timeout=30) as client:
-            resp = client.post(
-                "https://api.openai.com/v1/chat/completions", headers=headers, json=payload
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        return headers, payload
+
+    def _parse(self, data: dict[str, Any]) -> Tuple[str, str]:
         try:
             content = data["choices"][0]["message"]["content"]
         except Exception as exc:  # noqa: BLE001
             raise RuntimeError(f"OpenAI response parsing failed: {data}") from exc
-
         return (content, self.name)
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        _ = output_format
+        headers, payload = self._request(prompt, system, history)
+        # Pooled keep-alive client shared across requests (see providers.clients)
+        resp = get_client("openai").post("/chat/completions", headers=headers, json=payload)
+        resp.raise_for_status()
+        return self._parse(resp.json())
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        _ = output_format
+        headers, payload = self._request(prompt, system, history)
+        resp = await get_async_client("openai").post(
+            "/chat/completions", headers=headers, json=payload
+        )
+        resp.raise_for_status()
+        return self._parse(resp.json())
+
+    async def astream(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> AsyncIterator[str]:
+        _ = output_format
+        headers, payload = self._request(prompt, system, history)
+        payload["stream"] = True
+        async with get_async_client("openai").stream(
+            "POST", "/chat/completions", headers=headers, json=payload
+        ) as resp:
+            resp.raise_for_status()
+            async for event in iter_sse_data(resp):
+                choices = event.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
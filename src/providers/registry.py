@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import threading
+
+from providers.base import Provider
+from providers.claude_provider import ClaudeProvider
+from providers.openai_provider import OpenAIProvider
+
+# Providers are stateless adapters over the pooled clients, so build them once per process
+_PROVIDERS: dict[str, Provider] = {}
+_LOCK = threading.Lock()
+
+
+def _ensure_defaults() -> None:
+    if _PROVIDERS:
+        return
+    with _LOCK:
+        if not _PROVIDERS:
+            for provider in (OpenAIProvider(), ClaudeProvider()):
+                _PROVIDERS[provider.name] = provider
+
+
+def get_provider(key: str) -> Provider | None:
+    _ensure_defaults()
+    return _PROVIDERS.get(key)
+
+
+def register_provider(provider: Provider) -> None:
+    _ensure_defaults()
+    with _LOCK:
+        _PROVIDERS[provider.name] = provider
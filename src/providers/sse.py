@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+
+
+async def iter_sse_data(resp: httpx.Response) -> AsyncIterator[dict[str, Any]]:
+    """Yield decoded JSON payloads from an upstream `text/event-stream` response."""
+    async for line in resp.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data:
+            continue
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+from core.config import Settings, get_settings
+from core.redis import get_redis
+from providers.base import Provider
+
+PREFIX = "lor3:health"
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class WindowStats:
+    calls: int = 0
+    errors: int = 0
+    slow: int = 0
+    latency_ms: float = 0.0
+
+    def add(self, other: WindowStats) -> None:
+        self.calls += other.calls
+        self.errors += other.errors
+        self.slow += other.slow
+        self.latency_ms += other.latency_ms
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+    @property
+    def slow_rate(self) -> float:
+        return self.slow / self.calls if self.calls else 0.0
+
+    @property
+    def mean_latency_ms(self) -> float:
+        return self.latency_ms / self.calls if self.calls else 0.0
+
+
+class CircuitBreaker:
+    """Per-provider breaker over a rolling window of one-second buckets.
+
+    Closed breakers open when the window's error rate or slow-call rate crosses its
+    threshold; after the cooldown a single half-open probe decides whether to close again.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = BreakerState.CLOSED
+        self.opened_until = 0.0
+        self.reason: str | None = None
+        self._reset_at = 0.0
+        self._probe_inflight = False
+        self._publish_open = False
+        self._local: dict[int, WindowStats] = {}
+        self._unflushed: dict[int, WindowStats] = {}
+        self._remote: dict[int, WindowStats] | None = None
+        self._lock = threading.Lock()
+
+    def _tick(self, now: float) -> None:
+        if self.state is BreakerState.OPEN and now >= self.opened_until:
+            self.state = BreakerState.HALF_OPEN
+            self._probe_inflight = False
+
+    def available(self, now: float | None = None) -> bool:
+        self._tick(time.time() if now is None else now)
+        if self.state is BreakerState.OPEN:
+            return False
+        return not (self.state is BreakerState.HALF_OPEN and self._probe_inflight)
+
+    def begin(self) -> None:
+        """Mark the start of a call; in half-open state it becomes the recovery probe."""
+        with self._lock:
+            self._tick(time.time())
+            if self.state is BreakerState.HALF_OPEN:
+                self._probe_inflight = True
+
+    def abandon(self) -> None:
+        """Release the probe slot of a call that was cancelled before it finished."""
+        with self._lock:
+            self._probe_inflight = False
+
+    def stats(self, settings: Settings, now: float | None = None) -> WindowStats:
+        now = time.time() if now is None else now
+        oldest = max(int(now) - settings.breaker_window_seconds + 1, int(self._reset_at))
+        total = WindowStats()
+        sources = [self._local] if self._remote is None else [self._remote, self._unflushed]
+        for buckets in sources:
+            for second, bucket in list(buckets.items()):
+                if second >= oldest:
+                    total.add(bucket)
+        return total
+
+    def health_score(self, settings: Settings) -> float:
+        if self.state is BreakerState.OPEN:
+            return 0.0
+        window = self.stats(settings)
+        return round(1.0 - max(window.error_rate, window.slow_rate), 4)
+
+    def record(self, ok: bool, latency: float, settings: Settings) -> None:
+        now = time.time()
+        second = int(now)
+        sample = WindowStats(
+            calls=1,
+            errors=0 if ok else 1,
+            slow=1 if latency * 1000 >= settings.breaker_slow_call_ms else 0,
+            latency_ms=latency * 1000,
+        )
+        with self._lock:
+            for buckets in (self._local, self._unflushed):
+                buckets.setdefault(second, WindowStats()).add(sample)
+            horizon = second - settings.breaker_window_seconds
+            for stale in [s for s in self._local if s <= horizon]:
+                del self._local[stale]
+
+            if self.state is BreakerState.HALF_OPEN:
+                self._probe_inflight = False
+                if ok and not sample.slow:
+                    self._close(now)
+                else:
+                    self._open(now, "half-open probe failed", settings)
+                return
+            if self.state is BreakerState.CLOSED:
+                window = self.stats(settings, now)
+                if window.calls < settings.breaker_min_calls:
+                    return
+                if window.error_rate >= settings.breaker_error_threshold:
+                    self._open(now, f"error rate {window.error_rate:.0%}", settings)
+                elif window.slow_rate >= settings.breaker_slow_threshold:
+                    self._open(now, f"slow call rate {window.slow_rate:.0%}", settings)
+
+    def _open(self, now: float, reason: str, settings: Settings) -> None:
+        self.state = BreakerState.OPEN
+        self.opened_until = now + settings.breaker_cooldown_seconds
+        self.reason = reason
+        self._publish_open = True
+
+    def _close(self, now: float) -> None:
+        self.state = BreakerState.CLOSED
+        self.reason = None
+        # Errors observed before recovery must not immediately re-open the breaker
+        self._reset_at = now
+
+    def snapshot(self, settings: Settings) -> dict[str, Any]:
+        self._tick(time.time())
+        window = self.stats(settings)
+        return {
+            "provider": self.name,
+            "state": self.state.value,
+            "reason": self.reason,
+            "opened_until": self.opened_until if self.state is BreakerState.OPEN else None,
+            "health_score": self.health_score(settings),
+            "window": {
+                "calls": window.calls,
+                "error_rate": round(window.error_rate, 4),
+                "slow_rate": round(window.slow_rate, 4),
+                "mean_latency_ms": round(window.mean_latency_ms, 1),
+            },
+            "shared": self._remote is not None,
+        }
+
+
+class BreakerBoard:
+    """All provider breakers of the process, optionally synchronised through Redis.
+
+    Each worker pushes its unflushed bucket deltas and pulls the fleet-wide buckets and
+    open-breaker markers at most once per `health_sync_interval`, in one pipeline.
+    """
+
+    def __init__(self) -> None:
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._syncing = False
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name))
+        return breaker
+
+    def order(self, route: Sequence[Provider]) -> list[Provider]:
+        """Drop providers with open breakers and demote unhealthy ones, keeping config order.
+
+        When every breaker rejects traffic the configured route is returned unchanged, so a
+        fleet-wide outage degrades to plain fallback rather than refusing all requests.
+        """
+        settings = get_settings()
+        healthy: list[Provider] = []
+        degraded: list[tuple[float, int, Provider]] = []
+        for index, provider in enumerate(route):
+            breaker = self.breaker(provider.name)
+            if not breaker.available():
+                continue
+            score = breaker.health_score(settings)
+            if score >= settings.health_demote_below:
+                healthy.append(provider)
+            else:
+                degraded.append((-score, index, provider))
+        ordered = healthy + [p for _, _, p in sorted(degraded, key=lambda item: item[:2])]
+        return ordered or list(route)
+
+    def record(self, name: str, *, ok: bool, latency: float) -> None:
+        self.breaker(name).record(ok, latency, get_settings())
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        settings = get_settings()
+        return [b.snapshot(settings) for b in list(self._breakers.values())]
+
+    async def maybe_sync(self) -> None:
+        settings = get_settings()
+        if not settings.redis_url or self._syncing:
+            return
+        if time.monotonic() - self._last_sync < settings.health_sync_interval:
+            return
+        self._syncing = True
+        try:
+            await asyncio.to_thread(self.sync, settings)
+        finally:
+            self._last_sync = time.monotonic()
+            self._syncing = False
+
+    def sync(self, settings: Settings) -> None:
+        breakers = list(self._breakers.values())
+        if not breakers:
+            return
+        now = time.time()
+        seconds = range(int(now) - settings.breaker_window_seconds + 1, int(now) + 1)
+        ttl = settings.breaker_window_seconds * 2
+        try:
+            r = get_redis()
+            with r.pipeline(transaction=False) as p:
+                writes = 0
+                for b in breakers:
+                    with b._lock:
+                        unflushed, b._unflushed = b._unflushed, {}
+                        publish, b._publish_open = b._publish_open, False
+                    for second, delta in unflushed.items():
+                        key = f"{PREFIX}:{b.name}:{second}"
+                        p.hincrby(key, "calls", delta.calls)
+                        p.hincrby(key, "errors", delta.errors)
+                        p.hincrby(key, "slow", delta.slow)
+                        p.hincrbyfloat(key, "latency_ms", delta.latency_ms)
+                        p.expire(key, ttl)
+                        writes += 5
+                    if publish and b.state is BreakerState.OPEN:
+                        payload = {"opened_until": b.opened_until, "reason": b.reason}
+                        cooldown_ms = max(1, int((b.opened_until - now) * 1000))
+                        p.set(f"{PREFIX}:breaker:{b.name}", json.dumps(payload), px=cooldown_ms)
+                        writes += 1
+                for b in breakers:
+                    for second in seconds:
+                        p.hgetall(f"{PREFIX}:{b.name}:{second}")
+                    p.get(f"{PREFIX}:breaker:{b.name}")
+                results = p.execute()[writes:]
+        except Exception:
+            # Redis unavailable: fall back to this worker's local windows
+            for b in breakers:
+                b._remote = None
+            return
+
+        per_breaker = len(seconds) + 1
+        for i, b in enumerate(breakers):
+            chunk = results[i * per_breaker : (i + 1) * per_breaker]
+            remote: dict[int, WindowStats] = {}
+            for second, raw in zip(seconds, chunk[:-1], strict=True):
+                if raw:
+                    remote[second] = WindowStats(
+                        calls=int(raw.get("calls", 0)),
+                        errors=int(raw.get("errors", 0)),
+                        slow=int(raw.get("slow", 0)),
+                        latency_ms=float(raw.get("latency_ms", 0.0)),
+                    )
+            marker = chunk[-1]
+            with b._lock:
+                b._remote = remote
+                if marker and b.state is BreakerState.CLOSED:
+                    data = json.loads(marker)
+                    b.state = BreakerState.OPEN
+                    b.opened_until = float(data["opened_until"])
+                    b.reason = f"opened by another worker: {data.get('reason')}"
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+from core.config import Settings
+from providers.base import Provider
+
+T = TypeVar("T")
+
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per provider."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._window = window
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        samples = self._samples.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(name, deque(maxlen=self._window))
+        samples.append(seconds)
+
+    def percentile(self, name: str, q: float) -> float | None:
+        samples = self._samples.get(name)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def p95(self, name: str) -> float | None:
+        return self.percentile(name, 0.95)
+
+
+@dataclass
+class HedgePolicy:
+    delay: float
+    delays: dict[str, float] = field(default_factory=dict)
+    adaptive: bool = False
+    max_hedges: int = 1
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> HedgePolicy:
+        return cls(
+            delay=settings.hedge_delay_ms / 1000,
+            delays={k: v / 1000 for k, v in settings.hedge_delays_ms.items()},
+            adaptive=settings.hedge_adaptive,
+            max_hedges=max(0, settings.hedge_max_concurrent),
+        )
+
+    def delay_for(self, name: str, tracker: LatencyTracker) -> float:
+        if self.adaptive:
+            observed = tracker.p95(name)
+            if observed is not None:
+                return observed
+        return self.delays.get(name, self.delay)
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    hedges_fired: int = 0
+    hedge_wins: int = 0
+    # Calls cancelled after another provider won: the extra upstream cost of hedging
+    cancelled_calls: int = 0
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "cancelled_calls": self.cancelled_calls,
+        }
+
+
+async def race(
+    providers: Sequence[Provider],
+    call: Callable[[Provider], Awaitable[T]],
+    *,
+    policy: HedgePolicy,
+    tracker: LatencyTracker,
+    stats: HedgeStats,
+) -> T:
+    """Run `call` across the route, hedging slow providers, and return the first success.
+
+    The next provider is launched when the in-flight one fails (plain fallback) or when its
+    hedge delay elapses while fewer than `policy.max_hedges` extra calls are running. Losers
+    are cancelled as soon as one call succeeds, and have finished unwinding on return.
+    """
+    stats.requests += 1
+    pending: dict[asyncio.Task[T], tuple[Provider, bool, float]] = {}
+    queue = list(providers)
+    last_err: Exception | None = None
+
+    def launch(hedged: bool) -> Provider:
+        provider = queue.pop(0)
+        task = asyncio.ensure_future(call(provider))
+        pending[task] = (provider, hedged, time.perf_counter())
+        if hedged:
+            stats.hedges_fired += 1
+        return provider
+
+    current = launch(hedged=False) if queue else None
+    try:
+        while pending:
+            timeout: float | None = None
+            if queue and current is not None and len(pending) - 1 < policy.max_hedges:
+                timeout = policy.delay_for(current.name, tracker)
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                current = launch(hedged=True)
+                continue
+            for task in done:
+                provider, hedged, started = pending.pop(task)
+                exc = task.exception()
+                if exc is not None:
+                    last_err = exc if isinstance(exc, Exception) else RuntimeError(str(exc))
+                    # A failure falls back immediately rather than waiting out the hedge delay
+                    if queue:
+                        current = launch(hedged=False)
+                    continue
+                tracker.record(provider.name, time.perf_counter() - started)
+                if hedged:
+                    stats.hedge_wins += 1
+                return task.result()
+    finally:
+        # cancel() is False for calls that finished meanwhile; those were not cut short
+        stats.cancelled_calls += sum(task.cancel() for task in pending)
+        # Wait for the losers to unwind so their slot release and rate-limit settlement
+        # have happened by the time the winner is returned
+        await asyncio.gather(*pending, return_exceptions=True)
+    raise RuntimeError(f"All providers failed: {last_err}")
@@ -1,3 +1,131 @@
-def ensure_within_budget(prompt: str, *, _context_depth: int) -> str:
-    # Placeholder pass – in v1, just return prompt unchanged
-    return prompt
+from __future__ import annotations
+
+import asyncio
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+from core.config import get_settings
+
+# Chat formats add a few framing tokens per message plus the assistant reply priming
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Approximate BPE tokenisation: words, runs of digits and single punctuation marks
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+_ENCODINGS = {
+    "openai": "cl100k_base",
+}
+
+# Encoding name -> loaded tokenizer, or None when it could not be loaded
+_LOADED: dict[str, Any | None] = {}
+
+
+class TokenBudgetExceeded(ValueError):
+    """The prompt cannot fit the token budget even with no history."""
+
+    def __init__(self, needed: int, budget: int) -> None:
+        super().__init__(f"Prompt needs {needed} tokens but the budget is {budget}")
+        self.needed = needed
+        self.budget = budget
+
+
+@dataclass
+class BudgetedPrompt:
+    prompt: str
+    history: list[Mapping[str, str]] = field(default_factory=list)
+    tokens: int = 0
+    dropped_turns: int = 0
+
+
+def _load(encoding: str) -> Any | None:
+    try:
+        import tiktoken  # type: ignore[import-not-found]
+
+        return tiktoken.get_encoding(encoding)
+    except Exception:
+        # tiktoken missing, or its BPE files cannot be fetched (offline hosts)
+        return None
+
+
+async def warm_encoders() -> None:
+    """Load the tokenizers in a worker thread; counts are approximate until this finishes.
+
+    `tiktoken.get_encoding` may download BPE files on first use, which must never happen
+    on the event loop inside a request.
+    """
+    for encoding in dict.fromkeys(_ENCODINGS.values()):
+        if encoding not in _LOADED:
+            _LOADED[encoding] = await asyncio.to_thread(_load, encoding)
+    # System prompt counts memoized before the tokenizers were ready are approximations
+    count_tokens_cached.cache_clear()
+
+
+def _encoder(provider: str | None) -> Any | None:
+    """Loaded tokenizer for the provider family, or None to use the approximation."""
+    family = (provider or "").split(":", 1)[0]
+    encoding = _ENCODINGS.get(family)
+    return _LOADED.get(encoding) if encoding else None
+
+
+def _approximate(text: str) -> int:
+    pieces = len(_PIECE_RE.findall(text))
+    # Long words split into several BPE tokens; chars/4 keeps those from being undercounted
+    return max(pieces, (len(text) + 3) // 4)
+
+
+def count_tokens(text: str, *, provider: str | None = None) -> int:
+    if not text:
+        return 0
+    enc = _encoder(provider)
+    if enc is None:
+        return _approximate(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=2048)
+def count_tokens_cached(text: str, provider: str | None = None) -> int:
+    """Memoized `count_tokens` for texts repeated across requests, like system prompts."""
+    return count_tokens(text, provider=provider)
+
+
+def ensure_within_budget(
+    prompt: str,
+    *,
+    context_depth: int,
+    system: str | None = None,
+    history: Sequence[Mapping[str, str]] | None = None,
+    provider: str | None = None,
+    max_tokens: int | None = None,
+) -> BudgetedPrompt:
+    """Fit system prompt, history and user prompt into the token budget.
+
+    Keeps at most `context_depth` of the most recent history turns, dropping older ones
+    until everything fits `max_tokens` (default `Settings.max_tokens`). Raises
+    `TokenBudgetExceeded` when the system prompt and user prompt alone do not fit.
+    """
+    budget = max_tokens or get_settings().max_tokens
+    used = TOKENS_PER_REPLY + TOKENS_PER_MESSAGE + count_tokens(prompt, provider=provider)
+    if system:
+        used += TOKENS_PER_MESSAGE + count_tokens_cached(system, provider)
+    if used > budget:
+        raise TokenBudgetExceeded(used, budget)
+
+    candidates = list(history or [])[-context_depth:] if context_depth > 0 else []
+    kept: list[Mapping[str, str]] = []
+    for turn in reversed(candidates):
+        cost = TOKENS_PER_MESSAGE + count_tokens(turn.get("content", ""), provider=provider)
+        if used + cost > budget:
+            break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+    return BudgetedPrompt(
+        prompt=prompt,
+        history=kept,
+        tokens=used,
+        dropped_turns=len(list(history or [])) - len(kept),
+    )
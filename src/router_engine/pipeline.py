@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from oven.compiler import compile_prompt, missing_variables
+from oven.manager import PromptOven
+from oven.schemas import PromptRecord
+from oven.template import parse_template
+from pydantic import BaseModel, Field
+from sentinel.observer import PIPELINE_STEPS, observe_stage
+
+# Step ids double as `$name` placeholders, so they must be valid template identifiers
+STEP_ID = r"^[A-Za-z_][A-Za-z0-9_]*$"
+
+
+class PipelineStep(BaseModel):
+    """One node of a pipeline: a chat whose message and prompt vars may use earlier outputs.
+
+    `message` and the values of `prompt_vars` are templates over the pipeline's `inputs`
+    and the outputs of other steps (`$summary` is the output of step `summary`). Every
+    step referenced that way, plus any listed in `after`, must finish first.
+    """
+
+    id: str = Field(pattern=STEP_ID, max_length=64)
+    message: str
+    prompt_name: str | None = None
+    prompt_version: str | None = None
+    prompt_vars: dict[str, str] | None = None
+    format: str | None = "markdown"
+    after: list[str] = Field(default_factory=list)
+
+
+class PipelineError(ValueError):
+    """The pipeline cannot run as given (unknown reference, cycle, missing prompt, ...)."""
+
+
+class StepFailed(Exception):
+    """Raised by an executor with the error to report for the step."""
+
+    def __init__(self, error: dict[str, Any]) -> None:
+        super().__init__(error.get("detail", "step failed"))
+        self.error = error
+
+
+@dataclass(frozen=True, slots=True)
+class StepCall:
+    """A step with its inputs rendered: what an executor sends to the router."""
+
+    step: PipelineStep
+    message: str
+    system: str | None
+    record: PromptRecord | None
+    output_format: str
+
+    @property
+    def key(self) -> str:
+        """Input hash; steps with equal keys would make the same call and share one run."""
+        record = self.record
+        material = [
+            record.name if record else None,
+            record.version if record else None,
+            self.system,
+            self.message,
+            self.output_format,
+        ]
+        return hashlib.sha256(json.dumps(material).encode()).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class StepResult:
+    content: str
+    provider: str
+    cache: str | None = None  # X-Cache of the underlying chat, when the cache applies
+
+
+StepExecutor = Callable[[StepCall], Awaitable[StepResult]]
+
+
+def _references(text: str) -> list[str]:
+    return parse_template(text).variables
+
+
+class Pipeline:
+    """A validated DAG of steps, run with every step starting as soon as its inputs exist.
+
+    Independent branches run concurrently (up to `concurrency` calls at once), so a run
+    takes about as long as its critical path rather than the sum of its steps. Steps whose
+    rendered inputs are identical run once and share the result.
+    """
+
+    def __init__(
+        self, steps: Sequence[PipelineStep], inputs: Mapping[str, str] | None = None
+    ) -> None:
+        self.steps = {step.id: step for step in steps}
+        self.inputs = dict(inputs or {})
+        if len(self.steps) != len(steps):
+            raise PipelineError("Step ids must be unique")
+        if clash := sorted(self.steps.keys() & self.inputs.keys()):
+            raise PipelineError(f"Inputs and steps share names: {', '.join(clash)}")
+        self.depends = {step.id: self._dependencies(step) for step in steps}
+        self.order = self._topological_order()
+        self.records: dict[tuple[str, str | None], PromptRecord] = {}
+
+    def _dependencies(self, step: PipelineStep) -> tuple[str, ...]:
+        names = _references(step.message)
+        for value in (step.prompt_vars or {}).values():
+            names.extend(_references(value))
+        deps: list[str] = []
+        for name in [*names, *step.after]:
+            if name == step.id:
+                raise PipelineError(f"Step '{step.id}' refers to itself")
+            if name in self.steps:
+                deps.append(name)
+            elif name not in self.inputs:
+                raise PipelineError(f"Step '{step.id}' refers to unknown input or step '{name}'")
+        return tuple(dict.fromkeys(deps))
+
+    def _topological_order(self) -> list[str]:
+        waiting = {sid: len(deps) for sid, deps in self.depends.items()}
+        dependents: dict[str, list[str]] = {sid: [] for sid in self.steps}
+        for sid, deps in self.depends.items():
+            for dep in deps:
+                dependents[dep].append(sid)
+        ready = [sid for sid, count in waiting.items() if count == 0]
+        order: list[str] = []
+        while ready:
+            sid = ready.pop()
+            order.append(sid)
+            for child in dependents[sid]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+        if len(order) != len(self.steps):
+            cycle = sorted(sid for sid, count in waiting.items() if count)
+            raise PipelineError(f"Steps form a cycle: {', '.join(cycle)}")
+        return order
+
+    async def resolve_prompts(self) -> None:
+        """Fetch each distinct prompt once and check every step supplies its variables."""
+        wanted = list(
+            dict.fromkeys(
+                (s.prompt_name, s.prompt_version) for s in self.steps.values() if s.prompt_name
+            )
+        )
+        oven = PromptOven()
+        found = await asyncio.gather(*(oven.aget(name, version) for name, version in wanted))
+        for (name, version), record in zip(wanted, found, strict=True):
+            if record is None:
+                label = f"{name}@{version}" if version else name
+                raise PipelineError(f"Prompt '{label}' not found")
+            self.records[(name, version)] = record
+        for step in self.steps.values():
+            record = self._record(step)
+            missing = missing_variables(record, step.prompt_vars) if record else []
+            if missing:
+                raise PipelineError(
+                    f"Step '{step.id}' is missing variables for prompt "
+                    f"'{step.prompt_name}': {', '.join(missing)}"
+                )
+
+    def _record(self, step: PipelineStep) -> PromptRecord | None:
+        if not step.prompt_name:
+            return None
+        return self.records[(step.prompt_name, step.prompt_version)]
+
+    def _call(self, step: PipelineStep, outputs: Mapping[str, str]) -> StepCall:
+        scope = {**self.inputs, **outputs}
+        variables = {
+            name: parse_template(value).render(scope)
+            for name, value in (step.prompt_vars or {}).items()
+        }
+        record = self._record(step)
+        return StepCall(
+            step=step,
+            message=parse_template(step.message).render(scope),
+            system=compile_prompt(record, variables) if record else None,
+            record=record,
+            output_format=step.format or "markdown",
+        )
+
+    async def run(self, execute: StepExecutor, *, concurrency: int) -> AsyncIterator[dict]:
+        """Run the steps, yielding a `step` event as each finishes and a final `done` event.
+
+        The first failed step stops the run: steps still running are cancelled and the
+        `done` event lists them, with those never started, as `skipped`.
+        """
+        if not self.records and any(s.prompt_name for s in self.steps.values()):
+            await self.resolve_prompts()
+        started = time.perf_counter()
+        outputs: dict[str, str] = {}
+        finished: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        gate = asyncio.Semaphore(concurrency)
+        shared: dict[str, asyncio.Task[StepResult]] = {}
+        tasks: dict[str, asyncio.Task[None]] = {}
+
+        async def call(step_call: StepCall) -> StepResult:
+            async with gate:
+                return await execute(step_call)
+
+        async def run_step(step: PipelineStep) -> None:
+            for dep in self.depends[step.id]:
+                await tasks[dep]
+                if dep not in outputs:
+                    return  # the dependency failed; the run is stopping
+            step_call = self._call(step, outputs)
+            memoized = step_call.key in shared
+            if not memoized:
+                shared[step_call.key] = asyncio.create_task(call(step_call))
+            step_started = time.perf_counter()
+            try:
+                result = await asyncio.shield(shared[step_call.key])
+            except StepFailed as exc:
+                error = exc.error
+            except Exception as exc:  # noqa: BLE001
+                error = {"status": 500, "detail": str(exc) or type(exc).__name__}
+            else:
+                outputs[step.id] = result.content
+                event = {
+                    "event": "step",
+                    "id": step.id,
+                    "status": "succeeded",
+                    "content": result.content,
+                    "provider": result.provider,
+                    "memoized": memoized,
+                    "elapsed_ms": round((time.perf_counter() - step_started) * 1000, 1),
+                }
+                if result.cache:
+                    event["cache"] = result.cache
+                PIPELINE_STEPS.inc("memoized" if memoized else "succeeded")
+                await finished.put(event)
+                return
+            PIPELINE_STEPS.inc("failed")
+            await finished.put({"event": "step", "id": step.id, "status": "failed", "error": error})
+
+        for sid in self.order:
+            tasks[sid] = asyncio.create_task(run_step(self.steps[sid]))
+        failure: dict[str, Any] | None = None
+        try:
+            for _ in range(len(tasks)):
+                event = await finished.get()
+                yield event
+                if event["status"] == "failed":
+                    failure = event
+                    break
+        finally:
+            pending = [t for t in [*tasks.values(), *shared.values()] if not t.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks.values(), *shared.values(), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        observe_stage("pipeline", elapsed)
+        done: dict[str, Any] = {
+            "event": "done",
+            "status": "failed" if failure else "succeeded",
+            "outputs": outputs,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+        if failure:
+            done["failed"] = failure["id"]
+            done["error"] = failure["error"]
+            done["skipped"] = [
+                sid for sid in self.steps if sid not in outputs and sid != failure["id"]
+            ]
+        yield done
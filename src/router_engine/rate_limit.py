@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import ipaddress
+import math
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from core.config import RateLimitSettings, Settings, get_settings
+from core.redis import get_async_redis
+from redis.exceptions import NoScriptError  # type: ignore[import-untyped]
+
+PREFIX = "lor3:rl"
+
+# Buckets are grouped: the client's buckets must all admit, then the first provider group
+# whose buckets all admit is charged together with the client, in one atomic call.
+# KEYS: bucket keys. ARGV: now_ms, group count, group sizes, then per key
+# (capacity, refill per ms, cost). Returns {admitted, provider group index, wait_ms}.
+_ADMIT_LUA = """
+local now = tonumber(ARGV[1])
+local ngroups = tonumber(ARGV[2])
+local base = 2 + ngroups
+local levels = {}
+
+local function arg(i, field)
+  return tonumber(ARGV[base + 3 * (i - 1) + field])
+end
+
+local function wait(first, size)
+  local worst = 0
+  for i = first, first + size - 1 do
+    local cap, rate, cost = arg(i, 1), arg(i, 2), arg(i, 3)
+    local b = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(b[1]) or cap
+    local ts = tonumber(b[2]) or now
+    tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+      worst = math.max(worst, math.ceil((cost - tokens) / rate))
+    end
+  end
+  return worst
+end
+
+local function charge(first, size)
+  for i = first, first + size - 1 do
+    local cap, rate, cost = arg(i, 1), arg(i, 2), arg(i, 3)
+    redis.call('HSET', KEYS[i], 'tokens', levels[i] - cost, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(cap / rate) + 1000)
+  end
+end
+
+local csize = tonumber(ARGV[3])
+local w = wait(1, csize)
+if w > 0 then
+  return {0, -1, w}
+end
+if ngroups == 1 then
+  charge(1, csize)
+  return {1, 0, 0}
+end
+local first = 1 + csize
+local best = -1
+for g = 2, ngroups do
+  local size = tonumber(ARGV[2 + g])
+  local pw = wait(first, size)
+  if pw == 0 then
+    charge(1, csize)
+    charge(first, size)
+    return {1, g - 2, 0}
+  end
+  if best < 0 or pw < best then
+    best = pw
+  end
+  first = first + size
+end
+return {0, -2, best}
+"""
+_ADMIT_SHA = hashlib.sha1(_ADMIT_LUA.encode()).hexdigest()
+
+# Reconcile estimates with actual usage. ARGV: now_ms, then per key (capacity, refill per
+# ms, delta). Buckets may go negative, so under-estimated calls are paid back by waiting.
+_ADJUST_LUA = """
+local now = tonumber(ARGV[1])
+for i = 1, #KEYS do
+  local cap = tonumber(ARGV[2 + 3 * (i - 1)])
+  local rate = tonumber(ARGV[3 + 3 * (i - 1)])
+  local delta = tonumber(ARGV[4 + 3 * (i - 1)])
+  local b = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+  local tokens = tonumber(b[1]) or cap
+  local ts = tonumber(b[2]) or now
+  tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+  redis.call('HSET', KEYS[i], 'tokens', math.min(cap, tokens - delta), 'ts', now)
+  redis.call('PEXPIRE', KEYS[i], math.ceil(cap / rate) + 1000)
+end
+return 1
+"""
+_ADJUST_SHA = hashlib.sha1(_ADJUST_LUA.encode()).hexdigest()
+
+_WINDOWS_MS = {"rpm": 60_000, "tpm": 60_000, "tpd": 86_400_000}
+
+
+class RateLimited(Exception):
+    """A client or every provider on the route is out of budget; retry after `retry_after`."""
+
+    def __init__(self, retry_after: float, scope: str) -> None:
+        super().__init__(f"Rate limit exceeded for {scope}; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+@dataclass(frozen=True)
+class Bucket:
+    key: str
+    capacity: float
+    rate: float  # refill per millisecond
+    cost: float
+
+
+def _buckets(scope: str, limits: RateLimitSettings | None, tokens: float) -> list[Bucket]:
+    if limits is None:
+        return []
+    out = []
+    for kind in ("rpm", "tpm", "tpd"):
+        capacity = getattr(limits, kind)
+        if capacity > 0:
+            # A request larger than the whole bucket waits for a full bucket, not forever
+            cost = 1 if kind == "rpm" else min(tokens, capacity)
+            out.append(
+                Bucket(f"{PREFIX}:{scope}:{kind}", capacity, capacity / _WINDOWS_MS[kind], cost)
+            )
+    return out
+
+
+def client_limits(settings: Settings, client: str) -> RateLimitSettings:
+    return settings.client_rate_limits.get(client, settings.client_rate_limit)
+
+
+@lru_cache(maxsize=8)
+def _trusted(entries: tuple[str, ...]) -> tuple[list[Any], set[str]]:
+    networks, hosts = [], set()
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            hosts.add(entry)
+    return networks, hosts
+
+
+def is_trusted_proxy(host: str | None) -> bool:
+    """Whether `host` may assert a client identity in `rate_limit_client_header`."""
+    if not host:
+        return False
+    networks, hosts = _trusted(tuple(get_settings().rate_limit_trusted_proxies))
+    if host in hosts:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+class _LocalBuckets:
+    """Same algorithm as the Lua scripts, for single-process use or when Redis is down."""
+
+    def __init__(self) -> None:
+        self._levels: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _level(self, b: Bucket, now: float) -> float:
+        tokens, ts = self._levels.get(b.key, (b.capacity, now))
+        return min(b.capacity, tokens + max(0.0, now - ts) * b.rate)
+
+    def _wait(self, group: Sequence[Bucket], now: float) -> float:
+        worst = 0.0
+        for b in group:
+            level = self._level(b, now)
+            if level < b.cost:
+                worst = max(worst, math.ceil((b.cost - level) / b.rate))
+        return worst
+
+    def _charge(self, group: Sequence[Bucket], now: float) -> None:
+        for b in group:
+            self._levels[b.key] = (self._level(b, now) - b.cost, now)
+
+    def admit(
+        self, client: Sequence[Bucket], providers: Sequence[Sequence[Bucket]], now: float
+    ) -> tuple[bool, int, float]:
+        with self._lock:
+            wait = self._wait(client, now)
+            if wait > 0:
+                return False, -1, wait
+            if not providers:
+                self._charge(client, now)
+                return True, 0, 0.0
+            best = -1.0
+            for index, group in enumerate(providers):
+                wait = self._wait(group, now)
+                if wait == 0:
+                    self._charge(client, now)
+                    self._charge(group, now)
+                    return True, index, 0.0
+                best = wait if best < 0 else min(best, wait)
+            return False, -2, best
+
+    def adjust(self, deltas: Sequence[Bucket], now: float) -> None:
+        with self._lock:
+            for b in deltas:
+                self._levels[b.key] = (min(b.capacity, self._level(b, now) - b.cost), now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._levels.clear()
+
+
+class RateLimiter:
+    """Token-bucket limits per client and per provider (requests, tokens/min, tokens/day).
+
+    `admit` checks the client's buckets and charges the first provider on the route that
+    has budget, in one Redis EVALSHA. Denials are remembered in process until their retry
+    time, so a client hammering past its limit costs no Redis round trips at all. Without
+    Redis, or when it is unreachable, the same buckets are kept per process.
+    """
+
+    def __init__(self) -> None:
+        self._local = _LocalBuckets()
+        # "client:<id>" / "provider:<name>" -> monotonic time until which it is known denied
+        self._blocked: dict[str, float] = {}
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self.round_trips = 0
+
+    def _blocked_for(self, scope: str, now: float) -> float:
+        until = self._blocked.get(scope)
+        if until is None:
+            return 0.0
+        if until <= now:
+            self._blocked.pop(scope, None)
+            return 0.0
+        return until - now
+
+    async def admit(self, client: str | None, providers: Sequence[str], tokens: int) -> int:
+        """Charge the request; returns the index in `providers` of the provider charged.
+
+        Raises `RateLimited` when the client is out of budget or no provider has budget.
+        """
+        settings = get_settings()
+        monotonic = time.monotonic()
+        client_scope = f"client:{client}" if client else None
+        if client_scope:
+            wait = self._blocked_for(client_scope, monotonic)
+            if wait:
+                raise RateLimited(wait, "client")
+        client_buckets = (
+            _buckets(client_scope, client_limits(settings, client), tokens)
+            if client_scope and client
+            else []
+        )
+        candidates: list[int] = []
+        groups: list[list[Bucket]] = []
+        soonest = math.inf
+        for index, name in enumerate(providers):
+            limits = settings.provider_rate_limits.get(name)
+            group = _buckets(f"provider:{name}", limits, tokens)
+            wait = self._blocked_for(f"provider:{name}", monotonic)
+            if wait:
+                soonest = min(soonest, wait)
+                continue
+            candidates.append(index)
+            groups.append(group)
+            if not group:
+                break  # an unlimited provider always admits; later ones are never charged
+        if providers and not candidates:
+            raise RateLimited(soonest, "providers")
+        if not client_buckets and not any(groups):
+            return candidates[0] if candidates else 0
+
+        admitted, chosen, wait_ms = await self._admit(client_buckets, groups)
+        if admitted:
+            return candidates[chosen] if candidates else 0
+        wait = max(wait_ms / 1000, 0.001)
+        if chosen == -1 and client_scope:
+            self._blocked[client_scope] = monotonic + wait
+            raise RateLimited(wait, "client")
+        # Every provider was denied; each waits at least the soonest reported retry
+        for index in candidates:
+            self._blocked[f"provider:{providers[index]}"] = monotonic + wait
+        raise RateLimited(min(wait, soonest), "providers")
+
+    async def _admit(
+        self, client: list[Bucket], providers: list[list[Bucket]]
+    ) -> tuple[bool, int, float]:
+        now_ms = time.time() * 1000
+        if get_settings().redis_url:
+            flat = [*client, *(b for group in providers for b in group)]
+            keys = [b.key for b in flat]
+            args: list[Any] = [now_ms, 1 + len(providers), len(client)]
+            args.extend(len(group) for group in providers)
+            for b in flat:
+                args.extend((b.capacity, b.rate, b.cost))
+            try:
+                r = get_async_redis()
+                self.round_trips += 1
+                try:
+                    reply = await r.evalsha(_ADMIT_SHA, len(keys), *keys, *args)
+                except NoScriptError:
+                    reply = await r.eval(_ADMIT_LUA, len(keys), *keys, *args)
+                return bool(int(reply[0])), int(reply[1]), float(reply[2])
+            except Exception:  # noqa: BLE001
+                pass  # Redis unreachable: enforce per process rather than not at all
+        return self._local.admit(client, providers, now_ms)
+
+    def settle(
+        self,
+        client: str | None,
+        admitted: str | None,
+        served: str | None,
+        *,
+        estimated: int,
+        actual: int,
+    ) -> None:
+        """Reconcile the estimate charged at admission with the tokens actually used.
+
+        Runs in the background; a fallback provider that served the request after the
+        admitted one failed is charged in full, and the admitted one is refunded its tokens.
+        With `served` None every provider failed, so the whole admission is refunded.
+        """
+        settings = get_settings()
+        deltas: list[Bucket] = []
+        if served is None:
+            if client:
+                deltas.extend(
+                    _delta(
+                        f"client:{client}",
+                        client_limits(settings, client),
+                        -estimated,
+                        requests=-1,
+                    )
+                )
+            if admitted:
+                deltas.extend(
+                    _delta(
+                        f"provider:{admitted}",
+                        settings.provider_rate_limits.get(admitted),
+                        -estimated,
+                        requests=-1,
+                    )
+                )
+            self._schedule(deltas)
+            return
+        if client:
+            deltas.extend(
+                _delta(f"client:{client}", client_limits(settings, client), actual - estimated)
+            )
+        if admitted == served:
+            deltas.extend(
+                _delta(
+                    f"provider:{served}",
+                    settings.provider_rate_limits.get(served),
+                    actual - estimated,
+                )
+            )
+        else:
+            if admitted:
+                deltas.extend(
+                    _delta(
+                        f"provider:{admitted}",
+                        settings.provider_rate_limits.get(admitted),
+                        -estimated,
+                    )
+                )
+            deltas.extend(
+                _delta(
+                    f"provider:{served}",
+                    settings.provider_rate_limits.get(served),
+                    actual,
+                    requests=1,
+                )
+            )
+        self._schedule(deltas)
+
+    def _schedule(self, deltas: list[Bucket]) -> None:
+        deltas = [b for b in deltas if b.cost]
+        if not deltas:
+            return
+        task = asyncio.ensure_future(self._adjust(deltas))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _adjust(self, deltas: list[Bucket]) -> None:
+        now_ms = time.time() * 1000
+        if get_settings().redis_url:
+            keys = [b.key for b in deltas]
+            args: list[Any] = [now_ms]
+            for b in deltas:
+                args.extend((b.capacity, b.rate, b.cost))
+            try:
+                r = get_async_redis()
+                try:
+                    await r.evalsha(_ADJUST_SHA, len(keys), *keys, *args)
+                except NoScriptError:
+                    await r.eval(_ADJUST_LUA, len(keys), *keys, *args)
+                return
+            except Exception:  # noqa: BLE001
+                pass
+        self._local.adjust(deltas, now_ms)
+
+    async def drain(self) -> None:
+        """Wait for pending settlements (tests and shutdown)."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def reset(self) -> None:
+        self._local.clear()
+        self._blocked.clear()
+        self.round_trips = 0
+
+
+def _delta(
+    scope: str, limits: RateLimitSettings | None, tokens: float, *, requests: int = 0
+) -> list[Bucket]:
+    out = []
+    for b in _buckets(scope, limits, 0):
+        cost = requests if b.key.endswith(":rpm") else tokens
+        out.append(Bucket(b.key, b.capacity, b.rate, cost))
+    return out
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any
+
+from core.config import get_settings
+from core.redis import get_redis
+from oven.schemas import PromptRecord
+
+PREFIX = "lor3:responses"
+# Rough per-entry bookkeeping cost (key, tuple, OrderedDict node) added to payload size
+ENTRY_OVERHEAD = 200
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    content: str
+    provider: str
+
+
+def cache_key(
+    *,
+    message: str,
+    system: str | None,
+    route: Sequence[str],
+    output_format: str,
+    context_depth: int = 0,
+    history: Sequence[Mapping[str, str]] | None = None,
+) -> str:
+    """Canonical hash of everything that determines a chat completion."""
+    fields: dict[str, Any] = {
+        "message": message,
+        "system": system,
+        "route": list(route),
+        "format": output_format,
+        "context_depth": context_depth,
+    }
+    if history:
+        # Only thread-bound chats carry history; stateless keys stay unchanged
+        fields["history"] = [[turn["role"], turn["content"]] for turn in history]
+    canonical = json.dumps(
+        fields,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    """In-process LRU bounded by the approximate bytes of the cached payloads."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, int, CachedResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        size = len(value.content.encode("utf-8")) + len(value.provider) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class ResponseCache:
+    """Two-tier response cache: bounded in-process LRU in front of Redis with TTL."""
+
+    def __init__(self) -> None:
+        self.memory = MemoryLRU(get_settings().response_cache_max_bytes)
+
+    @staticmethod
+    def ttl_for(record: PromptRecord | None) -> int:
+        settings = get_settings()
+        if not settings.response_cache_enabled:
+            return 0
+        if record is not None and record.cache_ttl is not None:
+            return record.cache_ttl
+        return settings.response_cache_ttl
+
+    async def get(self, key: str) -> tuple[CachedResponse, str] | None:
+        hit = self.memory.get(key)
+        if hit is not None:
+            return hit, "memory"
+        if not get_settings().redis_url:
+            return None
+        try:
+            raw, ttl = await asyncio.to_thread(_redis_get, key)
+        except Exception:
+            return None
+        if not raw:
+            return None
+        data = json.loads(raw)
+        value = CachedResponse(content=data["content"], provider=data["provider"])
+        if ttl > 0:
+            self.memory.set(key, value, ttl)
+        return value, "redis"
+
+    async def set(self, key: str, value: CachedResponse, ttl: int) -> None:
+        if ttl <= 0:
+            return
+        self.memory.set(key, value, ttl)
+        if not get_settings().redis_url:
+            return
+        payload = json.dumps({"content": value.content, "provider": value.provider})
+        with suppress(Exception):
+            await asyncio.to_thread(get_redis().set, f"{PREFIX}:{key}", payload, ex=ttl)
+
+
+def _redis_get(key: str) -> tuple[str | None, int]:
+    with get_redis().pipeline(transaction=False) as p:
+        p.get(f"{PREFIX}:{key}")
+        p.ttl(f"{PREFIX}:{key}")
+        raw, ttl = p.execute()
+    return raw, int(ttl)
+
+
+response_cache = ResponseCache()
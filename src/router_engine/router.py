@@ -1,31 +1,346 @@
-from typing import Tuple
+import asyncio
+import time
+import weakref
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from functools import partial
+from typing import Tuple, TypeVar
 
 from core.config import get_settings
-from providers.claude_provider import ClaudeProvider
-from providers.openai_provider import OpenAIProvider
-from router_engine.passes.token_budget import ensure_within_budget
+from providers.base import History, Provider
+from providers.registry import get_provider
+from router_engine.health import BreakerBoard
+from router_engine.hedging import HedgePolicy, HedgeStats, LatencyTracker, race
+from router_engine.passes.token_budget import count_tokens, ensure_within_budget
+from router_engine.rate_limit import RateLimited, rate_limiter
+from router_engine.scheduler import Overloaded, Slot, Ticket, scheduler
+from sentinel.observer import (
+    PROVIDER_CALLS,
+    RATE_LIMITED,
+    ROUTED_REQUESTS,
+    TOKENS,
+    observe_stage,
+    timed,
+)
 
+# Process-wide latency observations (drive adaptive hedge delays) and hedging cost accounting
+latency_tracker = LatencyTracker()
+hedge_stats = HedgeStats()
+# Per-provider circuit breakers and health scores
+breakers = BreakerBoard()
 
-def choose_provider_and_respond(
-    prompt: str, *, context_depth: int, output_format: str, system: str | None = None
+T = TypeVar("T")
+
+
+def _route(keys: Sequence[str] | None = None) -> list[Provider]:
+    settings = get_settings()
+    providers: list[Provider] = []
+    for key in keys or [settings.primary, *settings.fallbacks]:
+        provider = get_provider(key)
+        if provider is not None:
+            providers.append(provider)
+    return breakers.order(providers)
+
+
+def _budget(
+    prompt: str,
+    route: list[Provider],
+    *,
+    context_depth: int,
+    system: str | None,
+    history: History | None,
+) -> tuple[str, list[dict[str, str]], int]:
+    # Budget against the first provider's tokenizer; rejects early, before any upstream call.
+    # context_depth counts turns, each a user and an assistant message.
+    first = route[0].name if route else None
+    with timed("budget", first or ""):
+        budgeted = ensure_within_budget(
+            prompt,
+            context_depth=context_depth * 2,
+            system=system,
+            history=history,
+            provider=first,
+        )
+    return budgeted.prompt, [dict(turn) for turn in budgeted.history], budgeted.tokens
+
+
+def _record_call(name: str, *, ok: bool, latency: float) -> None:
+    breakers.record(name, ok=ok, latency=latency)
+    outcome = "ok" if ok else "error"
+    PROVIDER_CALLS.inc(name, outcome)
+    observe_stage("provider_call", latency, name, outcome=outcome)
+
+
+def _served(route: list[Provider], name: str, prompt_tokens: int) -> None:
+    fallback = bool(route) and route[0].name != name
+    ROUTED_REQUESTS.inc(name, "true" if fallback else "false")
+    TOKENS.inc(name, "prompt", amount=prompt_tokens)
+
+
+async def _admit(
+    client: str | None, route: list[Provider], tokens: int
+) -> tuple[list[Provider], str | None]:
+    """Charge the rate limits before any upstream call; returns the route to try.
+
+    Providers out of budget are skipped, so the route starts at the one that was charged.
+    """
+    settings = get_settings()
+    if not settings.rate_limit_enabled or not route:
+        return route, None
+    try:
+        index = await rate_limiter.admit(
+            client, [p.name for p in route], tokens + settings.rate_limit_completion_tokens
+        )
+    except RateLimited as exc:
+        RATE_LIMITED.inc(exc.scope)
+        raise
+    return route[index:], route[index].name
+
+
+def _settle(
+    client: str | None, admitted: str | None, served: str, prompt_tokens: int, content: str
+) -> None:
+    settings = get_settings()
+    if not settings.rate_limit_enabled:
+        return
+    rate_limiter.settle(
+        client,
+        admitted,
+        served,
+        estimated=prompt_tokens + settings.rate_limit_completion_tokens,
+        actual=prompt_tokens + count_tokens(content, provider=served),
+    )
+
+
+def _refund(client: str | None, admitted: str | None, prompt_tokens: int) -> None:
+    """Return the admission charge of a request no provider could serve."""
+    settings = get_settings()
+    if not settings.rate_limit_enabled:
+        return
+    rate_limiter.settle(
+        client,
+        admitted,
+        None,
+        estimated=prompt_tokens + settings.rate_limit_completion_tokens,
+        actual=0,
+    )
+
+
+def _exhausted(last_err: Exception | None, overloads: list[Overloaded]) -> Exception:
+    """The error for a route where every provider failed.
+
+    If any provider was merely at capacity the request is worth retrying, so that wins
+    over upstream errors; the soonest retry time is reported.
+    """
+    if overloads:
+        return min(overloads, key=lambda exc: exc.retry_after)
+    return RuntimeError(f"All providers failed: {last_err}")
+
+
+async def _observed(provider: Provider, call: Callable[[Provider], Awaitable[T]]) -> T:
+    breaker = breakers.breaker(provider.name)
+    breaker.begin()
+    started = time.perf_counter()
+    try:
+        result = await call(provider)
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    except Exception:
+        _record_call(provider.name, ok=False, latency=time.perf_counter() - started)
+        raise
+    _record_call(provider.name, ok=True, latency=time.perf_counter() - started)
+    return result
+
+
+async def achoose_provider_and_respond(
+    prompt: str,
+    *,
+    context_depth: int,
+    output_format: str,
+    system: str | None = None,
+    history: History | None = None,
+    client: str | None = None,
+    priority: str = "interactive",
+    providers: Sequence[str] | None = None,
 ) -> Tuple[str, str]:
+    """Answer through the first healthy provider, within rate limits and scheduler slots.
+
+    `providers` overrides the route (default `primary` then `fallbacks`).
+    """
     settings = get_settings()
+    await breakers.maybe_sync()
+    route = _route(providers)
+    prompt_to_send, turns, tokens = _budget(
+        prompt, route, context_depth=context_depth, system=system, history=history
+    )
+    route, admitted = await _admit(client, route, tokens)
+    ticket = Ticket.issue(priority)
+    overloads: list[Overloaded] = []
 
-    providers_map = {
-        "openai:gpt-4": OpenAIProvider(),
-        "claude:opus": ClaudeProvider(),
-    }
+    async def generate(provider: Provider) -> Tuple[str, str]:
+        return await provider.agenerate(
+            prompt_to_send, output_format=output_format, system=system, history=turns
+        )
+
+    async def call(provider: Provider) -> Tuple[str, str]:
+        try:
+            slot = await scheduler.acquire(provider.name, ticket)
+        except Overloaded as exc:
+            overloads.append(exc)
+            raise
+        try:
+            return await _observed(provider, generate)
+        finally:
+            slot.release()
+
+    if settings.hedge_enabled:
+        try:
+            content, name = await race(
+                route,
+                call,
+                policy=HedgePolicy.from_settings(settings),
+                tracker=latency_tracker,
+                stats=hedge_stats,
+            )
+        except RuntimeError as exc:
+            _refund(client, admitted, tokens)
+            if not overloads:
+                raise
+            raise _exhausted(exc, overloads) from None
+        _served(route, name, tokens)
+        _settle(client, admitted, name, tokens, content)
+        return content, name
 
-    route = [settings.primary, *settings.fallbacks]
-    prompt_to_send = ensure_within_budget(prompt, context_depth=context_depth)
     last_err: Exception | None = None
-    for key in route:
-        provider = providers_map.get(key)
-        if provider is None:
+    for provider in route:
+        started = time.perf_counter()
+        try:
+            result = await call(provider)
+        except Exception as exc:  # noqa: BLE001
+            last_err = exc
             continue
+        latency_tracker.record(provider.name, time.perf_counter() - started)
+        _served(route, result[1], tokens)
+        _settle(client, admitted, result[1], tokens, result[0])
+        return result
+    _refund(client, admitted, tokens)
+    raise _exhausted(last_err, overloads)
+
+
+async def _resume(
+    first: str,
+    stream: AsyncIterator[str],
+    on_done: Callable[[str], None] | None = None,
+    slot: Slot | None = None,
+) -> AsyncIterator[str]:
+    parts: list[str] = []
+    try:
+        if first:
+            parts.append(first)
+            yield first
+        async for chunk in stream:
+            if on_done is not None:
+                parts.append(chunk)
+            yield chunk
+    finally:
+        await stream.aclose()  # type: ignore[attr-defined]
+        if slot is not None:
+            slot.release()
+        if on_done is not None:
+            on_done("".join(parts))
+
+
+async def astream_provider_and_respond(
+    prompt: str,
+    *,
+    context_depth: int,
+    output_format: str,
+    system: str | None = None,
+    history: History | None = None,
+    client: str | None = None,
+    priority: str = "interactive",
+) -> Tuple[AsyncIterator[str], str]:
+    """Return (delta_stream, provider_name) from the first provider that emits a token.
+
+    Fallback only happens before the first delta; once a provider has started streaming,
+    its errors surface to the consumer instead of silently switching providers. The
+    provider's scheduler slot is held until the stream is closed.
+    """
+    await breakers.maybe_sync()
+    route = _route()
+    prompt_to_send, turns, tokens = _budget(
+        prompt, route, context_depth=context_depth, system=system, history=history
+    )
+    route, admitted = await _admit(client, route, tokens)
+    ticket = Ticket.issue(priority)
+    overloads: list[Overloaded] = []
+    last_err: Exception | None = None
+    for provider in route:
+        try:
+            slot = await scheduler.acquire(provider.name, ticket)
+        except Overloaded as exc:
+            overloads.append(exc)
+            continue
+        stream = provider.astream(
+            prompt_to_send, output_format=output_format, system=system, history=turns
+        )
+
+        async def first_delta(_: Provider, stream: AsyncIterator[str] = stream) -> str:
+            try:
+                return await anext(stream)
+            except StopAsyncIteration:
+                return ""
+
+        try:
+            first = await _observed(provider, first_delta)
+        except Exception as exc:  # noqa: BLE001
+            slot.release()
+            last_err = exc
+            continue
+        except BaseException:
+            slot.release()
+            raise
+        _served(route, provider.name, tokens)
+        # Streams settle their rate-limit charge once the last delta has been read
+        on_done = None
+        if admitted is not None:
+            on_done = partial(_settle, client, admitted, provider.name, tokens)
+        resumed = _resume(first, stream, on_done, slot)
+        if slot.lane is not None:
+            # A response abandoned before its body is read never runs the generator's
+            # cleanup; the slot must still come back
+            weakref.finalize(resumed, slot.release)
+        return resumed, provider.name
+    _refund(client, admitted, tokens)
+    raise _exhausted(last_err, overloads)
+
+
+def choose_provider_and_respond(
+    prompt: str,
+    *,
+    context_depth: int,
+    output_format: str,
+    system: str | None = None,
+    history: History | None = None,
+) -> Tuple[str, str]:
+    """Blocking shim over the provider route for sync callers (CLI, scripts)."""
+    route = _route()
+    prompt_to_send, turns, tokens = _budget(
+        prompt, route, context_depth=context_depth, system=system, history=history
+    )
+    last_err: Exception | None = None
+    for provider in route:
+        breakers.breaker(provider.name).begin()
+        started = time.perf_counter()
         try:
-            return provider.generate(prompt_to_send, output_format=output_format, system=system)
+            result = provider.generate(
+                prompt_to_send, output_format=output_format, system=system, history=turns
+            )
         except Exception as exc:  # noqa: BLE001
+            _record_call(provider.name, ok=False, latency=time.perf_counter() - started)
             last_err = exc
             continue
+        _record_call(provider.name, ok=True, latency=time.perf_counter() - started)
+        _served(route, result[1], tokens)
+        return result
     raise RuntimeError(f"All providers failed: {last_err}")
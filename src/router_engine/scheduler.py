@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from core.config import get_settings
+from sentinel.observer import QUEUE_DEPTH, QUEUE_REJECTED, QUEUE_WAIT, observe_stage
+
+# Lower runs first; waiting requests of a class are only served once no better class waits
+PRIORITIES = {"interactive": 0, "batch": 1}
+_NAMES = {rank: name for name, rank in PRIORITIES.items()}
+# Weight of the newest observation in a lane's mean slot hold time
+HOLD_EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """No provider slot could be had before the request's queue deadline."""
+
+    def __init__(self, retry_after: float, provider: str, reason: str) -> None:
+        super().__init__(f"{provider} is at capacity ({reason}); retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.provider = provider
+        self.reason = reason
+
+
+def resolve_priority(
+    requested: str | None, client: str | None = None, default: str | None = None
+) -> str:
+    """The request's own priority, else the client's configured one, else `default`.
+
+    `default` falls back to `scheduler_default_priority`.
+    """
+    settings = get_settings()
+    for candidate in (
+        requested,
+        settings.client_priorities.get(client) if client else None,
+        default or settings.scheduler_default_priority,
+    ):
+        if candidate in PRIORITIES:
+            return candidate
+    return "interactive"
+
+
+@dataclass(frozen=True, slots=True)
+class Ticket:
+    """A request's place in line: its priority class and when it stops being worth serving.
+
+    One ticket covers the whole route, so time queued for the primary counts against the
+    wait allowed for a fallback.
+    """
+
+    priority: str
+    deadline: float  # time.monotonic()
+
+    @classmethod
+    def issue(cls, priority: str) -> Ticket:
+        timeout = get_settings().scheduler_queue_timeout.get(priority, 5.0)
+        return cls(priority, time.monotonic() + timeout)
+
+
+class Slot:
+    """One in-flight call's claim on a provider lane; `release` is idempotent."""
+
+    __slots__ = ("lane", "acquired", "released")
+
+    def __init__(self, lane: _Lane | None) -> None:
+        self.lane = lane
+        self.acquired = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        if self.lane is not None:
+            self.lane.release(time.monotonic() - self.acquired)
+
+
+class _Lane:
+    """Concurrency cap for one provider, with a priority queue of waiting requests.
+
+    A freed slot is handed straight to the best waiter (lowest priority class, then
+    arrival order), so a slot is never up for grabs between release and the next start.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.limit = 0
+        self.inflight = 0
+        self.hold = 0.0  # mean seconds a slot is held, once observed
+        self._heap: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._seq = itertools.count()
+        self.queued = dict.fromkeys(PRIORITIES, 0)
+        self.rejected = dict.fromkeys(("full", "deadline", "timeout"), 0)
+
+    def ahead_of(self, rank: int) -> int:
+        return sum(n for name, n in self.queued.items() if PRIORITIES[name] <= rank)
+
+    def estimate_wait(self, rank: int) -> float:
+        # Requests ahead drain `limit` at a time, each holding its slot for `hold` seconds
+        if not self.hold:
+            return 0.0
+        return (self.ahead_of(rank) + 1) / self.limit * self.hold
+
+    def reject(self, ticket: Ticket, reason: str, retry_after: float) -> Overloaded:
+        self.rejected[reason] += 1
+        QUEUE_REJECTED.inc(self.name, ticket.priority, reason)
+        return Overloaded(max(retry_after, 0.001), self.name, reason)
+
+    async def acquire(self, ticket: Ticket) -> None:
+        if self.inflight < self.limit and not any(self.queued.values()):
+            self.inflight += 1
+            QUEUE_WAIT.observe(0.0, self.name, ticket.priority)
+            return
+        settings = get_settings()
+        rank = PRIORITIES[ticket.priority]
+        now = time.monotonic()
+        if sum(self.queued.values()) >= settings.scheduler_max_queue and not self._shed(rank):
+            raise self.reject(ticket, "full", self.estimate_wait(rank) or self.hold or 1.0)
+        # Reject up front when the queue ahead cannot drain before the deadline, rather than
+        # holding the request until it times out anyway
+        expected = self.estimate_wait(rank)
+        if now + expected > ticket.deadline:
+            raise self.reject(ticket, "deadline", expected)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (rank, next(self._seq), future))
+        self.queued[ticket.priority] += 1
+        QUEUE_DEPTH.inc(self.name, ticket.priority)
+        try:
+            async with asyncio.timeout(ticket.deadline - now):
+                await future
+        except BaseException as exc:
+            if not future.done():
+                future.cancel()
+                self._dequeued(ticket.priority)
+            elif not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as we gave up; pass it on
+                self.release(None)
+            if isinstance(exc, TimeoutError):
+                raise self.reject(ticket, "timeout", self.estimate_wait(rank) or 1.0) from None
+            raise
+        waited = time.monotonic() - now
+        QUEUE_WAIT.observe(waited, self.name, ticket.priority)
+        observe_stage("queue", waited, self.name, priority=ticket.priority)
+
+    def _shed(self, rank: int) -> bool:
+        """Make room in a full queue by rejecting its newest waiter of a lower class."""
+        waiting = [entry for entry in self._heap if not entry[2].done() and entry[0] > rank]
+        if not waiting:
+            return False
+        worst, _, future = max(waiting, key=lambda entry: entry[:2])
+        priority = _NAMES[worst]
+        self._dequeued(priority)
+        self.rejected["full"] += 1
+        QUEUE_REJECTED.inc(self.name, priority, "full")
+        future.set_exception(Overloaded(self.hold or 1.0, self.name, "full"))
+        return True
+
+    def _dequeued(self, priority: str) -> None:
+        self.queued[priority] -= 1
+        QUEUE_DEPTH.dec(self.name, priority)
+
+    def release(self, held: float | None) -> None:
+        if held is not None:
+            self.hold = held if not self.hold else self.hold + HOLD_EWMA_ALPHA * (held - self.hold)
+        while self._heap:
+            rank, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue  # abandoned or shed; already dequeued
+            future.set_result(None)
+            self._dequeued(_NAMES[rank])
+            return  # the slot moves to the waiter, so in-flight stays the same
+        self.inflight -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "queued": dict(self.queued),
+            "mean_hold_ms": round(self.hold * 1000, 3),
+            "rejected": dict(self.rejected),
+        }
+
+
+class Scheduler:
+    """Admission control in front of provider calls.
+
+    Each provider with a concurrency cap gets a lane; calls beyond the cap wait in a
+    priority queue, and requests that cannot get a slot before their ticket's deadline are
+    turned away early with `Overloaded` so the router can try the next provider. Lanes
+    are per process and live on the event loop, like the router's other state.
+    """
+
+    def __init__(self) -> None:
+        self._lanes: dict[str, _Lane] = {}
+
+    def _lane(self, provider: str) -> _Lane | None:
+        settings = get_settings()
+        if not settings.scheduler_enabled:
+            return None
+        limit = settings.provider_concurrency.get(provider, settings.default_provider_concurrency)
+        if limit <= 0:
+            return None
+        lane = self._lanes.get(provider)
+        if lane is None:
+            lane = self._lanes[provider] = _Lane(provider)
+        lane.limit = limit
+        return lane
+
+    async def acquire(self, provider: str, ticket: Ticket) -> Slot:
+        """Wait for a slot on `provider`; release it when the call (or stream) is over."""
+        lane = self._lane(provider)
+        if lane is not None:
+            await lane.acquire(ticket)
+        return Slot(lane)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {name: lane.snapshot() for name, lane in sorted(self._lanes.items())}
+
+    def reset(self) -> None:
+        self._lanes.clear()
+
+
+scheduler = Scheduler()
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import suppress
+from typing import Any, Generic, TypeVar
+
+from core.config import get_settings
+from core.redis import arelease_lock, get_async_redis, lock_token
+
+T = TypeVar("T")
+
+PREFIX = "lor3:flight"
+# Published results only need to outlive the waiters already subscribed to the flight
+RESULT_TTL_MS = 10_000
+
+
+class SingleFlightTimeout(TimeoutError):
+    """A coalesced waiter gave up on the shared in-flight call."""
+
+
+class _Flight(Generic[T]):
+    def __init__(self, task: asyncio.Task[T]) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """Fan one upstream delta stream out to any number of subscribers.
+
+    Deltas are buffered for the lifetime of the flight so late subscribers replay from the
+    first delta; the pump runs as its own task so it survives the leader disconnecting.
+    """
+
+    def __init__(self, source: AsyncIterator[str]) -> None:
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        # Coalesced subscribers still following the stream (the leader is not counted)
+        self.waiters = 0
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except Exception as exc:  # noqa: BLE001
+            self.error = exc
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    def subscribe(self, *, waiter: bool = False) -> AsyncIterator[str]:
+        if waiter:
+            self.waiters += 1
+        return self._follow(waiter)
+
+    async def _follow(self, waiter: bool) -> AsyncIterator[str]:
+        index = 0
+        try:
+            while True:
+
+                def ready(seen: int = index) -> bool:
+                    return self.done or len(self.chunks) > seen
+
+                async with self._changed:
+                    await self._changed.wait_for(ready)
+                    pending = self.chunks[index:]
+                    finished = self.done
+                for chunk in pending:
+                    yield chunk
+                index += len(pending)
+                if finished and index >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            if waiter:
+                self.waiters -= 1
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a canonical key.
+
+    The first caller for a key runs the call; concurrent callers with the same key await
+    its result instead of issuing their own, up to `singleflight_max_waiters` per key (for
+    streams, subscribers still following the leader's deltas); callers beyond that make
+    their own call. With `singleflight_distributed` the leader also takes a Redis lock so
+    other workers wait for the result published on a Redis channel rather than stampeding
+    the upstream. Streams are coalesced within the worker only.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Flight[Any]] = {}
+        self._stream_calls: dict[str, _Flight[Any]] = {}
+        self._streams: dict[str, tuple[_Broadcast, str]] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        decode: Callable[[Any], T] | None = None,
+    ) -> tuple[T, bool]:
+        """Return (result, shared) where `shared` is True for coalesced waiters."""
+        settings = get_settings()
+        flight = self._calls.get(key)
+        if flight is not None:
+            if flight.waiters >= settings.singleflight_max_waiters:
+                return await fn(), False
+            flight.waiters += 1
+            try:
+                result, _ = await asyncio.wait_for(
+                    asyncio.shield(flight.task), settings.singleflight_timeout
+                )
+            except asyncio.TimeoutError as exc:
+                raise SingleFlightTimeout(f"Timed out waiting for in-flight call {key}") from exc
+            finally:
+                flight.waiters -= 1
+            return result, True
+
+        if settings.singleflight_distributed and settings.redis_url and decode is not None:
+            runner: Awaitable[tuple[T, bool]] = self._distributed(key, fn, decode)
+        else:
+            runner = _lead(fn)
+        task = asyncio.ensure_future(runner)
+        self._calls[key] = _Flight(task)
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shield so a disconnecting leader does not cancel the call its waiters depend on
+        result, shared = await asyncio.shield(task)
+        return result, shared
+
+    async def do_stream(
+        self,
+        key: str,
+        start: Callable[[], Awaitable[tuple[AsyncIterator[str], str]]],
+    ) -> tuple[AsyncIterator[str], str, bool]:
+        """Stream variant of `do`: returns (deltas, provider, shared)."""
+        settings = get_settings()
+        existing = self._streams.get(key)
+        if existing is not None:
+            broadcast, provider = existing
+            if broadcast.waiters >= settings.singleflight_max_waiters:
+                return (*await start(), False)
+            return broadcast.subscribe(waiter=True), provider, True
+        pending = self._stream_calls.get(key)
+        if pending is not None:
+            # Another request is still waiting for its first delta under this key
+            if pending.waiters >= settings.singleflight_max_waiters:
+                return (*await start(), False)
+            pending.waiters += 1
+            try:
+                broadcast, provider = await asyncio.wait_for(
+                    asyncio.shield(pending.task), settings.singleflight_timeout
+                )
+            except asyncio.TimeoutError as exc:
+                raise SingleFlightTimeout(f"Timed out waiting for in-flight call {key}") from exc
+            except Exception:  # noqa: BLE001
+                pass  # the leader failed before streaming; try the route ourselves
+            else:
+                return broadcast.subscribe(waiter=True), provider, True
+            finally:
+                pending.waiters -= 1
+
+        async def open_stream() -> tuple[_Broadcast, str]:
+            deltas, provider = await start()
+            broadcast = _Broadcast(deltas)
+            self._streams[key] = (broadcast, provider)
+            broadcast.task.add_done_callback(lambda _: self._streams.pop(key, None))
+            return broadcast, provider
+
+        task = asyncio.ensure_future(open_stream())
+        self._stream_calls[key] = _Flight(task)
+        task.add_done_callback(lambda _: self._stream_calls.pop(key, None))
+        broadcast, provider = await asyncio.shield(task)
+        return broadcast.subscribe(), provider, False
+
+    async def _distributed(
+        self, key: str, fn: Callable[[], Awaitable[T]], decode: Callable[[Any], T]
+    ) -> tuple[T, bool]:
+        settings = get_settings()
+        r = get_async_redis()
+        lock_key, result_key, channel = (
+            f"{PREFIX}:{key}:lock",
+            f"{PREFIX}:{key}:result",
+            f"{PREFIX}:{key}",
+        )
+        lock_ms = int(settings.singleflight_timeout * 1000)
+        token = lock_token()
+        if await r.set(lock_key, token, nx=True, px=lock_ms):
+            try:
+                await r.delete(result_key)
+                result = await fn()
+                with suppress(Exception):
+                    await r.set(result_key, json.dumps(result), px=RESULT_TTL_MS)
+                return result, False
+            finally:
+                # Notify even on failure so waiters stop waiting and run the call themselves
+                with suppress(Exception):
+                    await arelease_lock(r, lock_key, token)
+                    await r.publish(channel, "done")
+
+        # Another worker owns the call: wait for its notification, then read the result
+        pubsub = r.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            raw = await r.get(result_key)
+            if raw is None and await _await_notify(pubsub, settings.singleflight_timeout):
+                raw = await r.get(result_key)
+        finally:
+            with suppress(Exception):
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+        if raw is None:
+            # Owner died or timed out: do the work ourselves rather than fail the request
+            return await fn(), False
+        return decode(json.loads(raw)), True
+
+
+async def _lead(fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+    return await fn(), False
+
+
+async def _await_notify(pubsub: Any, timeout: float) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while (remaining := deadline - loop.time()) > 0:
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+        if message is not None:
+            return True
+    return False
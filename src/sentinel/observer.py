@@ -1 +1,428 @@
-# Placeholder for observability/telemetry hooks
+from __future__ import annotations
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from contextlib import suppress
+from threading import get_ident
+from typing import Any
+
+from core.config import get_settings
+from core.redis import get_redis
+from sentinel.tracing import current_trace, record_span, span
+
+PREFIX = "lor3:metrics"
+# Fleet-wide series expire if no worker has flushed them for this long
+SERIES_TTL_SECONDS = 24 * 3600
+
+# Seconds; spans in-process stages (sub-millisecond) up to slow provider calls
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+Labels = tuple[str, ...]
+
+
+class Metric:
+    """One metric family: label values map to a fixed list of float cells.
+
+    Every thread records into its own shard, so recording never takes a lock: only the
+    owning thread mutates a shard, and readers sum the shards when exporting. Creating a
+    thread's shard is the one locked step.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards: dict[int, dict[Labels, list[float]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def width(self) -> int:
+        return 1
+
+    def _cells(self, labels: Labels) -> list[float]:
+        shard = self._shards.get(get_ident())
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(get_ident(), {})
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0.0] * self.width
+        return cells
+
+    def snapshot(self) -> dict[Labels, list[float]]:
+        with self._lock:
+            shards = list(self._shards.values())
+        merged: dict[Labels, list[float]] = {}
+        for shard in shards:
+            # list() copies under the GIL, so a concurrent insert cannot break iteration
+            for labels, cells in list(shard.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(cells)
+                else:
+                    for i, value in enumerate(cells):
+                        total[i] += value
+        return merged
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shards.clear()
+
+    def render(self, series: Mapping[Labels, Sequence[float]]) -> list[str]:
+        raise NotImplementedError
+
+    def _labels(self, labels: Labels, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels, strict=False)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._cells(labels)[0] += amount
+
+    def render(self, series: Mapping[Labels, Sequence[float]]) -> list[str]:
+        return [
+            f"{self.name}{self._labels(labels)} {_number(cells[0])}"
+            for labels, cells in sorted(series.items())
+        ]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. queue depth; workers' values add up to the fleet's."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._cells(labels)[0] -= amount
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; cells hold per-bucket counts, then the sum and the count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    @property
+    def width(self) -> int:
+        # One cell per bound, one for +Inf, then sum and count
+        return len(self.buckets) + 3
+
+    def observe(self, value: float, *labels: str) -> None:
+        cells = self._cells(labels)
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-2] += value
+        cells[-1] += 1
+
+    def render(self, series: Mapping[Labels, Sequence[float]]) -> list[str]:
+        lines: list[str] = []
+        for labels, cells in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, None), cells, strict=False):
+                cumulative += count
+                le = "+Inf" if bound is None else _number(bound)
+                bucket = self._labels(labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(cells[-2])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {_number(cells[-1])}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) and abs(value) < 1e15 else repr(value)
+
+
+class Registry:
+    """The process's metric families, optionally aggregated across workers through Redis.
+
+    Each worker flushes the deltas recorded since its last flush into one Redis hash per
+    family (`HINCRBYFLOAT`, one pipeline); `/metrics` flushes its own worker and renders
+    the fleet totals, so any worker can answer the scrape.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._flushed: dict[str, dict[Labels, list[float]]] = {}
+        self._flush_lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics[name] = metric
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics[name] = metric
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics[name] = metric
+        return metric
+
+    def snapshot(self) -> dict[str, dict[Labels, list[float]]]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def reset(self) -> None:
+        with self._flush_lock:
+            for metric in self._metrics.values():
+                metric.clear()
+            self._flushed.clear()
+
+    def flush(self) -> int:
+        """Push deltas since the last flush to Redis; returns the number of cells written."""
+        with self._flush_lock:
+            current = self.snapshot()
+            writes: list[tuple[str, str, float]] = []
+            for name, series in current.items():
+                previous = self._flushed.get(name, {})
+                for labels, cells in series.items():
+                    before = previous.get(labels)
+                    for i, value in enumerate(cells):
+                        delta = value - (before[i] if before else 0.0)
+                        if delta:
+                            writes.append((f"{PREFIX}:{name}", _field(labels, i), delta))
+            if writes:
+                with get_redis().pipeline(transaction=False) as p:
+                    for key, field, delta in writes:
+                        p.hincrbyfloat(key, field, delta)
+                    for key in {key for key, _, _ in writes}:
+                        p.expire(key, SERIES_TTL_SECONDS)
+                    p.execute()
+            # Only mark deltas as flushed once Redis has accepted them
+            self._flushed = current
+            return len(writes)
+
+    def collect(self) -> dict[str, dict[Labels, list[float]]]:
+        """Fleet-wide series from Redis, or this worker's when Redis is not configured.
+
+        Also falls back to this worker's series when Redis is unreachable, so a scrape
+        still answers during the outage it would help diagnose.
+        """
+        if not get_settings().redis_url:
+            return self.snapshot()
+        names = list(self._metrics)
+        try:
+            self.flush()
+            with get_redis().pipeline(transaction=False) as p:
+                for name in names:
+                    p.hgetall(f"{PREFIX}:{name}")
+                raw = p.execute()
+        except Exception:  # noqa: BLE001
+            # Unflushed deltas stay pending for the next flush, as in the flusher thread
+            return self.snapshot()
+        fleet: dict[str, dict[Labels, list[float]]] = {}
+        for name, fields in zip(names, raw, strict=True):
+            width = self._metrics[name].width
+            series: dict[Labels, list[float]] = {}
+            for field, value in (fields or {}).items():
+                labels, index = _parse_field(field)
+                if index < width:
+                    series.setdefault(labels, [0.0] * width)[index] = float(value)
+            fleet[name] = series
+        return fleet
+
+    def render(
+        self, collected: Mapping[str, Mapping[Labels, Sequence[float]]] | None = None
+    ) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        collected = self.collect() if collected is None else collected
+        lines: list[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(collected.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+def _field(labels: Labels, index: int) -> str:
+    return json.dumps([*labels, index], separators=(",", ":"))
+
+
+def _parse_field(field: str | bytes) -> tuple[Labels, int]:
+    *labels, index = json.loads(field)
+    return tuple(str(v) for v in labels), int(index)
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "lor3_stage_seconds",
+    "Time spent per request stage (prompt_lookup, compile, budget, provider_call, format)",
+    ("stage", "provider"),
+)
+PROVIDER_CALLS = registry.counter(
+    "lor3_provider_calls_total", "Upstream provider calls by outcome", ("provider", "outcome")
+)
+ROUTED_REQUESTS = registry.counter(
+    "lor3_routed_requests_total",
+    "Requests answered by each provider; fallback=true when it was not first in the route",
+    ("provider", "fallback"),
+)
+TOKENS = registry.counter(
+    "lor3_tokens_total", "Approximate prompt and completion tokens", ("provider", "kind")
+)
+CACHE_LOOKUPS = registry.counter(
+    "lor3_cache_lookups_total",
+    "Prompt and response cache lookups by result (hit, miss, bypass)",
+    ("cache", "result"),
+)
+RATE_LIMITED = registry.counter(
+    "lor3_rate_limited_total",
+    "Requests rejected with 429 because the client or every provider was out of budget",
+    ("scope",),
+)
+QUEUE_DEPTH = registry.gauge(
+    "lor3_queue_depth", "Requests waiting for a provider slot", ("provider", "priority")
+)
+QUEUE_WAIT = registry.histogram(
+    "lor3_queue_wait_seconds",
+    "Time requests waited for a provider slot (0 when one was free)",
+    ("provider", "priority"),
+)
+QUEUE_REJECTED = registry.counter(
+    "lor3_queue_rejected_total",
+    "Requests turned away by admission control (full, deadline, timeout)",
+    ("provider", "priority", "reason"),
+)
+JOBS = registry.counter(
+    "lor3_jobs_total",
+    "Job attempts by outcome (succeeded, failed, retried) and reclaimed deliveries",
+    ("kind", "outcome"),
+)
+PIPELINE_STEPS = registry.counter(
+    "lor3_pipeline_steps_total",
+    "Pipeline steps by outcome (succeeded, memoized, failed)",
+    ("outcome",),
+)
+COALESCED = registry.counter(
+    "lor3_coalesced_requests_total",
+    "Chat requests served by another request's in-flight upstream call",
+    ("mode",),
+)
+
+
+class timed:  # noqa: N801 - used like a function: `with timed("compile"):`
+    """Record the duration of a `with` block in `lor3_stage_seconds`.
+
+    Inside a traced request the block is also a span, so nested spans attach to it.
+    """
+
+    __slots__ = ("labels", "started", "span")
+
+    def __init__(self, stage: str, provider: str = "") -> None:
+        self.labels = (stage, provider)
+        self.started = 0.0
+        self.span: span | None = None
+
+    def __enter__(self) -> timed:
+        if current_trace() is not None:
+            stage, provider = self.labels
+            self.span = span(stage, provider=provider) if provider else span(stage)
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, *self.labels)
+        if self.span is not None:
+            self.span.__exit__(*exc)
+
+
+def observe_stage(stage: str, seconds: float, provider: str = "", **attributes: Any) -> None:
+    """Record a stage the caller timed itself, e.g. one provider attempt."""
+    STAGE_SECONDS.observe(seconds, stage, provider)
+    if provider:
+        attributes = {"provider": provider, **attributes}
+    record_span(stage, seconds, **attributes)
+
+
+_FLUSHER: threading.Thread | None = None
+_FLUSHER_STOP = threading.Event()
+_FLUSHER_LOCK = threading.Lock()
+
+
+def _flush_loop(interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            registry.flush()
+        except Exception:  # noqa: BLE001
+            continue  # Redis unavailable: the deltas stay pending for the next flush
+
+
+def ensure_metrics_flusher() -> None:
+    """Start (once per process) the thread pushing this worker's metrics to Redis."""
+    global _FLUSHER
+    settings = get_settings()
+    if not settings.redis_url or settings.metrics_flush_interval <= 0:
+        return
+    with _FLUSHER_LOCK:
+        if _FLUSHER is not None and _FLUSHER.is_alive():
+            return
+        _FLUSHER_STOP.clear()
+        _FLUSHER = threading.Thread(
+            target=_flush_loop,
+            args=(settings.metrics_flush_interval, _FLUSHER_STOP),
+            name="lor3-metrics-flusher",
+            daemon=True,
+        )
+        _FLUSHER.start()
+
+
+def stop_metrics_flusher(timeout: float = 5.0) -> None:
+    global _FLUSHER
+    with _FLUSHER_LOCK:
+        flusher, _FLUSHER = _FLUSHER, None
+    if flusher is None:
+        return
+    _FLUSHER_STOP.set()
+    flusher.join(timeout)
+    # Final flush so a stopping worker's last requests still reach the fleet totals
+    with suppress(Exception):
+        registry.flush()
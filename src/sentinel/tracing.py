@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import json
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, MutableMapping
+from contextlib import suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.config import get_settings
+
+SERVICE_NAME = "lor-3000"
+
+_TRACE: ContextVar[Trace | None] = ContextVar("lor3_trace", default=None)
+# Innermost open span of the current trace; new spans become its children
+_PARENT: ContextVar[Span | None] = ContextVar("lor3_span_parent", default=None)
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    start: float  # perf_counter seconds
+    end: float = 0.0
+    parent: Span | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        return max(self.end - self.start, 0.0) * 1000
+
+
+class Trace:
+    """Timed spans of one request, in start order; `Span.parent` links nested spans."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = 0.0
+        self.status: int | None = None
+        self.spans: list[Span] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end or time.perf_counter()
+        return (end - self.start) * 1000
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value: one entry per span, then the request total.
+
+        Span names are stage names, which are already valid HTTP tokens.
+        """
+        entries = []
+        for span in list(self.spans):
+            if not span.end:
+                continue
+            entry = f"{span.name};dur={span.duration_ms:.2f}"
+            desc = " ".join(str(v) for v in span.attributes.values() if v != "")
+            if desc:
+                entry += f';desc="{desc.replace(chr(34), "")}"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.duration_ms:.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict[str, Any]:
+        spans = list(self.spans)
+        index = {id(s): i for i, s in enumerate(spans)}
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": [
+                {
+                    "name": s.name,
+                    "offset_ms": round((s.start - self.start) * 1000, 3),
+                    "duration_ms": round(s.duration_ms, 3),
+                    "parent": None if s.parent is None else index.get(id(s.parent)),
+                    "attributes": s.attributes,
+                }
+                for s in spans
+            ],
+        }
+
+    def to_otlp_spans(self) -> list[dict[str, Any]]:
+        """Spans in the OTLP/JSON encoding; the request itself is the root span."""
+        root_id = _span_id(self.trace_id, 0)
+
+        def nanos(perf: float) -> str:
+            return str(int((self.started_at + (perf - self.start)) * 1e9))
+
+        spans = [
+            {
+                "traceId": self.trace_id,
+                "spanId": root_id,
+                "name": self.name,
+                "kind": 2,  # SPAN_KIND_SERVER
+                "startTimeUnixNano": nanos(self.start),
+                "endTimeUnixNano": nanos(self.end or time.perf_counter()),
+                "attributes": _otlp_attributes({"http.status_code": self.status}),
+            }
+        ]
+        ordered = list(self.spans)
+        index = {id(s): i + 1 for i, s in enumerate(ordered)}
+        for position, s in enumerate(ordered, start=1):
+            parent_index = 0 if s.parent is None else index.get(id(s.parent), 0)
+            parent = _span_id(self.trace_id, parent_index)
+            spans.append(
+                {
+                    "traceId": self.trace_id,
+                    "spanId": _span_id(self.trace_id, position),
+                    "parentSpanId": parent,
+                    "name": s.name,
+                    "kind": 1,  # SPAN_KIND_INTERNAL
+                    "startTimeUnixNano": nanos(s.start),
+                    "endTimeUnixNano": nanos(s.end or s.start),
+                    "attributes": _otlp_attributes(s.attributes),
+                }
+            )
+        return spans
+
+
+def _span_id(trace_id: str, index: int) -> str:
+    # Deterministic 8-byte ids derived from the trace id; unique within the trace
+    return f"{(int(trace_id[:16], 16) + index) & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    out = []
+    for key, value in attributes.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, bool):
+            encoded: dict[str, Any] = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        out.append({"key": key, "value": encoded})
+    return out
+
+
+def otlp_payload(traces: list[Trace]) -> dict[str, Any]:
+    """An OTLP/JSON `ExportTraceServiceRequest`, accepted by any OTLP/HTTP collector."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "sentinel"},
+                        "spans": [s for t in traces for s in t.to_otlp_spans()],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def current_trace() -> Trace | None:
+    return _TRACE.get()
+
+
+class span:  # noqa: N801 - used like a function: `with span("oven.redis"):`
+    """Time a `with` block as a span of the current trace; a no-op outside a trace."""
+
+    __slots__ = ("name", "attributes", "record", "token")
+
+    def __init__(self, name: str, **attributes: Any) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.record: Span | None = None
+        self.token: Any = None
+
+    def set(self, key: str, value: Any) -> None:
+        if self.record is not None:
+            self.record.attributes[key] = value
+
+    def __enter__(self) -> span:
+        trace = _TRACE.get()
+        if trace is not None:
+            self.record = Span(
+                self.name, time.perf_counter(), parent=_PARENT.get(), attributes=self.attributes
+            )
+            trace.spans.append(self.record)
+            self.token = _PARENT.set(self.record)
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: Any) -> None:
+        if self.record is None:
+            return
+        self.record.end = time.perf_counter()
+        if exc_type is not None:
+            self.record.attributes["error"] = exc_type.__name__
+        _PARENT.reset(self.token)
+
+
+def annotate(key: str, value: Any) -> None:
+    """Set an attribute on the innermost open span of the current trace, if any."""
+    parent = _PARENT.get()
+    if parent is not None:
+        parent.attributes[key] = value
+
+
+def record_span(name: str, duration: float, **attributes: Any) -> None:
+    """Add a span that just ended after `duration` seconds, for callers that time themselves."""
+    trace = _TRACE.get()
+    if trace is None:
+        return
+    end = time.perf_counter()
+    trace.spans.append(Span(name, end - duration, end, _PARENT.get(), attributes))
+
+
+class TraceBuffer:
+    """Ring buffer of finished traces: every slow request, plus a random sample of the rest."""
+
+    def __init__(self) -> None:
+        self._traces: deque[Trace] = deque(maxlen=get_settings().trace_buffer_size)
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.slow = 0
+
+    def offer(self, trace: Trace) -> bool:
+        settings = get_settings()
+        self.seen += 1
+        slow = trace.duration_ms >= settings.trace_slow_ms
+        if not slow and random.random() >= settings.trace_sample_rate:  # noqa: S311
+            return False
+        with self._lock:
+            if self._traces.maxlen != settings.trace_buffer_size:
+                self._traces = deque(self._traces, maxlen=settings.trace_buffer_size)
+            self._traces.append(trace)
+            self.slow += int(slow)
+        if settings.trace_export_path:
+            with suppress(OSError):
+                _export(settings.trace_export_path, trace)
+        return True
+
+    def recent(self, limit: int = 50, *, min_ms: float = 0.0) -> list[Trace]:
+        with self._lock:
+            traces = list(self._traces)
+        matching = [t for t in reversed(traces) if t.duration_ms >= min_ms]
+        return matching[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+            self.seen = self.slow = 0
+
+
+_EXPORT_LOCK = threading.Lock()
+
+
+def _export(path: str, trace: Trace) -> None:
+    # One OTLP/JSON request per line, ready to replay into a collector later
+    line = json.dumps(otlp_payload([trace]), separators=(",", ":"))
+    with _EXPORT_LOCK, open(path, "a", encoding="utf-8") as fh:
+        fh.write(line + "\n")
+
+
+trace_buffer = TraceBuffer()
+
+ASGIApp = Callable[
+    [MutableMapping[str, Any], Callable[[], Awaitable[Any]], Callable[[Any], Awaitable[None]]],
+    Awaitable[None],
+]
+
+
+class TraceMiddleware:
+    """ASGI middleware opening a trace per HTTP request.
+
+    Adds the spans recorded before the response starts as a `Server-Timing` header, and
+    finishes the trace once the last body chunk is sent, so streamed responses include
+    their formatting spans in the slow-request buffer.
+    """
+
+    def __init__(self, app: ASGIApp, *, exclude: tuple[str, ...] = ("/metrics", "/healthz")):
+        self.app = app
+        self.exclude = exclude
+
+    async def __call__(
+        self,
+        scope: MutableMapping[str, Any],
+        receive: Callable[[], Awaitable[Any]],
+        send: Callable[[Any], Awaitable[None]],
+    ) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self.exclude
+            or not get_settings().tracing_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = _TRACE.set(trace)
+        finished = False
+
+        async def traced_send(message: Any) -> None:
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                trace.end = time.perf_counter()
+            await send(message)
+            if trace.end and not finished:
+                finished = True
+                trace_buffer.offer(trace)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            if not finished:
+                trace.end = trace.end or time.perf_counter()
+                trace_buffer.offer(trace)
+            _TRACE.reset(token)
@@ -1,14 +1,56 @@
 from __future__ import annotations
 
-from contextlib import contextmanager
-from typing import Iterator
+import asyncio
+import threading
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Iterator
 
 from core.config import get_settings
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session, sessionmaker
 
 _ENGINE = None
 _SESSION_FACTORY: sessionmaker[Session] | None = None
+# The async engine's connections belong to the event loop that created it
+_AsyncEntry = tuple[asyncio.AbstractEventLoop, AsyncEngine, async_sessionmaker[AsyncSession]]
+_ASYNC: _AsyncEntry | None = None
+_LOCK = threading.Lock()
+
+# Sync drivers mapped to an asyncio-capable driver for the same database
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg2": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(False) if driver else url
+
+
+def _engine_options(url: str) -> dict[str, Any]:
+    cfg = get_settings().database_pool
+    options: dict[str, Any] = {"pool_pre_ping": cfg.pool_pre_ping}
+    # SQLite uses its own pool classes, which take no sizing arguments
+    if not make_url(url).drivername.startswith("sqlite"):
+        options.update(
+            pool_size=cfg.pool_size,
+            max_overflow=cfg.max_overflow,
+            pool_timeout=cfg.pool_timeout,
+            pool_recycle=cfg.pool_recycle,
+        )
+    return options
 
 
 def get_engine():  # type: ignore[no-untyped-def]
@@ -17,7 +59,7 @@ def get_engine():  # type: ignore[no-untyped-def]
         settings = get_settings()
         if not settings.database_url:
             raise RuntimeError("DATABASE_URL not configured")
-        _ENGINE = create_engine(settings.database_url, pool_pre_ping=True)
+        _ENGINE = create_engine(settings.database_url, **_engine_options(settings.database_url))
     return _ENGINE
 
 
@@ -39,3 +81,71 @@ def db_session() -> Iterator[Session]:
         raise
     finally:
         session.close()
+
+
+def _async_entry() -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
+    global _ASYNC
+    loop = asyncio.get_running_loop()
+    entry = _ASYNC
+    if entry is not None and entry[0] is loop:
+        return entry[1], entry[2]
+    with _LOCK:
+        entry = _ASYNC
+        if entry is None or entry[0] is not loop:
+            settings = get_settings()
+            if not settings.database_url and not settings.database_async_url:
+                raise RuntimeError("DATABASE_URL not configured")
+            url = settings.database_async_url or async_database_url(settings.database_url or "")
+            engine = create_async_engine(url, **_engine_options(url))
+            entry = (loop, engine, async_sessionmaker(engine, expire_on_commit=False))
+            _ASYNC = entry
+    return entry[1], entry[2]
+
+
+def get_async_engine() -> AsyncEngine:
+    return _async_entry()[0]
+
+
+@asynccontextmanager
+async def async_db_session() -> AsyncIterator[AsyncSession]:
+    session = _async_entry()[1]()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def _pool_stats(engine: Engine) -> dict[str, Any]:
+    pool = engine.pool
+    stats: dict[str, Any] = {"pool": type(pool).__name__}
+    # Only queue pools track sizing; SQLite's pools expose just their class
+    for key in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, key, None)
+        if callable(fn):
+            stats[key] = fn()
+    return stats
+
+
+def pool_stats() -> dict[str, Any]:
+    cfg = get_settings().database_pool
+    entry = _ASYNC
+    return {
+        "configured": cfg.model_dump(),
+        "sync": _pool_stats(_ENGINE) if _ENGINE is not None else None,
+        "async": _pool_stats(entry[1].sync_engine) if entry is not None else None,
+    }
+
+
+async def aclose_database() -> None:
+    global _ASYNC
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        entry, _ASYNC = _ASYNC, None
+    if entry is not None and entry[0] is loop:
+        await entry[1].dispose()
+    if _ENGINE is not None:
+        _ENGINE.dispose()
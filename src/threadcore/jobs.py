@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import time
+import weakref
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from typing import Any
+from uuid import UUID
+
+from core.config import get_settings
+from core.redis import get_async_redis
+from redis.exceptions import ResponseError  # type: ignore[import-untyped]
+from sentinel.observer import JOBS
+from threadcore.database import async_db_session
+from threadcore.models import Job
+from threadcore.repository import (
+    JOB_TERMINAL,
+    acreate_job,
+    afinish_job,
+    aget_job,
+    astart_job_attempt,
+)
+
+STREAM = "lor3:jobs"
+GROUP = "lor3-jobs"
+
+# (kind, payload, client) -> JSON-serializable result
+JobHandler = Callable[[str, dict[str, Any], str | None], Awaitable[Any]]
+
+
+class JobFailed(Exception):
+    """A job that cannot succeed on retry (e.g. an invalid or oversized request)."""
+
+
+# Long-poll waiters in this process, woken as soon as a local worker finishes their job
+_WAITERS: dict[UUID, asyncio.Event] = {}
+# Redis clients whose consumer group is known to exist
+_GROUPS: weakref.WeakSet[Any] = weakref.WeakSet()
+
+
+async def _stream() -> Any:
+    r = get_async_redis()
+    if r not in _GROUPS:
+        try:
+            await r.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        _GROUPS.add(r)
+    return r
+
+
+async def enqueue(kind: str, payload: dict[str, Any], *, client: str | None = None) -> Job:
+    """Persist a job, then publish its id on the stream for any worker to pick up."""
+    async with async_db_session() as s:
+        job = await acreate_job(s, kind, json.dumps(payload), client=client)
+    try:
+        r = await _stream()
+        await r.xadd(STREAM, {"id": str(job.id)})
+    except Exception:
+        # Nothing will ever run it; do not leave it looking queued
+        async with async_db_session() as s:
+            await afinish_job(s, job.id, "failed", error="could not be queued")
+        raise
+    return job
+
+
+async def get(job_id: UUID) -> Job | None:
+    async with async_db_session() as s:
+        return await aget_job(s, job_id)
+
+
+async def wait_for(job_id: UUID, timeout: float) -> Job | None:
+    """Long-poll: the job once it has finished, or as it stands when `timeout` runs out.
+
+    Jobs finished by this process wake the waiter immediately; jobs finished by another
+    worker are noticed on the next `jobs_poll_interval` re-check.
+    """
+    deadline = time.monotonic() + timeout
+    event = _WAITERS.setdefault(job_id, asyncio.Event())
+    try:
+        while True:
+            job = await get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in JOB_TERMINAL or remaining <= 0:
+                return job
+            with suppress(TimeoutError):
+                async with asyncio.timeout(min(get_settings().jobs_poll_interval, remaining)):
+                    await event.wait()
+    finally:
+        _WAITERS.pop(job_id, None)
+
+
+def _notify(job_id: UUID) -> None:
+    event = _WAITERS.get(job_id)
+    if event is not None:
+        event.set()
+
+
+class JobWorker:
+    """Consumes the job stream in this process, running up to `jobs_workers` jobs at once.
+
+    A single reader takes as many entries as there are free slots through the consumer
+    group, so an idle worker holds one blocking read rather than one per slot. An entry
+    stays pending (invisible to other consumers) until it is acknowledged; a heartbeat
+    keeps a long-running job's entry fresh, and entries idle for `jobs_visibility_timeout`
+    (their worker died) are reclaimed by any consumer. Failed attempts are re-queued after
+    an exponential backoff, or after the `retry_after` a rate-limited attempt reports,
+    until `jobs_max_attempts`. Bound to the event loop that starts it.
+    """
+
+    def __init__(self) -> None:
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.workers = 0
+        self._reader: asyncio.Task[None] | None = None
+        self._active: set[asyncio.Task[None]] = set()
+        self._retries: set[asyncio.Task[None]] = set()
+        self._reclaim_at = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.reclaimed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    def start(self, handler: JobHandler, workers: int | None = None) -> None:
+        settings = get_settings()
+        workers = settings.jobs_workers if workers is None else workers
+        if self.running or workers <= 0 or not settings.redis_url or not settings.database_url:
+            return
+        self.workers = workers
+        self._reclaim_at = 0.0
+        self._reader = asyncio.get_running_loop().create_task(self._run(handler))
+
+    async def aclose(self) -> None:
+        """Stop consuming; jobs cut short stay pending and are reclaimed elsewhere."""
+        reader, self._reader = self._reader, None
+        tasks = [*([reader] if reader else []), *self._active, *self._retries]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._active.clear()
+        self._retries.clear()
+
+    async def _run(self, handler: JobHandler) -> None:
+        freed = asyncio.Event()
+
+        def done(task: asyncio.Task[None]) -> None:
+            self._active.discard(task)
+            freed.set()
+
+        while True:
+            free = self.workers - len(self._active)
+            if free <= 0:
+                freed.clear()
+                await freed.wait()
+                continue
+            try:
+                entries = await self._next(free)
+            except Exception:  # noqa: BLE001
+                # Redis is unavailable; entries taken but not finished stay pending and
+                # are reclaimed once their visibility timeout passes
+                await asyncio.sleep(1.0)
+                continue
+            for entry in entries:
+                task = asyncio.create_task(self._guarded(handler, *entry))
+                self._active.add(task)
+                task.add_done_callback(done)
+
+    async def _next(self, count: int) -> list[tuple[str, UUID, bool]]:
+        r = await _stream()
+        visibility = get_settings().jobs_visibility_timeout
+        entries, claimed = [], False
+        # Entries left pending by a dead worker first, then new ones. Nothing can go idle
+        # for less than the visibility timeout, so there is no point asking more often
+        if time.monotonic() >= self._reclaim_at:
+            _, entries, *_ = await r.xautoclaim(
+                STREAM,
+                GROUP,
+                self.consumer,
+                min_idle_time=int(visibility * 1000),
+                start_id="0-0",
+                count=count,
+            )
+            claimed = bool(entries)
+            if len(entries) < count:
+                self._reclaim_at = time.monotonic() + visibility / 2
+        if not entries:
+            reply = await r.xreadgroup(GROUP, self.consumer, {STREAM: ">"}, count=count, block=1000)
+            entries = reply[0][1] if reply else []
+        taken = []
+        for entry_id, fields in entries:
+            if fields and "id" in fields:
+                taken.append((entry_id, UUID(fields["id"]), claimed))
+            else:
+                await self._ack(entry_id)  # trimmed or malformed; nothing to run
+        return taken
+
+    async def _guarded(
+        self, handler: JobHandler, entry_id: str, job_id: UUID, reclaimed: bool
+    ) -> None:
+        # If Redis or the database fails mid-job the entry stays pending and is reclaimed
+        # once its visibility timeout passes
+        with suppress(Exception):
+            await self._process(handler, entry_id, job_id, reclaimed)
+
+    async def _ack(self, entry_id: str) -> None:
+        r = await _stream()
+        async with r.pipeline(transaction=True) as p:
+            p.xack(STREAM, GROUP, entry_id)
+            p.xdel(STREAM, entry_id)
+            await p.execute()
+
+    async def _heartbeat(self, entry_id: str) -> None:
+        # Re-claiming our own entry resets its idle time, so it is not handed to another
+        # consumer while the job is still running here
+        interval = max(get_settings().jobs_visibility_timeout / 3, 0.05)
+        while True:
+            await asyncio.sleep(interval)
+            with suppress(Exception):
+                r = await _stream()
+                await r.xclaim(
+                    STREAM, GROUP, self.consumer, min_idle_time=0, message_ids=[entry_id]
+                )
+
+    async def _process(
+        self, handler: JobHandler, entry_id: str, job_id: UUID, reclaimed: bool
+    ) -> None:
+        settings = get_settings()
+        async with async_db_session() as s:
+            job = await astart_job_attempt(s, job_id)
+        if job is None:
+            await self._ack(entry_id)  # unknown, or finished by an earlier delivery
+            return
+        if reclaimed:
+            self.reclaimed += 1
+            JOBS.inc(job.kind, "reclaimed")
+        if job.attempts > settings.jobs_max_attempts:
+            # Its worker died on every attempt so far; stop redelivering it
+            await self._finish(job, "failed", error="job worker lost on every attempt")
+            await self._ack(entry_id)
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(entry_id))
+        try:
+            async with asyncio.timeout(settings.jobs_timeout):
+                result = await handler(job.kind, json.loads(job.payload), job.client)
+        except Exception as exc:  # noqa: BLE001
+            error = str(exc) or type(exc).__name__
+            if isinstance(exc, JobFailed) or job.attempts >= settings.jobs_max_attempts:
+                await self._finish(job, "failed", error=error)
+                await self._ack(entry_id)
+            else:
+                await self._retry(job, entry_id, error, getattr(exc, "retry_after", 0.0))
+            return
+        finally:
+            heartbeat.cancel()
+        await self._finish(job, "succeeded", result=json.dumps(result))
+        await self._ack(entry_id)
+
+    async def _finish(self, job: Job, status: str, **fields: Any) -> None:
+        async with async_db_session() as s:
+            await afinish_job(s, job.id, status, **fields)
+        self.processed += 1
+        self.failed += status == "failed"
+        JOBS.inc(job.kind, status)
+        _notify(job.id)
+
+    async def _retry(self, job: Job, entry_id: str, error: str, retry_after: float) -> None:
+        async with async_db_session() as s:
+            await afinish_job(s, job.id, "queued", error=error)
+        self.retried += 1
+        JOBS.inc(job.kind, "retried")
+        delay = max(get_settings().jobs_retry_backoff * 2 ** (job.attempts - 1), retry_after)
+        task = asyncio.create_task(self._requeue(job.id, entry_id, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue(self, job_id: UUID, entry_id: str, delay: float) -> None:
+        # The old entry stays pending until the new one is added, so a crash during the
+        # backoff still ends in a redelivery (via reclaim) rather than a lost job
+        await asyncio.sleep(delay)
+        r = await _stream()
+        async with r.pipeline(transaction=True) as p:
+            p.xadd(STREAM, {"id": str(job_id)})
+            p.xack(STREAM, GROUP, entry_id)
+            p.xdel(STREAM, entry_id)
+            await p.execute()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "consumer": self.consumer,
+            "workers": self.workers if self.running else 0,
+            "active": len(self._active),
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "reclaimed": self.reclaimed,
+            "retrying": len(self._retries),
+        }
+
+
+job_worker = JobWorker()
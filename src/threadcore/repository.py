@@ -1,13 +1,44 @@
 from __future__ import annotations
 
-from uuid import UUID
+import hashlib
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID, uuid4
 
 from oven.schemas import PromptRecord
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Row, insert, literal, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from threadcore.models import Message, PromptVersion, Thread
+from threadcore.models import Job, Message, PromptVersion, Thread
 from threadcore.models import Session as DbSession
 
+# Rows per statement in bulk upserts; 1000 x 7 columns stays far below PostgreSQL's
+# 65535 bind parameter limit
+UPSERT_CHUNK = 1000
+
+
+@dataclass
+class UpsertCounts:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+
+def prompt_content_hash(system: str, description: str | None, template: str | None) -> str:
+    h = hashlib.sha256()
+    for part in (system, description, template):
+        # Length-prefix each part so ("ab", None) and ("a", "b") hash differently
+        data = b"\x00" if part is None else part.encode()
+        h.update(len(data).to_bytes(8, "big") + data)
+    return h.hexdigest()
+
 
 def create_session(session: Session, user_id: str | None = None) -> DbSession:
     obj = DbSession(user_id=user_id)
@@ -50,11 +81,151 @@ def add_message(
     return obj
 
 
+def insert_messages(session: Session, rows: list[dict[str, Any]]) -> int:
+    """Insert many message rows with one executemany (batched multi-row VALUES)."""
+    if rows:
+        session.execute(insert(Message), rows)
+    return len(rows)
+
+
 def get_thread_messages(session: Session, thread_id: UUID) -> list[Message]:
-    stmt = select(Message).where(Message.thread_id == thread_id).order_by(Message.id.asc())
+    stmt = (
+        select(Message)
+        .where(Message.thread_id == thread_id)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+    )
     return list(session.scalars(stmt))
 
 
+# Columns of the lightweight history projection (no ORM identity map or relationships)
+MESSAGE_COLUMNS = (
+    Message.id,
+    Message.role,
+    Message.content,
+    Message.provider,
+    Message.prompt_name,
+    Message.prompt_version,
+    Message.token_count,
+    Message.created_at,
+)
+
+
+def _keyset(cursor: tuple[datetime, UUID]) -> ColumnElement[Any]:
+    """A (created_at, id) cursor as bound values comparable with the message keyset."""
+    created_at, message_id = cursor
+    return tuple_(
+        literal(created_at, Message.created_at.type), literal(message_id, Message.id.type)
+    )
+
+
+def get_recent_messages(
+    session: Session,
+    thread_id: UUID,
+    *,
+    limit: int = 50,
+    before: tuple[datetime, UUID] | None = None,
+    after: tuple[datetime, UUID] | None = None,
+    max_tokens: int | None = None,
+) -> list[Row[Any]]:
+    """The newest `limit` messages of a thread, oldest first, as `MESSAGE_COLUMNS` rows.
+
+    Keyset pagination on (created_at, id) served by ix_messages_thread_created_id, so the
+    cost depends on the window, not the thread length. `before` is the (created_at, id)
+    of the oldest message already seen; `after` excludes messages up to and including that
+    key. With `max_tokens` the window is further cut to the newest messages whose
+    `token_count` sum fits.
+    """
+    stmt = select(*MESSAGE_COLUMNS).where(Message.thread_id == thread_id)
+    if before is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) < _keyset(before))
+    if after is not None:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) > _keyset(after))
+    stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+    rows: list[Row[Any]] = []
+    used = 0
+    for row in session.execute(stmt):
+        used += row.token_count or 0
+        if max_tokens is not None and used > max_tokens:
+            break
+        rows.append(row)
+    rows.reverse()
+    return rows
+
+
+def get_messages_after(
+    session: Session,
+    thread_id: UUID,
+    *,
+    after: tuple[datetime, UUID] | None,
+    before: tuple[datetime, UUID],
+    limit: int = 50,
+) -> list[Row[Any]]:
+    """Oldest-first messages strictly between `after` and `before`, keyset-paginated."""
+    key = tuple_(Message.created_at, Message.id)
+    stmt = select(*MESSAGE_COLUMNS).where(Message.thread_id == thread_id, key < _keyset(before))
+    if after is not None:
+        stmt = stmt.where(key > _keyset(after))
+    stmt = stmt.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit)
+    return list(session.execute(stmt))
+
+
+def get_thread(session: Session, thread_id: UUID) -> Thread | None:
+    return session.get(Thread, thread_id)
+
+
+# Job statuses after which a job is never run again
+JOB_TERMINAL = ("succeeded", "failed")
+
+
+def create_job(session: Session, kind: str, payload: str, *, client: str | None = None) -> Job:
+    # Timestamps are set here rather than by the server so the returned row is complete
+    now = datetime.now(timezone.utc)
+    obj = Job(
+        kind=kind,
+        status="queued",
+        payload=payload,
+        client=client,
+        attempts=0,
+        created_at=now,
+        updated_at=now,
+    )
+    session.add(obj)
+    session.flush()
+    return obj
+
+
+def get_job(session: Session, job_id: UUID) -> Job | None:
+    return session.get(Job, job_id)
+
+
+def start_job_attempt(session: Session, job_id: UUID) -> Job | None:
+    """Mark a job running and count the attempt; None when unknown or already finished."""
+    job = session.get(Job, job_id, with_for_update=True)
+    if job is None or job.status in JOB_TERMINAL:
+        return None
+    job.status = "running"
+    job.attempts += 1
+    job.updated_at = datetime.now(timezone.utc)
+    session.flush()
+    return job
+
+
+def finish_job(
+    session: Session,
+    job_id: UUID,
+    status: str,
+    *,
+    result: str | None = None,
+    error: str | None = None,
+) -> None:
+    """Record an attempt's outcome; `queued` puts a failed attempt back for a retry."""
+    now = datetime.now(timezone.utc)
+    values: dict[str, Any] = {"status": status, "result": result, "error": error, "updated_at": now}
+    if status in JOB_TERMINAL:
+        values["finished_at"] = now
+    session.execute(update(Job).where(Job.id == job_id).values(**values))
+
+
 def upsert_prompt_version(
     session: Session,
     name: str,
@@ -65,15 +236,22 @@ def upsert_prompt_version(
 ) -> PromptVersion:
     stmt = select(PromptVersion).where(PromptVersion.name == name, PromptVersion.version == version)
     existing = session.scalars(stmt).first()
+    content_hash = prompt_content_hash(system, description, template)
     if existing:
         existing.system = system
         existing.description = description
         existing.template = template
+        existing.content_hash = content_hash
         session.add(existing)
         session.flush()
         return existing
     obj = PromptVersion(
-        name=name, version=version, system=system, description=description, template=template
+        name=name,
+        version=version,
+        system=system,
+        description=description,
+        template=template,
+        content_hash=content_hash,
     )
     session.add(obj)
     session.flush()
@@ -107,18 +285,73 @@ def get_prompt_record(
 
 
 def save_many_prompts(session: Session, prompts: dict[str, PromptRecord]) -> int:
-    count = 0
-    for name, rec in prompts.items():
-        upsert_prompt_version(
-            session,
-            name=name,
-            version=rec.version,
-            system=rec.system,
-            description=rec.description,
-            template=rec.template,
-        )
-        count += 1
-    return count
+    return bulk_upsert_prompts(session, prompts).total
+
+
+def _insert_on_conflict(session: Session, rows: list[dict[str, Any]]) -> None:
+    """Batched INSERT that updates on (name, version) conflicts from concurrent writers."""
+    dialect = session.get_bind().dialect.name
+    module = {"postgresql": postgresql, "sqlite": sqlite}.get(dialect)
+    if module is None:
+        session.execute(insert(PromptVersion), rows)
+        return
+    stmt = module.insert(PromptVersion)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PromptVersion.name, PromptVersion.version],
+        set_={
+            "system": stmt.excluded.system,
+            "description": stmt.excluded.description,
+            "template": stmt.excluded.template,
+            "content_hash": stmt.excluded.content_hash,
+        },
+        where=PromptVersion.content_hash.is_distinct_from(stmt.excluded.content_hash),
+    )
+    session.execute(stmt, rows)
+
+
+def bulk_upsert_prompts(
+    session: Session, prompts: Mapping[str, PromptRecord], *, chunk_size: int = UPSERT_CHUNK
+) -> UpsertCounts:
+    """Set-based upsert of many prompts: at most three statements per chunk, not two per prompt.
+
+    Each chunk reads the stored content hashes with one `name IN (...)` query, skips rows
+    whose content is unchanged, bulk-updates changed rows by primary key and inserts new
+    ones with `INSERT ... ON CONFLICT (name, version) DO UPDATE`.
+    """
+    counts = UpsertCounts()
+    items = list(prompts.items())
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start : start + chunk_size]
+        stmt = select(
+            PromptVersion.id, PromptVersion.name, PromptVersion.version, PromptVersion.content_hash
+        ).where(PromptVersion.name.in_([name for name, _ in chunk]))
+        stored = {
+            (row.name, row.version): (row.id, row.content_hash) for row in session.execute(stmt)
+        }
+
+        inserts: list[dict[str, Any]] = []
+        updates: list[dict[str, Any]] = []
+        for name, rec in chunk:
+            values = {
+                "system": rec.system,
+                "description": rec.description,
+                "template": rec.template,
+                "content_hash": prompt_content_hash(rec.system, rec.description, rec.template),
+            }
+            existing = stored.get((name, rec.version))
+            if existing is None:
+                inserts.append({"id": uuid4(), "name": name, "version": rec.version, **values})
+            elif existing[1] == values["content_hash"]:
+                counts.unchanged += 1
+            else:
+                updates.append({"id": existing[0], **values})
+        if updates:
+            session.execute(update(PromptVersion), updates)
+        if inserts:
+            _insert_on_conflict(session, inserts)
+        counts.inserted += len(inserts)
+        counts.updated += len(updates)
+    return counts
 
 
 def list_prompt_versions(session: Session, name: str) -> list[str]:
@@ -130,16 +363,166 @@ def list_prompt_versions(session: Session, name: str) -> list[str]:
     return [row[0] for row in session.execute(stmt).all() if row[0] is not None]
 
 
-def get_latest_prompt_record(session: Session, name: str) -> PromptRecord | None:
-    versions = list_prompt_versions(session, name)
-    latest_version: str | None = None
+def _latest_version(versions: list[str]) -> str | None:
     numeric_pairs: list[tuple[int, str]] = []
     for v in versions:
         vv = v.lower().lstrip("v")
         if vv.isdigit():
             numeric_pairs.append((int(vv), v))
     if numeric_pairs:
-        latest_version = max(numeric_pairs, key=lambda x: x[0])[1]
-    else:
-        latest_version = versions[-1] if versions else None
-    return get_prompt_record(session, name, latest_version)
+        return max(numeric_pairs, key=lambda x: x[0])[1]
+    return versions[-1] if versions else None
+
+
+def get_latest_prompt_record(session: Session, name: str) -> PromptRecord | None:
+    versions = list_prompt_versions(session, name)
+    return get_prompt_record(session, name, _latest_version(versions))
+
+
+def get_prompt_records(
+    session: Session, wanted: Mapping[str, str | None]
+) -> dict[str, PromptRecord]:
+    """Resolve many prompts with a single `name IN (...)` query.
+
+    Each name maps to an explicit version, or None/"latest" for its latest version.
+    """
+    if not wanted:
+        return {}
+    stmt = (
+        select(PromptVersion)
+        .where(PromptVersion.name.in_(list(wanted)))
+        .order_by(PromptVersion.created_at.asc())
+    )
+    rows: dict[str, list[PromptVersion]] = {}
+    for row in session.scalars(stmt):
+        rows.setdefault(row.name, []).append(row)
+
+    out: dict[str, PromptRecord] = {}
+    for name, candidates in rows.items():
+        version = wanted[name]
+        if version in (None, "latest"):
+            version = _latest_version(sorted(r.version for r in candidates if r.version))
+        matches = [r for r in candidates if version is None or r.version == version]
+        if matches:
+            row = matches[-1]
+            out[name] = PromptRecord(
+                name=row.name,
+                system=row.system,
+                version=row.version,
+                description=row.description,
+                template=row.template,
+            )
+    return out
+
+
+# Async variants for AsyncSession (threadcore.database.async_db_session). They run the sync
+# implementations above through AsyncSession.run_sync, so both share one code path.
+
+
+async def acreate_session(session: AsyncSession, user_id: str | None = None) -> DbSession:
+    return await session.run_sync(create_session, user_id)
+
+
+async def acreate_thread(
+    session: AsyncSession, session_id: UUID, title: str | None = None
+) -> Thread:
+    return await session.run_sync(create_thread, session_id, title)
+
+
+async def aadd_message(
+    session: AsyncSession, thread_id: UUID, role: str, content: str, **fields: Any
+) -> Message:
+    return await session.run_sync(lambda s: add_message(s, thread_id, role, content, **fields))
+
+
+async def ainsert_messages(session: AsyncSession, rows: list[dict[str, Any]]) -> int:
+    return await session.run_sync(insert_messages, rows)
+
+
+async def aget_recent_messages(
+    session: AsyncSession,
+    thread_id: UUID,
+    *,
+    limit: int = 50,
+    before: tuple[datetime, UUID] | None = None,
+    after: tuple[datetime, UUID] | None = None,
+    max_tokens: int | None = None,
+) -> list[Row[Any]]:
+    return await session.run_sync(
+        lambda s: get_recent_messages(
+            s, thread_id, limit=limit, before=before, after=after, max_tokens=max_tokens
+        )
+    )
+
+
+async def aget_messages_after(
+    session: AsyncSession,
+    thread_id: UUID,
+    *,
+    after: tuple[datetime, UUID] | None,
+    before: tuple[datetime, UUID],
+    limit: int = 50,
+) -> list[Row[Any]]:
+    return await session.run_sync(
+        lambda s: get_messages_after(s, thread_id, after=after, before=before, limit=limit)
+    )
+
+
+async def aget_thread(session: AsyncSession, thread_id: UUID) -> Thread | None:
+    return await session.get(Thread, thread_id)
+
+
+async def aget_thread_messages(session: AsyncSession, thread_id: UUID) -> list[Message]:
+    return await session.run_sync(get_thread_messages, thread_id)
+
+
+async def alist_prompt_names(session: AsyncSession) -> list[str]:
+    return await session.run_sync(list_prompt_names)
+
+
+async def aget_prompt_record(
+    session: AsyncSession, name: str, version: str | None = None
+) -> PromptRecord | None:
+    return await session.run_sync(get_prompt_record, name, version)
+
+
+async def aget_prompt_records(
+    session: AsyncSession, wanted: Mapping[str, str | None]
+) -> dict[str, PromptRecord]:
+    return await session.run_sync(get_prompt_records, wanted)
+
+
+async def alist_prompt_versions(session: AsyncSession, name: str) -> list[str]:
+    return await session.run_sync(list_prompt_versions, name)
+
+
+async def aget_latest_prompt_record(session: AsyncSession, name: str) -> PromptRecord | None:
+    return await session.run_sync(get_latest_prompt_record, name)
+
+
+async def abulk_upsert_prompts(
+    session: AsyncSession, prompts: Mapping[str, PromptRecord], *, chunk_size: int = UPSERT_CHUNK
+) -> UpsertCounts:
+    return await session.run_sync(lambda s: bulk_upsert_prompts(s, prompts, chunk_size=chunk_size))
+
+
+async def asave_many_prompts(session: AsyncSession, prompts: dict[str, PromptRecord]) -> int:
+    return await session.run_sync(save_many_prompts, prompts)
+
+
+async def acreate_job(
+    session: AsyncSession, kind: str, payload: str, *, client: str | None = None
+) -> Job:
+    return await session.run_sync(lambda s: create_job(s, kind, payload, client=client))
+
+
+async def aget_job(session: AsyncSession, job_id: UUID) -> Job | None:
+    return await session.run_sync(get_job, job_id)
+
+
+async def astart_job_attempt(session: AsyncSession, job_id: UUID) -> Job | None:
+    return await session.run_sync(start_job_attempt, job_id)
+
+
+async def afinish_job(session: AsyncSession, job_id: UUID, status: str, **fields: Any) -> None:
+    await session.run_sync(lambda s: finish_job(s, job_id, status, **fields))
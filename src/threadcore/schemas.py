@@ -1,27 +1,57 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Any
+from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class MessageOut(BaseModel):
-    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
     role: str
     content: str
     provider: str | None = None
     prompt_name: str | None = None
     prompt_version: str | None = None
+    token_count: int | None = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class ThreadOut(BaseModel):
-    id: int
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    session_id: UUID
     title: str | None = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+
+class ThreadCreate(BaseModel):
+    title: str | None = None
+    # Existing session to attach the thread to; a new one is created when omitted
+    session_id: UUID | None = None
+    user_id: str | None = None
+
+
+class MessagePage(BaseModel):
+    """Messages in chronological order; `next_cursor` pages further back in time."""
+
+    items: list[MessageOut]
+    next_cursor: str | None = None
+
+
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    kind: str
+    status: str
+    attempts: int
+    result: Any | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
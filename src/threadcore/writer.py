@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from uuid import UUID, uuid4
+
+from core.config import get_settings
+from router_engine.passes.token_budget import count_tokens
+from threadcore.database import async_db_session
+from threadcore.repository import ainsert_messages
+
+
+def _cost_cents(provider: str | None, tokens: int) -> int | None:
+    rate = get_settings().provider_cost_cents_per_1k.get(provider or "")
+    return None if rate is None else round(tokens * rate / 1000)
+
+
+def turn_rows(
+    thread_id: UUID,
+    user_content: str,
+    assistant_content: str,
+    *,
+    provider: str,
+    prompt_name: str | None = None,
+    prompt_version: str | None = None,
+) -> list[dict[str, Any]]:
+    """Message rows for one chat turn, timestamped now so they sort in turn order."""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for offset, (role, content, source) in enumerate(
+        (("user", user_content, None), ("assistant", assistant_content, provider))
+    ):
+        tokens = count_tokens(content, provider=provider)
+        rows.append(
+            {
+                "id": uuid4(),
+                "thread_id": thread_id,
+                "role": role,
+                "content": content,
+                "provider": source,
+                "prompt_name": prompt_name,
+                "prompt_version": prompt_version,
+                "token_count": tokens,
+                "cost_cents": _cost_cents(provider, tokens),
+                "created_at": now + timedelta(microseconds=offset),
+            }
+        )
+    return rows
+
+
+async def _write_batch(rows: list[dict[str, Any]]) -> None:
+    async with async_db_session() as s:
+        await ainsert_messages(s, rows)
+
+
+class MessageWriter:
+    """Write-behind queue persisting message rows in batches off the request path.
+
+    Rows are flushed when `message_batch_size` accumulate or `message_flush_interval`
+    passes, in one executemany per batch on the async engine. The queue is bounded: when
+    Postgres falls behind, `put` waits up to `message_enqueue_timeout` for space and then
+    drops the rows, so slow writes apply backpressure without failing chats. A turn's rows
+    are queued together or not at all, so a thread never keeps a question without its
+    answer. Bound to the event loop that first uses it; `aclose` drains what is queued on
+    shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[list[dict[str, Any]]] | None = None
+        self._space: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._closing = False
+        self._queued = 0  # rows waiting in the queue; bounded by `message_queue_max`
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _ensure_started(self) -> tuple[asyncio.Queue[list[dict[str, Any]]], asyncio.Condition]:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._space is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._space = asyncio.Condition()
+            self._queued = 0
+            self._task = loop.create_task(self._run(self._queue, self._space))
+        return self._queue, self._space
+
+    def _fits(self, count: int) -> bool:
+        # An empty queue takes any turn, even one larger than the bound
+        return self._queued == 0 or self._queued + count <= get_settings().message_queue_max
+
+    async def put(self, rows: list[dict[str, Any]]) -> bool:
+        """Queue a turn's rows for writing; False when they were dropped under backpressure."""
+        if self._closing or not get_settings().database_url:
+            return False
+        if not rows:
+            return True
+        queue, space = self._ensure_started()
+        if not self._fits(len(rows)):
+            try:
+                async with space:
+                    await asyncio.wait_for(
+                        space.wait_for(lambda: self._fits(len(rows))),
+                        get_settings().message_enqueue_timeout,
+                    )
+            except asyncio.TimeoutError:
+                self.dropped += len(rows)
+                return False
+        self._queued += len(rows)
+        queue.put_nowait(rows)
+        return True
+
+    async def _run(
+        self, queue: asyncio.Queue[list[dict[str, Any]]], space: asyncio.Condition
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            settings = get_settings()
+            turns = [await queue.get()]
+            size = len(turns[0])
+            deadline = loop.time() + settings.message_flush_interval
+            while size < settings.message_batch_size:
+                if not queue.empty():
+                    turns.append(queue.get_nowait())
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0 or self._closing:
+                        break
+                    try:
+                        turns.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                size += len(turns[-1])
+            self._queued -= size
+            async with space:
+                space.notify_all()
+            try:
+                await self._write(
+                    [row for turn in turns for row in turn], settings.message_write_retries
+                )
+            finally:
+                for _ in turns:
+                    queue.task_done()
+
+    async def _write(self, batch: list[dict[str, Any]], retries: int) -> None:
+        for attempt in range(retries + 1):
+            try:
+                await _write_batch(batch)
+            except Exception:
+                if attempt == retries:
+                    self.failed += len(batch)
+                    return
+                await asyncio.sleep(min(0.1 * 2**attempt, 2.0))
+            else:
+                self.written += len(batch)
+                self.batches += 1
+                return
+
+    async def aclose(self) -> None:
+        """Stop accepting rows and flush the queue within `message_drain_timeout`."""
+        queue, task = self._queue, self._task
+        if queue is None or task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(queue.join(), get_settings().message_drain_timeout)
+        except asyncio.TimeoutError:
+            self.dropped += self._queued
+        finally:
+            task.cancel()
+            self._queue = self._task = None
+            self._space = None
+            self._queued = 0
+            self._closing = False
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "queued": self._queued,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,31 @@
+import json
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+from core.config import Settings, get_settings
+from providers import registry
+
+
+@pytest.fixture
+def settings_env(monkeypatch: pytest.MonkeyPatch) -> Iterator[Callable[..., Settings]]:
+    """Override settings through the environment and rebuild the cached Settings."""
+
+    def apply(**values: Any) -> Settings:
+        for key, value in values.items():
+            monkeypatch.setenv(key.upper(), value if isinstance(value, str) else json.dumps(value))
+        get_settings.cache_clear()
+        return get_settings()
+
+    yield apply
+    get_settings.cache_clear()
+
+
+@pytest.fixture
+def provider_registry() -> Iterator[Callable[..., None]]:
+    """Register extra providers for one test and restore the registry afterwards."""
+    registry.get_provider("")
+    saved = dict(registry._PROVIDERS)
+    yield registry.register_provider
+    registry._PROVIDERS.clear()
+    registry._PROVIDERS.update(saved)
@@ -0,0 +1,124 @@
+import json
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from oven import cache, loader, manager
+from providers.base import History
+from providers.fake_provider import FakeProvider
+
+
+class PeakProvider(FakeProvider):
+    """Fake provider that remembers the most calls it ever had in flight at once."""
+
+    def __init__(self, name: str, latency: float) -> None:
+        super().__init__(name, latency=latency)
+        self.inflight = 0
+        self.peak = 0
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            return await super().agenerate(
+                prompt, output_format=output_format, system=system, history=history
+            )
+        finally:
+            self.inflight -= 1
+
+
+@pytest.fixture
+def batch_env(
+    tmp_path: Path,
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[PeakProvider]:
+    for var in ("DATABASE_URL", "REDIS_URL"):
+        monkeypatch.delenv(var, raising=False)
+    prompts = tmp_path / "prompts.yaml"
+    prompts.write_text("helper:\n  system: You help with $topic.\n")
+    for attr, value in (("_SEEDED", True), ("_STORE", {}), ("_APPLIED", {})):
+        monkeypatch.setattr(manager, attr, value)
+    loader.clear_parsed_cache()
+    cache.prompt_cache.invalidate()
+    provider = PeakProvider("fake:batch", latency=0.05)
+    provider_registry(provider)
+    settings_env(
+        prompts_file=str(prompts),
+        primary="fake:batch",
+        fallbacks=[],
+        response_cache_ttl=0,
+        singleflight_enabled=False,
+        max_tokens=50,
+    )
+    yield provider
+    cache.prompt_cache.invalidate()
+
+
+def _lines(body: str) -> list[dict]:
+    return [json.loads(line) for line in body.splitlines()]
+
+
+@pytest.mark.usefixtures("batch_env")
+def test_batch_streams_every_item_with_per_item_errors() -> None:
+    items = [{"message": f"question {i}"} for i in range(5)]
+    items.insert(2, {"message": "word " * 200})  # over the token budget
+    with TestClient(app) as client:
+        response = client.post("/api/v1/chat/batch", json={"items": items})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = {line["index"]: line for line in _lines(response.text)}
+    assert sorted(lines) == list(range(6))
+    assert lines[2]["error"]["status"] == 413
+    assert lines[0]["content"] == "[fake:batch markdown] question 0"
+    assert all(lines[i]["provider"] == "fake:batch" for i in (0, 1, 3, 4, 5))
+
+
+def test_batch_concurrency_is_bounded(batch_env: PeakProvider) -> None:
+    items = [{"message": f"q{i}"} for i in range(40)]
+    with TestClient(app) as client:
+        response = client.post("/api/v1/chat/batch", json={"items": items, "concurrency": 8})
+    assert len(_lines(response.text)) == 40
+    assert batch_env.peak == 8
+
+
+def test_shared_prompts_are_resolved_once(
+    batch_env: PeakProvider, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    lookups: list[tuple[str, str | None]] = []
+    aget = manager.PromptOven.aget
+
+    async def counting(self: manager.PromptOven, name: str, version: str | None = None):
+        lookups.append((name, version))
+        return await aget(self, name, version)
+
+    monkeypatch.setattr(manager.PromptOven, "aget", counting)
+    items = [
+        {"message": f"q{i}", "prompt_name": "helper", "prompt_vars": {"topic": "maths"}}
+        for i in range(10)
+    ]
+    with TestClient(app) as client:
+        lines = _lines(client.post("/api/v1/chat/batch", json={"items": items}).text)
+    assert lookups == [("helper", None)]
+    assert len(lines) == 10 and all("error" not in line for line in lines)
+    assert batch_env.last_system == "You help with maths."
+
+
+@pytest.mark.usefixtures("batch_env")
+def test_oversized_batches_are_rejected(settings_env: Callable[..., Settings]) -> None:
+    settings_env(chat_batch_max_items=3)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/chat/batch", json={"items": [{"message": "x"}] * 4})
+    assert response.status_code == 413
@@ -0,0 +1,37 @@
+import json
+from collections.abc import Callable
+
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+
+
+def _events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_chat_streams_sse_json_envelope(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:down", fail=True))
+    provider_registry(FakeProvider("fake:up"))
+    settings_env(primary="fake:down", fallbacks=["fake:up"])
+
+    client = TestClient(app)
+    resp = client.post(
+        "/api/v1/chat", json={"message": 'say "hi" there', "format": "json", "stream": True}
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(resp.text)
+    assert events[0] == ("start", {"provider": "fake:up"})
+    assert events[-1] == ("done", {})
+    deltas = [data["content"] for name, data in events if name == "delta"]
+    assert len(deltas) > 3
+    assert json.loads("".join(deltas)) == {"content": '[fake:up json] say "hi" there'}
@@ -0,0 +1,76 @@
+import asyncio
+from collections.abc import Callable
+
+import fakeredis
+import pytest
+from core.config import Settings
+from providers.fake_provider import FakeProvider
+from router_engine import health
+from router_engine.health import BreakerBoard, BreakerState
+from router_engine.router import achoose_provider_and_respond, breakers
+
+
+def test_breaker_opens_and_reroutes(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    down, up = FakeProvider("fake:flaky", fail=True), FakeProvider("fake:steady")
+    provider_registry(down)
+    provider_registry(up)
+    # Disable health demotion so only the breaker decides whether the primary is tried
+    settings_env(
+        primary="fake:flaky",
+        fallbacks=["fake:steady"],
+        breaker_min_calls=3,
+        health_demote_below=0,
+    )
+
+    async def burst() -> None:
+        for _ in range(10):
+            await achoose_provider_and_respond("hi", context_depth=0, output_format="raw")
+
+    asyncio.run(burst())
+    # Once open, the sick primary is skipped instead of failing every request
+    assert down.calls == 3
+    assert up.calls == 10
+    status = {s["provider"]: s for s in breakers.snapshot()}
+    assert status["fake:flaky"]["state"] == "open"
+    assert status["fake:flaky"]["reason"] == "error rate 100%"
+
+
+def test_open_breaker_is_shared_through_redis(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings = settings_env(redis_url="redis://stand-in", breaker_min_calls=2)
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        health, "get_redis", lambda: fakeredis.FakeRedis(server=server, decode_responses=True)
+    )
+
+    worker_a, worker_b = BreakerBoard(), BreakerBoard()
+    worker_b.breaker("fake:flaky")
+    for _ in range(2):
+        worker_a.record("fake:flaky", ok=False, latency=0.01)
+    worker_a.sync(settings)
+    worker_b.sync(settings)
+
+    breaker = worker_b.breaker("fake:flaky")
+    assert breaker.state is BreakerState.OPEN
+    assert breaker.snapshot(settings)["window"]["calls"] == 2
+
+
+def test_unhealthy_provider_is_demoted(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    down, up = FakeProvider("fake:sick", fail=True), FakeProvider("fake:well")
+    provider_registry(down)
+    provider_registry(up)
+    settings_env(primary="fake:sick", fallbacks=["fake:well"])
+
+    async def burst() -> None:
+        for _ in range(5):
+            await achoose_provider_and_respond("hi", context_depth=0, output_format="raw")
+
+    asyncio.run(burst())
+    # After its first failure the primary's health score drops below the demotion threshold
+    assert down.calls == 1
+    assert up.calls == 5
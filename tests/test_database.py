@@ -0,0 +1,55 @@
+from collections.abc import Callable
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from threadcore import database
+from threadcore.database import async_database_url, async_db_session, get_engine
+from threadcore.models import Base
+from threadcore.repository import aadd_message, acreate_thread, aget_thread_messages
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        ("postgresql://u:p@db/lor", "postgresql+psycopg://u:p@db/lor"),
+        ("postgresql+psycopg2://u@db/lor", "postgresql+psycopg://u@db/lor"),
+        ("postgresql+asyncpg://u@db/lor", "postgresql+asyncpg://u@db/lor"),
+        ("sqlite:///tmp/x.db", "sqlite+aiosqlite:///tmp/x.db"),
+    ],
+)
+def test_async_database_url(url: str, expected: str) -> None:
+    assert async_database_url(url) == expected
+
+
+def test_pool_options_come_from_settings(settings_env: Callable[..., Settings]) -> None:
+    settings_env(database_pool={"pool_size": 3, "max_overflow": 1, "pool_recycle": 60})
+    options = database._engine_options("postgresql+psycopg://u@db/lor")
+    assert (options["pool_size"], options["max_overflow"], options["pool_recycle"]) == (3, 1, 60)
+    assert "pool_size" not in database._engine_options("sqlite:///x.db")
+
+
+def test_async_repository_and_pool_stats(
+    tmp_path: Path, settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for attr in ("_ENGINE", "_SESSION_FACTORY", "_ASYNC"):
+        monkeypatch.setattr(database, attr, None)
+    settings_env(database_url=f"sqlite:///{tmp_path / 'threads.db'}")
+    Base.metadata.create_all(get_engine())
+
+    async def scenario() -> list[str]:
+        async with async_db_session() as s:
+            thread = await acreate_thread(s, uuid4(), "t")
+            await aadd_message(s, thread.id, "user", "hello", token_count=1)
+        async with async_db_session() as s:
+            return [m.content for m in await aget_thread_messages(s, thread.id)]
+
+    with TestClient(app) as client:
+        assert client.portal.call(scenario) == ["hello"]
+        stats = client.get("/api/v1/status/db").json()
+    assert stats["configured"]["pool_size"] == 10
+    assert stats["async"]["pool"] and stats["sync"]["pool"]
+    assert database._ASYNC is None  # disposed by the lifespan on shutdown
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from providers.fake_provider import FakeProvider
+from router_engine.hedging import HedgePolicy, HedgeStats, LatencyTracker, race
+
+
+def _run(*providers: FakeProvider, policy: HedgePolicy, stats: HedgeStats) -> tuple[str, str]:
+    async def call(provider: FakeProvider) -> tuple[str, str]:
+        return await provider.agenerate("hi", output_format="raw")
+
+    return asyncio.run(race(providers, call, policy=policy, tracker=LatencyTracker(), stats=stats))
+
+
+def test_slow_primary_is_hedged_and_cancelled() -> None:
+    slow, fast = FakeProvider("fake:slow", latency=1.0), FakeProvider("fake:fast", latency=0.01)
+    stats = HedgeStats()
+    start = time.perf_counter()
+    _, provider = _run(slow, fast, policy=HedgePolicy(delay=0.05), stats=stats)
+    assert provider == "fake:fast"
+    assert time.perf_counter() - start < 0.5
+    assert stats.snapshot() == {
+        "requests": 1,
+        "hedges_fired": 1,
+        "hedge_wins": 1,
+        "cancelled_calls": 1,
+    }
+
+
+def test_failure_falls_back_without_waiting_for_hedge_delay() -> None:
+    down, up = FakeProvider("fake:down", fail=True), FakeProvider("fake:up")
+    stats = HedgeStats()
+    start = time.perf_counter()
+    _, provider = _run(down, up, policy=HedgePolicy(delay=5.0), stats=stats)
+    assert provider == "fake:up"
+    assert time.perf_counter() - start < 0.5
+    assert stats.hedges_fired == 0
+
+
+def test_losers_have_unwound_when_race_returns() -> None:
+    slow, fast = FakeProvider("fake:slow", latency=1.0), FakeProvider("fake:fast", latency=0.01)
+    released: list[str] = []
+
+    async def call(provider: FakeProvider) -> tuple[str, str]:
+        try:
+            return await provider.agenerate("hi", output_format="raw")
+        finally:
+            await asyncio.sleep(0)  # cleanup that yields, like releasing a Redis-backed slot
+            released.append(provider.name)
+
+    async def scenario() -> list[str]:
+        await race(
+            [slow, fast],
+            call,
+            policy=HedgePolicy(delay=0.05),
+            tracker=LatencyTracker(),
+            stats=HedgeStats(),
+        )
+        return list(released)
+
+    assert sorted(asyncio.run(scenario())) == ["fake:fast", "fake:slow"]
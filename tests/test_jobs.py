@@ -0,0 +1,146 @@
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Tuple
+
+import fakeredis
+import pytest
+from api.v1.routes.jobs import run_job
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.base import History
+from providers.fake_provider import FakeProvider
+from threadcore import database, jobs
+from threadcore.database import get_engine
+from threadcore.jobs import GROUP, STREAM, job_worker
+from threadcore.models import Base
+
+
+class FlakyProvider(FakeProvider):
+    """Fails its first `failures` calls, then answers like FakeProvider."""
+
+    def __init__(self, name: str, failures: int) -> None:
+        super().__init__(name)
+        self.failures = failures
+
+    async def agenerate(
+        self,
+        prompt: str,
+        *,
+        output_format: str = "markdown",
+        system: str | None = None,
+        history: History | None = None,
+    ) -> Tuple[str, str]:
+        if self.failures > 0:
+            self.failures -= 1
+            self.calls += 1
+            raise RuntimeError(f"{self.name} is having a bad day")
+        return await super().agenerate(
+            prompt, output_format=output_format, system=system, history=history
+        )
+
+
+@pytest.fixture
+def queue(
+    tmp_path: Path,
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Callable[..., Settings]]:
+    for attr in ("_ENGINE", "_SESSION_FACTORY", "_ASYNC"):
+        monkeypatch.setattr(database, attr, None)
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        jobs,
+        "get_async_redis",
+        lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+    provider_registry(FakeProvider("fake:jobs"))
+
+    def configure(**values: object) -> Settings:
+        settings = settings_env(
+            **{
+                "database_url": f"sqlite:///{tmp_path / 'jobs.db'}",
+                "redis_url": "redis://stand-in",
+                "primary": "fake:jobs",
+                "fallbacks": [],
+                "response_cache_ttl": 0,
+                "singleflight_enabled": False,
+                "metrics_flush_interval": 0,
+                "jobs_retry_backoff": 0.01,
+                **values,
+            }
+        )
+        Base.metadata.create_all(get_engine())
+        return settings
+
+    yield configure
+    get_engine().dispose()
+
+
+def _submit(client: TestClient, **body: object) -> dict:
+    response = client.post("/api/v1/jobs", json=body)
+    assert response.status_code == 202, response.text
+    assert response.headers["Location"].endswith(response.json()["id"])
+    return response.json()
+
+
+def _wait(client: TestClient, job: dict) -> dict:
+    return client.get(f"/api/v1/jobs/{job['id']}", params={"wait": 5}).json()
+
+
+def test_chat_and_batch_jobs_run_and_long_poll_for_results(
+    queue: Callable[..., Settings],
+) -> None:
+    queue()
+    with TestClient(app) as client:
+        chat = _submit(client, chat={"message": "hello"})
+        batch = _submit(client, batch={"items": [{"message": "a"}, {"message": "b"}]})
+        assert chat["status"] == "queued"
+        done, batched = _wait(client, chat), _wait(client, batch)
+    assert done["status"] == "succeeded" and done["attempts"] == 1
+    assert done["result"] == {"content": "[fake:jobs markdown] hello", "provider": "fake:jobs"}
+    assert [item["content"] for item in batched["result"]["items"]] == [
+        "[fake:jobs markdown] a",
+        "[fake:jobs markdown] b",
+    ]
+
+
+def test_failed_attempts_are_retried_until_they_succeed(
+    queue: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FlakyProvider("fake:jobs-flaky", failures=2))
+    queue(primary="fake:jobs-flaky", jobs_max_attempts=3)
+    with TestClient(app) as client:
+        job = _wait(client, _submit(client, chat={"message": "again"}))
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 3
+
+
+def test_requests_that_cannot_succeed_fail_without_retries(
+    queue: Callable[..., Settings],
+) -> None:
+    queue(max_tokens=20)
+    with TestClient(app) as client:
+        job = _wait(client, _submit(client, chat={"message": "word " * 100}))
+        assert client.get("/api/v1/jobs/00000000-0000-0000-0000-000000000000").status_code == 404
+    assert job["status"] == "failed" and job["attempts"] == 1
+    assert job["error"]
+
+
+def test_jobs_of_a_dead_worker_are_reclaimed(queue: Callable[..., Settings]) -> None:
+    queue(jobs_workers=0, jobs_visibility_timeout=0.2)
+    with TestClient(app) as client:
+        job = _submit(client, chat={"message": "orphan"})
+
+        async def take_and_die() -> None:
+            # A consumer reads the entry and never acknowledges it
+            r = await jobs._stream()
+            await r.xreadgroup(GROUP, "dead-worker", {STREAM: ">"}, count=1)
+
+        client.portal.call(take_and_die)
+        client.portal.call(job_worker.start, run_job, 1)
+        done = _wait(client, job)
+        client.portal.call(job_worker.aclose)
+    assert done["status"] == "succeeded"
+    assert job_worker.reclaimed >= 1
@@ -0,0 +1,165 @@
+import asyncio
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import fakeredis
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from memorylane import context_injector
+from memorylane.context_injector import build_context, clear_local_summaries, refresh_summary
+from providers.fake_provider import FakeProvider
+from router_engine import router
+from router_engine.scheduler import Slot, Ticket
+from threadcore import database
+from threadcore.database import db_session, get_engine
+from threadcore.models import Base
+from threadcore.repository import insert_messages
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def memory(
+    tmp_path: Path,
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> tuple[FakeProvider, FakeProvider]:
+    for attr in ("_ENGINE", "_SESSION_FACTORY", "_ASYNC"):
+        monkeypatch.setattr(database, attr, None)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    chat, summarizer = FakeProvider("fake:chat"), FakeProvider("fake:sum")
+    provider_registry(chat)
+    provider_registry(summarizer)
+    settings_env(
+        database_url=f"sqlite:///{tmp_path / 'memory.db'}",
+        primary="fake:chat",
+        fallbacks=[],
+        memory_summary_provider="fake:sum",
+    )
+    Base.metadata.create_all(get_engine())
+    clear_local_summaries()
+    return chat, summarizer
+
+
+def _seed(thread_id: UUID, start: int, stop: int) -> None:
+    rows = [
+        {
+            "id": uuid4(),
+            "thread_id": thread_id,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"m{i}",
+            "created_at": START + timedelta(seconds=i),
+        }
+        for i in range(start, stop)
+    ]
+    with db_session() as s:
+        insert_messages(s, rows)
+
+
+def _mentioned(prompt: str | None) -> list[str]:
+    # The fake summarizer echoes its prompt, so only read the last "New messages" block
+    assert prompt is not None
+    new = prompt.rsplit("New messages:\n", 1)[1]
+    return [f"m{i}" for i in range(20) if f": m{i}\n" in new]
+
+
+def test_summary_only_covers_newly_aged_out_messages(
+    memory: tuple[FakeProvider, FakeProvider],
+) -> None:
+    _, summarizer = memory
+    thread_id = uuid4()
+    _seed(thread_id, 0, 10)
+
+    async def scenario() -> None:
+        context = await build_context(thread_id, context_depth=2)
+        assert [t["content"] for t in context.history] == ["m6", "m7", "m8", "m9"]
+        assert context.needs_refresh and context.system(None) is None
+
+        first = await refresh_summary(thread_id, context_depth=2)
+        assert first is not None and summarizer.calls == 1
+        assert _mentioned(summarizer.last_prompt) == [f"m{i}" for i in range(6)]
+
+        _seed(thread_id, 10, 12)
+        second = await refresh_summary(thread_id, context_depth=2)
+        assert second is not None and summarizer.calls == 2
+        # Earlier messages reach the summarizer only through the previous summary text
+        assert _mentioned(summarizer.last_prompt) == ["m6", "m7"]
+        assert first.text in (summarizer.last_prompt or "")
+
+        context = await build_context(thread_id, context_depth=2)
+        assert [t["content"] for t in context.history] == ["m8", "m9", "m10", "m11"]
+        assert not context.needs_refresh
+        assert await refresh_summary(thread_id, context_depth=2) is None
+        assert summarizer.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_chat_sends_window_and_refreshes_summary_after_response(
+    memory: tuple[FakeProvider, FakeProvider],
+) -> None:
+    chat, summarizer = memory
+    thread_id = uuid4()
+    _seed(thread_id, 0, 10)
+    body = {"message": "next", "format": "raw", "context_depth": 2, "thread_id": str(thread_id)}
+    with TestClient(app) as client:
+        assert client.post("/api/v1/chat", json=body).status_code == 200
+        assert [t["content"] for t in chat.last_history] == ["m6", "m7", "m8", "m9"]
+        assert chat.last_system is None
+        assert summarizer.calls == 1
+
+        assert client.post("/api/v1/chat", json=body).status_code == 200
+        assert "Conversation summary so far:" in (chat.last_system or "")
+
+
+def test_summaries_are_routed_at_batch_priority(
+    memory: tuple[FakeProvider, FakeProvider], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _, summarizer = memory
+    thread_id = uuid4()
+    _seed(thread_id, 0, 10)
+    acquired: list[tuple[str, str]] = []
+    acquire = router.scheduler.acquire
+
+    async def spy(provider: str, ticket: Ticket) -> Slot:
+        acquired.append((provider, ticket.priority))
+        return await acquire(provider, ticket)
+
+    monkeypatch.setattr(router.scheduler, "acquire", spy)
+    assert asyncio.run(refresh_summary(thread_id, context_depth=2)) is not None
+    assert summarizer.calls == 1
+    # Scheduler slots, rate limits and breakers all apply, as for chat traffic
+    assert acquired == [("fake:sum", "batch")]
+
+
+def test_refresh_does_not_release_a_lock_it_lost(
+    memory: tuple[FakeProvider, FakeProvider],
+    settings_env: Callable[..., Settings],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    _, summarizer = memory
+    settings_env(redis_url="redis://stand-in")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(context_injector, "get_async_redis", lambda: redis)
+    thread_id = uuid4()
+    _seed(thread_id, 0, 10)
+    lock_key = f"{context_injector.PREFIX}:{thread_id}:lock"
+    generate = summarizer.agenerate
+
+    async def overrun(*args: object, **kwargs: object) -> tuple[str, str]:
+        # The lock expired mid-call and another worker took it
+        await redis.set(lock_key, "other-worker")
+        return await generate(*args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(summarizer, "agenerate", overrun)
+
+    async def run() -> str | None:
+        await refresh_summary(thread_id, context_depth=2)
+        return await redis.get(lock_key)
+
+    assert asyncio.run(run()) == "other-worker"
@@ -0,0 +1,138 @@
+import asyncio
+from collections import Counter
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+from sqlalchemy import select
+from threadcore import database, writer
+from threadcore.database import db_session, get_engine
+from threadcore.models import Base, Message
+from threadcore.writer import MessageWriter, turn_rows
+
+
+@pytest.fixture
+def db(
+    tmp_path: Path, settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Callable[..., Settings]]:
+    monkeypatch.setattr(database, "_ENGINE", None)
+    monkeypatch.setattr(database, "_SESSION_FACTORY", None)
+    monkeypatch.setattr(database, "_ASYNC", None)
+    settings_env(database_url=f"sqlite:///{tmp_path / 'threads.db'}")
+    Base.metadata.create_all(get_engine())
+    yield settings_env
+    get_engine().dispose()
+
+
+def _messages() -> list[Message]:
+    with db_session() as s:
+        return list(s.scalars(select(Message).order_by(Message.created_at)))
+
+
+def test_turns_are_batched_and_drained_on_close(db: Callable[..., Settings]) -> None:
+    db(message_flush_interval=0.05)
+    mw = MessageWriter()
+    thread_id = uuid4()
+
+    async def scenario() -> None:
+        await asyncio.gather(
+            *(
+                mw.put(turn_rows(thread_id, f"q{i}", f"a{i}", provider="fake:echo"))
+                for i in range(20)
+            )
+        )
+        await mw.aclose()
+
+    asyncio.run(scenario())
+    rows = _messages()
+    assert len(rows) == 40
+    assert [m.role for m in rows[:2]] == ["user", "assistant"]
+    assert rows[1].provider == "fake:echo" and rows[1].token_count
+    assert mw.written == 40 and mw.batches <= 2
+
+
+def test_slow_database_applies_backpressure(
+    db: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    db(message_queue_max=2, message_batch_size=2, message_enqueue_timeout=0.05)
+    write = writer._write_batch
+
+    async def slow(rows):  # type: ignore[no-untyped-def]
+        await asyncio.sleep(0.3)
+        await write(rows)
+
+    monkeypatch.setattr(writer, "_write_batch", slow)
+    mw = MessageWriter()
+
+    async def scenario() -> list[bool]:
+        results = [
+            await mw.put(turn_rows(uuid4(), "q", "a", provider="fake:echo")) for _ in range(4)
+        ]
+        await mw.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results[0] is True and False in results
+    assert mw.dropped > 0
+    assert len(_messages()) == mw.written
+
+
+def test_backpressure_drops_whole_turns(
+    db: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Room for one and a half turns: a turn that only partly fits must not be split
+    db(message_queue_max=3, message_batch_size=2, message_enqueue_timeout=0.05)
+    write = writer._write_batch
+
+    async def slow(rows):  # type: ignore[no-untyped-def]
+        await asyncio.sleep(0.3)
+        await write(rows)
+
+    monkeypatch.setattr(writer, "_write_batch", slow)
+    mw = MessageWriter()
+
+    async def scenario() -> list[bool]:
+        results = [
+            await mw.put(turn_rows(uuid4(), "q", "a", provider="fake:echo")) for _ in range(4)
+        ]
+        await mw.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert False in results
+    rows = _messages()
+    per_thread = Counter(m.thread_id for m in rows)
+    assert set(per_thread.values()) == {2}
+    assert len(per_thread) == results.count(True)
+    assert mw.dropped == 2 * results.count(False)
+
+
+def test_chat_persists_turn_after_response(
+    db: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:up"))
+    db(primary="fake:up", fallbacks=[], provider_cost_cents_per_1k={"fake:up": 1000.0})
+    thread_id = str(uuid4())
+    with TestClient(app) as client:
+        for stream in (False, True):
+            resp = client.post(
+                "/api/v1/chat",
+                json={
+                    "message": "hi there",
+                    "format": "raw",
+                    "stream": stream,
+                    "thread_id": thread_id,
+                },
+            )
+            assert resp.status_code == 200
+    rows = _messages()
+    assert [(m.role, m.content) for m in rows] == [
+        ("user", "hi there"),
+        ("assistant", "[fake:up raw] hi there"),
+    ] * 2
+    assert all(m.cost_cents == m.token_count for m in rows)
@@ -0,0 +1,103 @@
+import threading
+from collections.abc import Callable, Iterator
+
+import fakeredis
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+from sentinel import observer
+from sentinel.observer import Registry
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics() -> Iterator[None]:
+    observer.registry.reset()
+    yield
+    observer.registry.reset()
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    reg = Registry()
+    hist = reg.histogram("demo_seconds", "Demo", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value, "call")
+    text = reg.render(reg.snapshot())
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="call",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="call",le="1"} 3' in text
+    assert 'demo_seconds_bucket{stage="call",le="+Inf"} 4' in text
+    assert 'demo_seconds_sum{stage="call"} 3.65' in text
+    assert 'demo_seconds_count{stage="call"} 4' in text
+
+
+def test_counters_do_not_lose_concurrent_increments() -> None:
+    reg = Registry()
+    counter = reg.counter("demo_total", "Demo", ("kind",))
+
+    def work() -> None:
+        for _ in range(20_000):
+            counter.inc("x")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert reg.snapshot()["demo_total"] == {("x",): [80_000.0]}
+
+
+def test_workers_aggregate_through_redis(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings_env(redis_url="redis://stand-in")
+    client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    monkeypatch.setattr(observer, "get_redis", lambda: client)
+    workers = [Registry(), Registry()]
+    counters = [w.counter("demo_total", "Demo", ("provider",)) for w in workers]
+
+    counters[0].inc("a")
+    counters[1].inc("a", amount=2)
+    counters[1].inc("b")
+    workers[1].flush()
+    # Flushing twice must not double count
+    workers[1].flush()
+    text = workers[0].render()
+    assert 'demo_total{provider="a"} 3' in text
+    assert 'demo_total{provider="b"} 1' in text
+
+
+def test_metrics_endpoint_reports_route_stages_and_fallbacks(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:metered-down", fail=True))
+    provider_registry(FakeProvider("fake:metered-up"))
+    settings_env(primary="fake:metered-down", fallbacks=["fake:metered-up"])
+    with TestClient(app) as client:
+        assert client.post("/api/v1/chat", json={"message": "hi"}).status_code == 200
+        resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert 'lor3_provider_calls_total{provider="fake:metered-down",outcome="error"} 1' in text
+    assert 'lor3_routed_requests_total{provider="fake:metered-up",fallback="true"} 1' in text
+    assert 'lor3_stage_seconds_count{stage="budget",provider="fake:metered-down"} 1' in text
+    assert 'lor3_stage_seconds_count{stage="provider_call",provider="fake:metered-up"} 1' in text
+    assert 'lor3_tokens_total{provider="fake:metered-up",kind="completion"}' in text
+
+
+def test_metrics_fall_back_to_this_worker_when_redis_is_down(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings_env(redis_url="redis://stand-in", metrics_flush_interval=0)
+
+    def unreachable() -> fakeredis.FakeRedis:
+        raise ConnectionError("Redis is unreachable")
+
+    monkeypatch.setattr(observer, "get_redis", unreachable)
+    observer.TOKENS.inc("fake:offline", "completion", amount=7)
+    with TestClient(app) as client:
+        resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'lor3_tokens_total{provider="fake:offline",kind="completion"} 7' in resp.text
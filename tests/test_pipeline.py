@@ -0,0 +1,129 @@
+import json
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from oven import cache, loader, manager
+from providers.fake_provider import FakeProvider
+
+
+@pytest.fixture
+def pipeline_env(
+    tmp_path: Path,
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[FakeProvider]:
+    for var in ("DATABASE_URL", "REDIS_URL"):
+        monkeypatch.delenv(var, raising=False)
+    prompts = tmp_path / "prompts.yaml"
+    prompts.write_text("editor:\n  system: Merge these drafts for $audience.\n")
+    for attr, value in (("_SEEDED", True), ("_STORE", {}), ("_APPLIED", {})):
+        monkeypatch.setattr(manager, attr, value)
+    loader.clear_parsed_cache()
+    cache.prompt_cache.invalidate()
+    provider = FakeProvider("fake:pipeline", latency=0.1)
+    provider_registry(provider)
+    settings_env(
+        prompts_file=str(prompts),
+        primary="fake:pipeline",
+        fallbacks=[],
+        response_cache_ttl=0,
+        singleflight_enabled=False,
+        max_tokens=500,
+    )
+    yield provider
+    cache.prompt_cache.invalidate()
+
+
+def _fan_out_fan_in(branches: int) -> list[dict]:
+    drafts = [
+        {"id": f"draft_{i}", "message": f"$topic part {i}", "format": "raw"}
+        for i in range(branches)
+    ]
+    return [
+        *drafts,
+        {
+            "id": "merged",
+            "message": " | ".join(f"${d['id']}" for d in drafts),
+            "prompt_name": "editor",
+            "prompt_vars": {"audience": "$reader"},
+            "format": "raw",
+        },
+    ]
+
+
+def test_independent_steps_run_concurrently(pipeline_env: FakeProvider) -> None:
+    body = {"steps": _fan_out_fan_in(8), "inputs": {"topic": "queues", "reader": "ops"}}
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        response = client.post("/api/v1/pipeline", json=body)
+        elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["status"] == "succeeded"
+    assert result["outputs"]["draft_3"] == "[fake:pipeline raw] queues part 3"
+    assert result["outputs"]["merged"].startswith(
+        "[fake:pipeline raw] [fake:pipeline raw] queues part 0 | "
+    )
+    assert pipeline_env.last_system == "Merge these drafts for ops."
+    assert [step["id"] for step in result["steps"]][-1] == "merged"
+    # Two levels of 100ms calls, not nine
+    assert elapsed < 0.5
+
+
+def test_steps_with_identical_inputs_run_once(pipeline_env: FakeProvider) -> None:
+    steps = [
+        {"id": "a", "message": "same question"},
+        {"id": "b", "message": "same question"},
+        {"id": "c", "message": "compare $a with $b"},
+    ]
+    with TestClient(app) as client:
+        result = client.post("/api/v1/pipeline", json={"steps": steps}).json()
+    assert pipeline_env.calls == 2
+    assert sorted(step["memoized"] for step in result["steps"]) == [False, False, True]
+    assert result["outputs"]["a"] == result["outputs"]["b"]
+
+
+@pytest.mark.usefixtures("pipeline_env")
+@pytest.mark.parametrize(
+    ("steps", "detail"),
+    [
+        ([{"id": "a", "message": "$b"}, {"id": "b", "message": "$a"}], "cycle"),
+        ([{"id": "a", "message": "$nowhere"}], "unknown input or step 'nowhere'"),
+        ([{"id": "a", "message": "hi", "prompt_name": "missing"}], "Prompt 'missing' not found"),
+        ([{"id": "a", "message": "hi", "prompt_name": "editor"}], "missing variables"),
+    ],
+)
+def test_invalid_pipelines_are_rejected_before_running(steps: list[dict], detail: str) -> None:
+    with TestClient(app) as client:
+        response = client.post("/api/v1/pipeline", json={"steps": steps})
+    assert response.status_code == 422
+    assert detail in response.json()["detail"]
+
+
+def test_a_failed_step_stops_its_dependents(pipeline_env: FakeProvider) -> None:
+    steps = [
+        {"id": "ok", "message": "fine"},
+        {"id": "huge", "message": "word " * 1000},  # over the token budget
+        {"id": "after", "message": "use $huge"},
+    ]
+    with TestClient(app) as client:
+        response = client.post("/api/v1/pipeline", json={"steps": steps})
+        streamed = client.post("/api/v1/pipeline", json={"steps": steps, "stream": True})
+    assert response.status_code == 413
+    result = response.json()
+    # `ok` was still running when `huge` failed, so it was cancelled too
+    assert result["failed"] == "huge" and result["skipped"] == ["ok", "after"]
+    assert "after" not in result["outputs"]
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("data: ", 1)[1]))
+        for block in streamed.text.strip().split("\n\n")
+    ]
+    assert events[-1][0] == "done" and events[-1][1]["status"] == "failed"
+    assert ("step", "huge") in [(name, data.get("id")) for name, data in events]
+    assert pipeline_env.calls <= 2  # `after` never reached the provider
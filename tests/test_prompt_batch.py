@@ -0,0 +1,88 @@
+from collections.abc import Callable, Iterator
+
+import fakeredis
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from oven import cache, manager
+from oven.schemas import PromptRecord
+from oven.storage import redis_store
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from threadcore.models import Base, PromptVersion
+from threadcore.repository import get_prompt_records
+
+
+@pytest.fixture
+def store(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> Iterator[fakeredis.FakeRedis]:
+    for var in ("DATABASE_URL", "PROMPTS_FILE"):
+        monkeypatch.delenv(var, raising=False)
+    settings_env(redis_url="redis://stand-in")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_store, "_client", lambda: client)
+    monkeypatch.setattr(manager, "_SEEDED", True)
+    cache.prompt_cache.invalidate()
+    for name in ("alpha", "beta"):
+        for version in ("v1", "v2"):
+            redis_store.set_prompt(
+                name, PromptRecord(name=name, system=f"{name} {version}", version=version)
+            )
+    yield client
+    cache.prompt_cache.invalidate()
+
+
+def test_redis_get_many_is_one_pipeline(store: fakeredis.FakeRedis) -> None:
+    executed: list[int] = []
+    original = fakeredis.FakeRedis.pipeline
+
+    def pipeline(self, *args, **kwargs):  # type: ignore[no-untyped-def]
+        p = original(self, *args, **kwargs)
+        execute = p.execute
+        p.execute = lambda *a, **k: executed.append(len(p.command_stack)) or execute(*a, **k)
+        return p
+
+    store.pipeline = pipeline.__get__(store)  # type: ignore[method-assign]
+    requests = [("alpha", "v1"), ("beta", "latest"), ("gone", None), ("alpha", "latest")]
+    records = redis_store.get_many(requests)
+    assert [r and r.system for r in records] == ["alpha v1", "beta v2", None, "alpha v2"]
+    # One pipeline: MGET for the exact keys plus the latest record and unversioned
+    # fallback for every "latest" lookup
+    assert executed == [5]
+
+
+def test_batch_endpoint_returns_records_and_missing(store: fakeredis.FakeRedis) -> None:
+    _ = store
+    resp = TestClient(app).post(
+        "/api/v1/prompts/batch",
+        json={"names": ["alpha", "beta", "nope", "alpha"], "versions": {"beta": "v1"}},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["prompts"]["alpha"]["system"] == "alpha v2"
+    assert body["prompts"]["beta"]["system"] == "beta v1"
+    assert body["missing"] == ["nope"]
+    assert cache.prompt_cache.get("beta", "v1") is not None
+
+
+def test_repository_resolves_many_prompts_in_one_query() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    queries: list[str] = []
+    with Session(engine) as s:
+        s.add_all(
+            [
+                PromptVersion(name="a", version="v2", system="a2"),
+                PromptVersion(name="a", version="v10", system="a10"),
+                PromptVersion(name="b", version=None, system="b"),
+            ]
+        )
+        s.flush()
+        event.listen(engine, "before_cursor_execute", lambda *a: queries.append(a[2]))
+        records = get_prompt_records(s, {"a": "latest", "b": None, "c": None})
+        pinned = get_prompt_records(s, {"a": "v2"})
+    assert {n: r.system for n, r in records.items()} == {"a": "a10", "b": "b"}
+    assert pinned["a"].system == "a2"
+    assert len(queries) == 2
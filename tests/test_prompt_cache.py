@@ -0,0 +1,105 @@
+import time
+from collections.abc import Callable, Iterator
+
+import fakeredis
+import pytest
+from core.config import Settings
+from oven import cache, manager
+from oven.manager import PromptOven
+from oven.schemas import PromptRecord
+from oven.storage import redis_store
+
+
+@pytest.fixture
+def fake_redis(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> Iterator[list[str]]:
+    settings_env(redis_url="redis://stand-in", prompt_cache_ttl=60)
+    server = fakeredis.FakeServer()
+    calls: list[str] = []
+
+    def client() -> fakeredis.FakeRedis:
+        calls.append("redis")
+        return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+    monkeypatch.setattr(redis_store, "_client", client)
+    monkeypatch.setattr(
+        cache, "get_redis", lambda: fakeredis.FakeRedis(server=server, decode_responses=True)
+    )
+    monkeypatch.setattr(manager, "_SEEDED", False)
+    cache.prompt_cache.invalidate()
+    yield calls
+    cache.stop_invalidation_listener()
+    cache.prompt_cache.invalidate()
+
+
+def test_hot_lookup_is_served_in_process_until_invalidated(fake_redis: list[str]) -> None:
+    redis_store.set_prompt("greeter", PromptRecord(name="greeter", system="Hi v1", version="v1"))
+    oven = PromptOven()
+    assert oven.get("greeter").system == "Hi v1"
+
+    fake_redis.clear()
+    for _ in range(100):
+        assert oven.get("greeter").system == "Hi v1"
+    assert fake_redis == []
+
+    # Another worker publishes a new version; the pub/sub listener drops our cached copy
+    redis_store.set_prompt("greeter", PromptRecord(name="greeter", system="Hi v2", version="v2"))
+    deadline = time.monotonic() + 3
+    while oven.get_cached("greeter") is not None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert oven.get("greeter").system == "Hi v2"
+
+
+@pytest.mark.usefixtures("fake_redis")
+def test_listener_lost_to_a_redis_error_is_restarted_by_lookups(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(cache, "LISTENER_RETRY_MIN", 0.05)
+    redis_store.set_prompt("greeter", PromptRecord(name="greeter", system="Hi v1", version="v1"))
+    oven = PromptOven()
+    assert oven.get("greeter").system == "Hi v1"
+
+    # The subscription's connection drops; the worker thread reports it and exits
+    listener = cache._LISTENER
+    assert listener is not None
+
+    def broken(*_args: object, **_kwargs: object) -> None:
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(listener.pubsub, "get_message", broken)
+    listener.join(timeout=3)
+    assert cache._LISTENER is None
+
+    # A lookup after the backoff re-subscribes, so later edits still invalidate
+    time.sleep(0.06)
+    assert oven.get("greeter").system == "Hi v1"
+    assert cache._LISTENER is not None
+    redis_store.set_prompt("greeter", PromptRecord(name="greeter", system="Hi v2", version="v2"))
+    deadline = time.monotonic() + 3
+    while oven.get_cached("greeter") is not None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert oven.get("greeter").system == "Hi v2"
+
+
+@pytest.mark.usefixtures("fake_redis")
+def test_seeding_is_retried_after_redis_was_unreachable(monkeypatch: pytest.MonkeyPatch) -> None:
+    redis_store.set_prompt("greeter", PromptRecord(name="greeter", system="Hi v1", version="v1"))
+    migrate = redis_store.migrate_version_index
+    migrations: list[int] = []
+
+    def unreachable() -> int:
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_store, "migrate_version_index", unreachable)
+    PromptOven()
+    assert manager._SEEDED is False
+
+    def counted() -> int:
+        migrations.append(1)
+        return migrate()
+
+    monkeypatch.setattr(redis_store, "migrate_version_index", counted)
+    PromptOven()
+    PromptOven()
+    assert manager._SEEDED is True and migrations == [1]
@@ -0,0 +1,58 @@
+from string import Template
+
+import pytest
+from oven.compiler import (
+    MissingPromptVariables,
+    compile_prompt,
+    get_compiled,
+    invalidate_compiled,
+    missing_variables,
+)
+from oven.schemas import PromptRecord
+from oven.template import parse_template
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "plain text",
+        "Hello $name, you are ${role}.",
+        "Costs $$5 for $name$name and ${missing} stays",
+        "Trailing $ and $1 invalid and ${name}s",
+        "",
+    ],
+)
+def test_render_matches_safe_substitute(body):
+    values = {"name": "Ada", "role": "admin"}
+    assert parse_template(body).render(values) == Template(body).safe_substitute(values)
+
+
+def test_variables_are_declared_in_first_use_order():
+    record = PromptRecord(name="p", system="$b then ${a} then $b again, $$c")
+    assert record.variables == ["b", "a"]
+    assert "variables" not in record.model_dump()
+
+
+def test_strict_compile_reports_missing_variables():
+    record = PromptRecord(name="p", system="Q: $question in $style")
+    assert missing_variables(record, {"question": "why"}) == ["style"]
+    with pytest.raises(MissingPromptVariables) as exc:
+        compile_prompt(record, {"question": "why"}, strict=True)
+    assert exc.value.missing == ["style"]
+    assert compile_prompt(record, {"question": "why"}) == "Q: why in $style"
+
+
+def test_compiled_template_is_cached_and_recompiled_on_change():
+    invalidate_compiled()
+    v1 = PromptRecord(name="p", version="1", system="v1 $x")
+    assert get_compiled(v1) is get_compiled(v1)
+
+    edited = PromptRecord(name="p", version="1", system="edited $x")
+    assert compile_prompt(edited, {"x": "y"}) == "edited y"
+
+    v2 = PromptRecord(name="p", version="2", system="v2 $x")
+    assert compile_prompt(v2, {"x": "y"}) == "v2 y"
+
+    cached = get_compiled(v2)
+    invalidate_compiled(["p"])
+    assert get_compiled(v2) is not cached
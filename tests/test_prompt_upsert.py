@@ -0,0 +1,52 @@
+from collections.abc import Iterator
+
+import pytest
+from oven.schemas import PromptRecord
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+from threadcore.models import Base, PromptVersion
+from threadcore.repository import bulk_upsert_prompts, save_many_prompts
+
+
+@pytest.fixture
+def session() -> Iterator[Session]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as s:
+        yield s
+
+
+def _catalogue(n: int, changed: set[int] | None = None) -> dict[str, PromptRecord]:
+    return {
+        f"p{i}": PromptRecord(
+            name=f"p{i}",
+            version=None if i == 0 else "v1",
+            system=f"prompt {i}" + (" (edited)" if i in (changed or set()) else ""),
+        )
+        for i in range(n)
+    }
+
+
+def test_bulk_upsert_counts_and_skips_unchanged_rows(session: Session) -> None:
+    counts = bulk_upsert_prompts(session, _catalogue(25), chunk_size=10)
+    assert (counts.inserted, counts.updated, counts.unchanged) == (25, 0, 0)
+
+    statements: list[str] = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *a: statements.append(a[2]))
+    counts = bulk_upsert_prompts(session, _catalogue(25, changed={0, 3}), chunk_size=10)
+    assert (counts.inserted, counts.updated, counts.unchanged) == (0, 2, 23)
+    # One SELECT per chunk plus one UPDATE for the chunk holding both edits
+    assert sum(s.lstrip().startswith("SELECT") for s in statements) == 3
+    assert sum(s.lstrip().startswith("UPDATE") for s in statements) == 1
+    assert not any(s.lstrip().startswith("INSERT") for s in statements)
+
+    assert session.scalar(select(func.count()).select_from(PromptVersion)) == 25
+    edited = session.scalars(select(PromptVersion).where(PromptVersion.name == "p0")).one()
+    assert edited.version is None
+    assert edited.system == "prompt 0 (edited)"
+
+
+def test_save_many_prompts_returns_total(session: Session) -> None:
+    assert save_many_prompts(session, _catalogue(3)) == 3
+    assert save_many_prompts(session, _catalogue(4)) == 4
+    assert session.scalar(select(func.count()).select_from(PromptVersion)) == 4
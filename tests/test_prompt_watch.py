@@ -0,0 +1,87 @@
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from core.config import Settings
+from oven import cache, loader, manager, watcher
+from oven.loader import diff_prompts, load_prompts
+from oven.manager import PromptOven
+
+
+def _write(path: Path, **systems: str) -> None:
+    path.write_text("".join(f"{n}:\n  system: {s}\n" for n, s in systems.items()))
+
+
+@pytest.fixture
+def prompt_dir(
+    tmp_path: Path, settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> Path:
+    for var in ("DATABASE_URL", "REDIS_URL"):
+        monkeypatch.delenv(var, raising=False)
+    _write(tmp_path / "a.yaml", alpha="A1", beta="B1")
+    _write(tmp_path / "b.yaml", gamma="G1")
+    settings_env(prompts_file=str(tmp_path), prompts_watch=True, prompts_watch_interval=0.05)
+    for attr, value in (("_SEEDED", False), ("_STORE", {}), ("_APPLIED", {})):
+        monkeypatch.setattr(manager, attr, value)
+    monkeypatch.setattr(manager, "_SOURCE_PATH", None)
+    loader.clear_parsed_cache()
+    cache.prompt_cache.invalidate()
+    return tmp_path
+
+
+def test_only_changed_files_are_reparsed(prompt_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    parsed: list[str] = []
+    parse = loader._parse
+    monkeypatch.setattr(loader, "_parse", lambda p, t: parsed.append(p.name) or parse(p, t))
+
+    first = load_prompts(prompt_dir)
+    assert sorted(first) == ["alpha", "beta", "gamma"]
+    assert sorted(parsed) == ["a.yaml", "b.yaml"]
+
+    parsed.clear()
+    (prompt_dir / "b.yaml").touch()  # new mtime, same content: no re-parse
+    _write(prompt_dir / "a.yaml", alpha="A2", beta="B1")
+    second = load_prompts(prompt_dir)
+    assert parsed == ["a.yaml"]
+    assert second["alpha"].system == "A2"
+    assert second["gamma"] is first["gamma"]
+
+    diff = diff_prompts(first, second)
+    assert list(diff.changed) == ["alpha"]
+    assert not diff.added and not diff.removed
+
+
+def test_reload_pushes_only_the_changeset(prompt_dir: Path) -> None:
+    oven = PromptOven()
+    assert oven.get("beta").system == "B1"
+
+    _write(prompt_dir / "a.yaml", alpha="A1", beta="B2", delta="D1")
+    (prompt_dir / "b.yaml").unlink()
+    info = oven.reload()
+    assert (info["count"], info["added"], info["changed"], info["removed"]) == (3, 1, 1, 1)
+    assert oven.get("beta").system == "B2"
+    assert "gamma" not in oven.store
+
+    assert oven.reload()["changed"] == 0
+    assert oven.reload(full=True)["changed"] == 3
+
+
+@pytest.mark.parametrize("native", [True, False])
+def test_watcher_applies_edits(
+    prompt_dir: Path, monkeypatch: pytest.MonkeyPatch, native: bool
+) -> None:
+    if native and not watcher._watchfiles_available():
+        pytest.skip("watchfiles not installed")
+    monkeypatch.setattr(watcher, "_watchfiles_available", lambda: native)
+    oven = PromptOven()
+    watcher.ensure_prompt_watcher()
+    try:
+        time.sleep(0.1)
+        _write(prompt_dir / "b.yaml", gamma="G2")
+        deadline = time.monotonic() + 3
+        while oven.get("gamma").system != "G2" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert oven.get("gamma").system == "G2"
+    finally:
+        watcher.stop_prompt_watcher()
@@ -0,0 +1,55 @@
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from core.config import get_settings
+from providers.clients import close_clients
+from providers.openai_provider import OpenAIProvider
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    peers: list[tuple[str, int]] = []
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length", "0"))
+        self.rfile.read(length)
+        self.peers.append(self.client_address)
+        body = json.dumps({"choices": [{"message": {"content": "pong"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def stand_in(monkeypatch: pytest.MonkeyPatch) -> Iterator[type[_StandInHandler]]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_HTTP__BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    get_settings.cache_clear()
+    close_clients()
+    _StandInHandler.peers = []
+    yield _StandInHandler
+    close_clients()
+    get_settings.cache_clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_openai_provider_reuses_pooled_connection(stand_in: type[_StandInHandler]) -> None:
+    provider = OpenAIProvider()
+    for _ in range(5):
+        content, name = provider.generate("ping")
+        assert (content, name) == ("pong", "openai:gpt-4")
+    assert len(stand_in.peers) == 5
+    # Every call went over the same keep-alive connection
+    assert len(set(stand_in.peers)) == 1
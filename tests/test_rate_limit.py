@@ -0,0 +1,184 @@
+import asyncio
+from collections.abc import Callable, Iterator
+
+import fakeredis
+import httpx
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+from router_engine import rate_limit
+from router_engine.rate_limit import RateLimited, rate_limiter
+
+
+@pytest.fixture(params=["redis", "local"])
+def limited(
+    request: pytest.FixtureRequest,
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Callable[..., Settings]]:
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    redis_url = None
+    if request.param == "redis":
+        redis_url = "redis://stand-in"
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(
+            rate_limit,
+            "get_async_redis",
+            lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+        )
+    provider_registry(FakeProvider("fake:rl-primary"))
+    provider_registry(FakeProvider("fake:rl-backup"))
+    rate_limiter.reset()
+
+    def configure(**values: object) -> Settings:
+        if redis_url:
+            values["redis_url"] = redis_url
+        return settings_env(
+            **{
+                "rate_limit_enabled": True,
+                "primary": "fake:rl-primary",
+                "fallbacks": ["fake:rl-backup"],
+                "singleflight_enabled": False,
+                # TestClient connects as "testclient"; let it assert X-Client-Id
+                "rate_limit_trusted_proxies": ["testclient"],
+                **values,
+            }
+        )
+
+    yield configure
+    rate_limiter.reset()
+
+
+def _chat(client: TestClient, who: str = "tenant-a", message: str = "hi") -> object:
+    return client.post("/api/v1/chat", json={"message": message}, headers={"X-Client-Id": who})
+
+
+def test_client_over_its_rpm_gets_429_with_retry_after(
+    limited: Callable[..., Settings],
+) -> None:
+    limited(client_rate_limit={"rpm": 2})
+    with TestClient(app) as client:
+        assert [_chat(client).status_code for _ in range(2)] == [200, 200]
+        denied = _chat(client)
+        assert denied.status_code == 429
+        assert denied.json()["scope"] == "client"
+        assert 1 <= int(denied.headers["Retry-After"]) <= 30
+        trips = rate_limiter.round_trips
+        # Known denials are answered in process, without another Redis call
+        assert _chat(client).status_code == 429
+        assert rate_limiter.round_trips == trips
+        # Other clients have their own buckets
+        assert _chat(client, who="tenant-b").status_code == 200
+
+
+def test_exhausted_provider_is_skipped_then_all_exhausted_is_429(
+    limited: Callable[..., Settings],
+) -> None:
+    limited(
+        provider_rate_limits={"fake:rl-primary": {"rpm": 1}, "fake:rl-backup": {"rpm": 1}},
+    )
+    with TestClient(app) as client:
+        served = [_chat(client).json().get("provider") for _ in range(2)]
+        assert served == ["fake:rl-primary", "fake:rl-backup"]
+        denied = _chat(client)
+    assert denied.status_code == 429
+    assert denied.json()["scope"] == "providers"
+
+
+def test_token_estimates_are_reconciled_with_actual_usage(
+    limited: Callable[..., Settings],
+) -> None:
+    # Each request is admitted with a 500-token completion estimate against a 1000 tpm
+    # bucket; settling with the real (tiny) usage refunds most of it
+    limited(client_rate_limit={"tpm": 1000}, rate_limit_completion_tokens=500)
+
+    async def burst() -> list[bool]:
+        from router_engine.router import achoose_provider_and_respond
+
+        results = []
+        for _ in range(4):
+            try:
+                await achoose_provider_and_respond(
+                    "hi", context_depth=0, output_format="raw", client="tenant-a"
+                )
+                results.append(True)
+            except RateLimited:
+                results.append(False)
+            await rate_limiter.drain()
+        return results
+
+    assert asyncio.run(burst()) == [True, True, True, True]
+
+
+def test_client_header_is_ignored_unless_a_trusted_proxy_sent_it(
+    limited: Callable[..., Settings],
+) -> None:
+    limited(client_rate_limit={"rpm": 1}, rate_limit_trusted_proxies=["10.0.0.0/8"])
+    with TestClient(app) as client:
+        assert _chat(client, who="tenant-a").status_code == 200
+        # A fresh id does not buy a fresh bucket: the caller is keyed by its address
+        denied = _chat(client, who="tenant-b")
+    assert denied.status_code == 429
+
+
+def test_requests_no_provider_served_are_refunded(
+    limited: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:rl-down", fail=True))
+    limited(primary="fake:rl-down", fallbacks=[], client_rate_limit={"rpm": 1, "tpm": 1000})
+
+    async def attempts() -> list[str]:
+        from router_engine.router import achoose_provider_and_respond
+
+        outcomes = []
+        for _ in range(3):
+            try:
+                await achoose_provider_and_respond(
+                    "hi", context_depth=0, output_format="raw", client="tenant-a"
+                )
+                outcomes.append("served")
+            except RateLimited:
+                outcomes.append("limited")
+            except RuntimeError:
+                outcomes.append("failed")
+            await rate_limiter.drain()
+        return outcomes
+
+    assert asyncio.run(attempts()) == ["failed", "failed", "failed"]
+
+
+def test_coalescing_never_crosses_clients(
+    limited: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:rl-slow", latency=0.1))
+    limited(
+        primary="fake:rl-slow",
+        fallbacks=[],
+        client_rate_limit={"rpm": 1},
+        singleflight_enabled=True,
+        response_cache_ttl=0,
+        rate_limit_trusted_proxies=["127.0.0.1"],
+    )
+
+    async def main() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+            async def post(who: str, message: str, delay: float = 0) -> httpx.Response:
+                await asyncio.sleep(delay)
+                return await client.post(
+                    "/api/v1/chat", json={"message": message}, headers={"X-Client-Id": who}
+                )
+
+            spent = await post("tenant-a", "warm-up")
+            assert spent.status_code == 200
+            return await asyncio.gather(post("tenant-b", "same"), post("tenant-a", "same", 0.02))
+
+    other, throttled = asyncio.run(main())
+    assert other.status_code == 200
+    # The throttled client does not ride on tenant-b's flight (and quota)
+    assert throttled.status_code == 429
+    assert throttled.json()["scope"] == "client"
@@ -0,0 +1,101 @@
+import asyncio
+from collections.abc import Callable, Iterator
+
+import fakeredis
+import pytest
+from core.config import Settings
+from oven.schemas import PromptRecord
+from oven.storage import redis_store
+
+
+@pytest.fixture
+def store(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> Iterator[fakeredis.FakeRedis]:
+    settings_env(redis_url="redis://stand-in")
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_store, "_client", lambda: client)
+    monkeypatch.setattr(
+        redis_store,
+        "_aclient",
+        lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+    yield client
+
+
+def _put(name: str, version: str) -> None:
+    redis_store.set_prompt(name, PromptRecord(name=name, system=f"body {version}", version=version))
+
+
+@pytest.mark.usefixtures("store")
+def test_latest_prefers_highest_numeric_version() -> None:
+    for version in ("v2", "v10", "draft", "v9"):
+        _put("rag", version)
+    assert redis_store.latest_version("rag") == "v10"
+    assert redis_store.get_prompt_latest("rag").system == "body v10"
+    assert redis_store.list_versions("rag") == ["draft", "v10", "v2", "v9"]
+
+
+@pytest.mark.usefixtures("store")
+def test_latest_without_numeric_versions_is_lexicographic() -> None:
+    for version in ("beta", "alpha"):
+        _put("notes", version)
+    assert redis_store.get_prompt_latest("notes").version == "beta"
+
+
+@pytest.mark.usefixtures("store")
+def test_latest_falls_back_to_unversioned_key() -> None:
+    redis_store.set_prompt("plain", PromptRecord(name="plain", system="no version"))
+    assert redis_store.get_prompt_latest("plain").system == "no version"
+    assert redis_store.get_prompt_latest("missing") is None
+
+
+def test_latest_is_one_round_trip_without_scripts(store: fakeredis.FakeRedis) -> None:
+    _put("rag", "v1")
+    store.script_flush()  # writes must recover from NOSCRIPT
+    _put("rag", "v3")
+
+    commands: list[str] = []
+    original = store.execute_command
+
+    def counting(*args, **kwargs):  # type: ignore[no-untyped-def]
+        commands.append(args[0])
+        return original(*args, **kwargs)
+
+    store.execute_command = counting  # type: ignore[method-assign]
+    assert redis_store.get_prompt_latest("rag").version == "v3"
+    assert commands == []  # a single pipeline of plain GETs, no script
+
+
+def test_legacy_version_sets_are_migrated(store: fakeredis.FakeRedis) -> None:
+    # Written by the version-set layout: payload keys plus an unordered set of versions
+    for version in ("v2", "v10"):
+        record = PromptRecord(name="old", system=f"body {version}", version=version)
+        store.set(f"lor3:prompts:old:{version}", record.model_dump_json())
+        store.sadd("lor3:prompts:versions:old", version)
+    store.set("lor3:prompts:old", PromptRecord(name="old", system="body v2").model_dump_json())
+    store.sadd("lor3:prompts:names", "old")
+    assert redis_store.list_versions("old") == []
+
+    assert redis_store.migrate_version_index() == 1
+    assert redis_store.migrate_version_index() == 0  # one-shot
+    assert redis_store.list_versions("old") == ["v10", "v2"]
+    assert redis_store.get_prompt_latest("old").system == "body v10"
+    _put("old", "v11")
+    assert redis_store.get_prompt_latest("old").system == "body v11"
+
+
+@pytest.mark.usefixtures("store")
+def test_async_lookups() -> None:
+    _put("rag", "v1")
+    _put("rag", "v2")
+
+    async def lookups() -> tuple[PromptRecord | None, PromptRecord | None]:
+        return await redis_store.aget_prompt_latest("rag"), await redis_store.aget_prompt(
+            "rag", "v1"
+        )
+
+    latest, pinned = asyncio.run(lookups())
+    assert latest.version == "v2"
+    assert pinned.version == "v1"
@@ -0,0 +1,40 @@
+from collections.abc import Callable
+
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+from router_engine.response_cache import CachedResponse, MemoryLRU, response_cache
+
+
+def test_identical_chats_hit_the_cache(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider = FakeProvider("fake:cached")
+    provider_registry(provider)
+    settings_env(primary="fake:cached", fallbacks=[], response_cache_enabled="true")
+    response_cache.memory.clear()
+
+    client = TestClient(app)
+    body = {"message": "same question", "format": "raw"}
+    first = client.post("/api/v1/chat", json=body)
+    second = client.post("/api/v1/chat", json=body)
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["X-Cache-Tier"] == "memory"
+    assert second.json() == first.json()
+
+    bypass = client.post("/api/v1/chat", json=body, headers={"Cache-Control": "no-cache"})
+    assert bypass.headers["X-Cache"] == "MISS"
+    assert provider.calls == 2
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes() -> None:
+    lru = MemoryLRU(max_bytes=1000)
+    for key in ("a", "b", "c"):
+        lru.set(key, CachedResponse(content="x" * 100, provider="p"), ttl=60)
+    lru.get("a")
+    lru.set("d", CachedResponse(content="x" * 100, provider="p"), ttl=60)
+    assert lru.get("b") is None
+    assert lru.get("a") is not None
+    assert lru.size <= 1000
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+from core.config import Settings
+from providers.fake_provider import FakeProvider
+from router_engine.router import achoose_provider_and_respond, choose_provider_and_respond
+
+
+def test_async_route_falls_back_after_failure(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:down", fail=True))
+    provider_registry(FakeProvider("fake:up"))
+    settings_env(primary="fake:down", fallbacks=["fake:up"])
+
+    content, provider = asyncio.run(
+        achoose_provider_and_respond("hi", context_depth=0, output_format="raw")
+    )
+    assert provider == "fake:up"
+    assert content == "[fake:up raw] hi"
+    assert choose_provider_and_respond("hi", context_depth=0, output_format="raw")[1] == "fake:up"
+
+
+def test_async_route_overlaps_slow_calls(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider_registry(FakeProvider("fake:slow", latency=0.2))
+    settings_env(primary="fake:slow", fallbacks=[])
+
+    async def burst() -> None:
+        await asyncio.gather(
+            *(
+                achoose_provider_and_respond("hi", context_depth=0, output_format="raw")
+                for _ in range(500)
+            )
+        )
+
+    start = time.perf_counter()
+    asyncio.run(burst())
+    assert time.perf_counter() - start < 2.0
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections.abc import Callable, Iterator
+
+import httpx
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+from router_engine.router import achoose_provider_and_respond
+from router_engine.scheduler import Overloaded, Ticket, scheduler
+
+
+@pytest.fixture
+def capped(
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Callable[..., Settings]]:
+    for var in ("DATABASE_URL", "REDIS_URL"):
+        monkeypatch.delenv(var, raising=False)
+    provider_registry(FakeProvider("fake:sched-primary", latency=0.1))
+    provider_registry(FakeProvider("fake:sched-backup", latency=0.1))
+    scheduler.reset()
+
+    def configure(**values: object) -> Settings:
+        return settings_env(
+            **{
+                "scheduler_enabled": True,
+                "primary": "fake:sched-primary",
+                "fallbacks": [],
+                "provider_concurrency": {"fake:sched-primary": 1, "fake:sched-backup": 1},
+                "singleflight_enabled": False,
+                **values,
+            }
+        )
+
+    yield configure
+    scheduler.reset()
+
+
+async def _ask(message: str, priority: str = "interactive") -> str:
+    content, provider = await achoose_provider_and_respond(
+        message, context_depth=0, output_format="raw", priority=priority
+    )
+    return provider
+
+
+def test_queued_interactive_requests_jump_ahead_of_batch(capped: Callable[..., Settings]) -> None:
+    capped()
+    finished: list[str] = []
+
+    async def run(name: str, priority: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await _ask(name, priority)
+        finished.append(name)
+
+    async def main() -> dict:
+        tasks = [
+            asyncio.create_task(run("first", "batch", 0)),
+            asyncio.create_task(run("batch", "batch", 0.01)),
+            asyncio.create_task(run("interactive", "interactive", 0.02)),
+        ]
+        await asyncio.sleep(0.05)
+        depth = scheduler.snapshot()["fake:sched-primary"]
+        await asyncio.gather(*tasks)
+        return depth
+
+    depth = asyncio.run(main())
+    assert depth["inflight"] == 1
+    assert depth["queued"] == {"interactive": 1, "batch": 1}
+    assert finished == ["first", "interactive", "batch"]
+
+
+def test_saturated_primary_spills_over_then_rejects_at_the_deadline(
+    capped: Callable[..., Settings],
+) -> None:
+    capped(fallbacks=["fake:sched-backup"], scheduler_queue_timeout={"interactive": 0.03})
+
+    async def main() -> list[object]:
+        return await asyncio.gather(*(_ask(f"m{i}") for i in range(3)), return_exceptions=True)
+
+    first, second, third = asyncio.run(main())
+    assert (first, second) == ("fake:sched-primary", "fake:sched-backup")
+    assert isinstance(third, Overloaded)
+    lanes = scheduler.snapshot()
+    assert lanes["fake:sched-primary"]["rejected"]["timeout"] == 2
+    assert all(lane["inflight"] == 0 for lane in lanes.values())
+
+
+def test_known_slow_queue_is_rejected_without_waiting(capped: Callable[..., Settings]) -> None:
+    capped(scheduler_queue_timeout={"interactive": 0.05})
+
+    async def main() -> tuple[float, Overloaded]:
+        await _ask("warm-up")  # the lane learns calls hold a slot for ~100ms
+        busy = asyncio.create_task(_ask("busy"))
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        with pytest.raises(Overloaded) as exc:
+            await _ask("late")
+        elapsed = time.perf_counter() - started
+        await busy
+        return elapsed, exc.value
+
+    elapsed, exc = asyncio.run(main())
+    assert exc.reason == "deadline" and exc.retry_after >= 0.05
+    assert elapsed < 0.03
+
+
+def test_overloaded_chat_is_a_503_with_retry_after(capped: Callable[..., Settings]) -> None:
+    capped(scheduler_queue_timeout={"interactive": 0.02, "batch": 60})
+    # Hold the primary's only slot for the duration of the request
+    slot = asyncio.run(scheduler.acquire("fake:sched-primary", Ticket.issue("batch")))
+    with TestClient(app) as client:
+        response = client.post("/api/v1/chat", json={"message": "hi", "priority": "interactive"})
+        status = client.get("/api/v1/status/scheduler").json()
+    slot.release()
+    assert response.status_code == 503
+    assert response.json()["reason"] == "timeout"
+    assert int(response.headers["Retry-After"]) >= 1
+    assert status["providers"]["fake:sched-primary"]["rejected"]["timeout"] == 1
+
+
+def test_full_queue_sheds_batch_to_admit_interactive(capped: Callable[..., Settings]) -> None:
+    capped(scheduler_max_queue=1)
+
+    async def main() -> list[object]:
+        busy = asyncio.create_task(_ask("busy", "batch"))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(_ask("queued", "batch"))
+        await asyncio.sleep(0.01)
+        return await asyncio.gather(busy, queued, _ask("urgent"), return_exceptions=True)
+
+    busy, queued, urgent = asyncio.run(main())
+    assert busy == urgent == "fake:sched-primary"
+    assert isinstance(queued, Overloaded) and queued.reason == "full"
+
+
+def test_interactive_chat_never_waits_on_a_coalesced_batch_ticket(
+    capped: Callable[..., Settings],
+) -> None:
+    capped(
+        singleflight_enabled=True,
+        response_cache_ttl=0,
+        scheduler_queue_timeout={"interactive": 5.0, "batch": 0.05},
+    )
+
+    async def main() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+            async def post(message: str, priority: str, delay: float) -> httpx.Response:
+                await asyncio.sleep(delay)
+                body = {"message": message, "format": "raw", "priority": priority}
+                return await client.post("/api/v1/chat", json=body)
+
+            return await asyncio.gather(
+                post("busy", "interactive", 0),
+                post("same", "batch", 0.01),
+                post("same", "interactive", 0.02),
+            )
+
+    busy, batch, interactive = asyncio.run(main())
+    assert busy.status_code == 200
+    # The batch request times out in the queue; the identical interactive one is not
+    # coalesced onto it and is served within its own deadline
+    assert batch.status_code == 503
+    assert interactive.status_code == 200
+    assert interactive.headers["X-Coalesced"] == "false"
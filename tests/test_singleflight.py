@@ -0,0 +1,144 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+
+import fakeredis
+import httpx
+import pytest
+from core.config import Settings
+from main import app
+from providers.fake_provider import FakeProvider
+from router_engine import singleflight
+from router_engine.singleflight import SingleFlight
+
+
+def test_burst_of_identical_chats_shares_one_upstream_call(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider = FakeProvider("fake:hot", latency=0.2)
+    provider_registry(provider)
+    settings_env(primary="fake:hot", fallbacks=[])
+
+    async def burst() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = {"message": "hot prompt", "format": "raw"}
+            return await asyncio.gather(
+                *(client.post("/api/v1/chat", json=body) for _ in range(50))
+            )
+
+    responses = asyncio.run(burst())
+    assert provider.calls == 1
+    assert {r.json()["content"] for r in responses} == {"[fake:hot raw] hot prompt"}
+    assert sum(r.headers["X-Coalesced"] == "true" for r in responses) == 49
+
+
+def test_stream_deltas_fan_out_to_every_waiter(settings_env: Callable[..., Settings]) -> None:
+    settings_env()
+    starts = 0
+
+    async def start() -> tuple[AsyncIterator[str], str]:
+        nonlocal starts
+        starts += 1
+
+        async def deltas() -> AsyncIterator[str]:
+            for word in ("a ", "b ", "c"):
+                await asyncio.sleep(0.01)
+                yield word
+
+        return deltas(), "fake:stream"
+
+    async def consume(flights: SingleFlight) -> str:
+        deltas, provider, _ = await flights.do_stream("k", start)
+        return provider + ":" + "".join([chunk async for chunk in deltas])
+
+    async def run() -> list[str]:
+        flights = SingleFlight()
+        return await asyncio.gather(*(consume(flights) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["fake:stream:a b c"] * 5
+    assert starts == 1
+
+
+def test_distributed_waiter_reads_result_from_other_worker(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings_env(redis_url="redis://stand-in", singleflight_distributed="true")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        singleflight,
+        "get_async_redis",
+        lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+    calls = 0
+
+    async def generate() -> tuple[str, str]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return ("answer", "fake:remote")
+
+    async def run() -> list[tuple[tuple[str, str], bool]]:
+        worker_a, worker_b = SingleFlight(), SingleFlight()
+        lead = asyncio.ensure_future(worker_a.do("k", generate, decode=tuple))
+        await asyncio.sleep(0.05)
+        follow = worker_b.do("k", generate, decode=tuple)
+        return list(await asyncio.gather(lead, follow))
+
+    (lead, lead_shared), (follow, follow_shared) = asyncio.run(run())
+    assert lead == follow == ("answer", "fake:remote")
+    assert (lead_shared, follow_shared) == (False, True)
+    assert calls == 1
+
+
+def test_stream_waiters_beyond_the_limit_make_their_own_call(
+    settings_env: Callable[..., Settings],
+) -> None:
+    settings_env(singleflight_max_waiters=2)
+    starts = 0
+
+    async def start() -> tuple[AsyncIterator[str], str]:
+        nonlocal starts
+        starts += 1
+
+        async def deltas() -> AsyncIterator[str]:
+            await asyncio.sleep(0.05)
+            yield "done"
+
+        return deltas(), "fake:stream"
+
+    async def consume(flights: SingleFlight) -> bool:
+        deltas, _, shared = await flights.do_stream("k", start)
+        assert [chunk async for chunk in deltas] == ["done"]
+        return shared
+
+    async def run() -> list[bool]:
+        flights = SingleFlight()
+        return await asyncio.gather(*(consume(flights) for _ in range(5)))
+
+    shared = asyncio.run(run())
+    assert shared.count(True) == 2
+    assert starts == 3
+
+
+def test_overrunning_leader_does_not_release_a_lock_it_lost(
+    settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    settings_env(
+        redis_url="redis://stand-in", singleflight_distributed="true", singleflight_timeout=0.05
+    )
+    server = fakeredis.FakeServer()
+    redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(singleflight, "get_async_redis", lambda: redis)
+    lock_key = f"{singleflight.PREFIX}:k:lock"
+
+    async def slow() -> tuple[str, str]:
+        await asyncio.sleep(0.1)
+        # The lock expired mid-call and another worker took it
+        await redis.set(lock_key, "other-worker")
+        return ("late", "fake:remote")
+
+    async def run() -> str | None:
+        await SingleFlight().do("k", slow, decode=tuple)
+        return await redis.get(lock_key)
+
+    assert asyncio.run(run()) == "other-worker"
@@ -0,0 +1,86 @@
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import text
+from threadcore import database
+from threadcore.database import db_session, get_engine
+from threadcore.models import Base
+from threadcore.repository import insert_messages
+
+
+@pytest.fixture
+def client(
+    tmp_path: Path, settings_env: Callable[..., Settings], monkeypatch: pytest.MonkeyPatch
+) -> TestClient:
+    for attr in ("_ENGINE", "_SESSION_FACTORY", "_ASYNC"):
+        monkeypatch.setattr(database, attr, None)
+    settings_env(database_url=f"sqlite:///{tmp_path / 'threads.db'}")
+    Base.metadata.create_all(get_engine())
+    return TestClient(app)
+
+
+def _seed(thread_id: UUID, n: int) -> None:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "id": uuid4(),
+            "thread_id": thread_id,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"m{i}",
+            "token_count": 10,
+            # Pairs share a timestamp so the id tiebreak is exercised
+            "created_at": start + timedelta(seconds=i // 2),
+        }
+        for i in range(n)
+    ]
+    with db_session() as s:
+        insert_messages(s, rows)
+
+
+def test_thread_history_pages_back_with_keyset_cursor(client: TestClient) -> None:
+    created = client.post("/api/v1/threads", json={"title": "demo"})
+    assert created.status_code == 201
+    thread_id = created.json()["id"]
+    assert client.get(f"/api/v1/threads/{thread_id}").json()["title"] == "demo"
+    _seed(UUID(thread_id), 25)
+
+    seen: list[str] = []
+    cursor = None
+    while True:
+        params = {"limit": 10, **({"before": cursor} if cursor else {})}
+        page = client.get(f"/api/v1/threads/{thread_id}/messages", params=params).json()
+        seen = [m["created_at"] + m["id"] for m in page["items"]] + seen
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 25 and len(set(seen)) == 25
+    assert seen == sorted(seen)
+
+    window = client.get(f"/api/v1/threads/{thread_id}/messages", params={"max_tokens": 35}).json()
+    # m22/m23 share a timestamp, so only the id tiebreak orders them
+    assert {m["content"] for m in window["items"]} == {"m22", "m23", "m24"}
+
+
+def test_history_query_uses_composite_index(client: TestClient) -> None:
+    _ = client
+    with db_session() as s:
+        plan = s.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT id FROM messages WHERE thread_id = :t "
+                "ORDER BY created_at DESC, id DESC LIMIT 10"
+            ),
+            {"t": uuid4().hex},
+        ).all()
+    assert any("ix_messages_thread_created_id" in str(row) for row in plan)
+
+
+def test_missing_thread_and_bad_cursor(client: TestClient) -> None:
+    assert client.get(f"/api/v1/threads/{uuid4()}").status_code == 404
+    resp = client.get(f"/api/v1/threads/{uuid4()}/messages", params={"before": "%%%"})
+    assert resp.status_code == 400
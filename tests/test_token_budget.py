@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from providers.fake_provider import FakeProvider
+from router_engine.passes import token_budget
+from router_engine.passes.token_budget import (
+    TokenBudgetExceeded,
+    count_tokens,
+    count_tokens_cached,
+    ensure_within_budget,
+    warm_encoders,
+)
+
+
+def test_history_is_trimmed_oldest_first_to_fit() -> None:
+    history = [{"role": "user", "content": f"turn {i} " + "word " * 40} for i in range(10)]
+    budgeted = ensure_within_budget(
+        "question", context_depth=8, system="be brief", history=history, max_tokens=200
+    )
+    assert budgeted.tokens <= 200
+    assert budgeted.history == history[-len(budgeted.history) :]
+    assert 0 < len(budgeted.history) < 8
+    assert budgeted.dropped_turns == 10 - len(budgeted.history)
+
+
+def test_impossible_prompt_is_rejected_before_any_call() -> None:
+    with pytest.raises(TokenBudgetExceeded):
+        ensure_within_budget("word " * 500, context_depth=0, max_tokens=100)
+    assert count_tokens("hello, world 2024!") >= 4
+
+
+def test_chat_returns_413_without_calling_the_provider(
+    settings_env: Callable[..., Settings], provider_registry: Callable[..., None]
+) -> None:
+    provider = FakeProvider("fake:budget")
+    provider_registry(provider)
+    settings_env(primary="fake:budget", fallbacks=[], max_tokens=50)
+
+    resp = TestClient(app).post("/api/v1/chat", json={"message": "word " * 200})
+    assert resp.status_code == 413
+    assert resp.json()["budget"] == 50
+    assert provider.calls == 0
+
+
+class _CharEncoder:
+    def encode(self, text: str, **_kw: Any) -> list[str]:
+        return list(text)
+
+
+def test_tokenizers_load_off_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    loaded_on: list[threading.Thread] = []
+
+    def load(_encoding: str) -> _CharEncoder:
+        loaded_on.append(threading.current_thread())
+        return _CharEncoder()
+
+    monkeypatch.setattr(token_budget, "_LOADED", {})
+    monkeypatch.setattr(token_budget, "_load", load)
+    text = "hello, world"
+    # Nothing loads on the request path: the approximation answers until warm-up ran
+    approximate = count_tokens(text, provider="openai:gpt-4")
+    assert count_tokens_cached(text, "openai:gpt-4") == approximate
+    assert loaded_on == []
+
+    asyncio.run(warm_encoders())
+    assert loaded_on and threading.main_thread() not in loaded_on
+    assert count_tokens(text, provider="openai:gpt-4") == len(text)
+    assert count_tokens_cached(text, "openai:gpt-4") == len(text)
+    count_tokens_cached.cache_clear()
+
+
+def test_failed_tokenizer_load_falls_back_to_the_approximation(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(token_budget, "_LOADED", {})
+    monkeypatch.setattr(token_budget, "_load", lambda _encoding: None)
+    asyncio.run(warm_encoders())
+    assert count_tokens("hello, world 2024!", provider="openai:gpt-4") == count_tokens(
+        "hello, world 2024!"
+    )
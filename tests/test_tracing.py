@@ -0,0 +1,94 @@
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from core.config import Settings
+from fastapi.testclient import TestClient
+from main import app
+from oven import cache, loader, manager
+from providers.fake_provider import FakeProvider
+from sentinel.tracing import trace_buffer
+
+
+@pytest.fixture
+def traced(
+    tmp_path: Path,
+    settings_env: Callable[..., Settings],
+    provider_registry: Callable[..., None],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Callable[..., Settings]]:
+    for var in ("DATABASE_URL", "REDIS_URL"):
+        monkeypatch.delenv(var, raising=False)
+    prompts = tmp_path / "prompts.yaml"
+    prompts.write_text("helper:\n  system: You help with $topic.\n")
+    for attr, value in (("_SEEDED", True), ("_STORE", {}), ("_APPLIED", {})):
+        monkeypatch.setattr(manager, attr, value)
+    loader.clear_parsed_cache()
+    cache.prompt_cache.invalidate()
+    trace_buffer.clear()
+    provider_registry(FakeProvider("fake:traced-down", fail=True))
+    provider_registry(FakeProvider("fake:traced-up"))
+
+    def configure(**values: object) -> Settings:
+        return settings_env(
+            prompts_file=str(prompts),
+            primary="fake:traced-down",
+            fallbacks=["fake:traced-up"],
+            **values,
+        )
+
+    yield configure
+    cache.prompt_cache.invalidate()
+    trace_buffer.clear()
+
+
+def _timings(header: str) -> list[str]:
+    return [entry.strip() for entry in header.split(",")]
+
+
+def test_server_timing_lists_each_stage_and_provider_attempt(
+    traced: Callable[..., Settings],
+) -> None:
+    traced()
+    body = {"message": "hi", "prompt_name": "helper", "prompt_vars": {"topic": "maths"}}
+    with TestClient(app) as client:
+        first = client.post("/api/v1/chat", json=body)
+        second = client.post("/api/v1/chat", json=body)
+    assert first.status_code == 200
+    entries = _timings(first.headers["server-timing"])
+    names = [e.split(";")[0] for e in entries]
+    assert names[:3] == ["prompt_lookup", "oven.db", "oven.file"]
+    assert 'desc="file"' in entries[0]
+    assert {"compile", "budget", "total"} <= set(names)
+    attempts = [e for e in entries if e.startswith("provider_call")]
+    assert 'desc="fake:traced-down error"' in attempts[0]
+    assert 'desc="fake:traced-up ok"' in attempts[1]
+    # The second lookup is served by the in-process cache
+    assert 'desc="memory"' in _timings(second.headers["server-timing"])[0]
+
+
+def test_slow_requests_are_buffered_and_exported_as_otlp(
+    traced: Callable[..., Settings],
+) -> None:
+    traced(trace_slow_ms=0)
+    with TestClient(app) as client:
+        client.post("/api/v1/chat", json={"message": "hi", "stream": True})
+        listing = client.get("/api/v1/status/traces").json()
+        otlp = client.get("/api/v1/status/traces", params={"format": "otlp"}).json()
+
+    trace = listing["traces"][0]
+    assert trace["name"] == "POST /api/v1/chat" and trace["status"] == 200
+    # Streams finish their trace after the last chunk, so formatting is included
+    assert [s["name"] for s in trace["spans"]][-1] == "format"
+    exported = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = next(s for s in exported if s["name"] == "POST /api/v1/chat")
+    children = [s for s in exported if s["traceId"] == root["traceId"] and s is not root]
+    assert [s["name"] for s in children] == [s["name"] for s in trace["spans"]]
+    assert all(s["parentSpanId"] == root["spanId"] for s in children)
+
+
+def test_fast_requests_are_not_kept_unless_sampled(traced: Callable[..., Settings]) -> None:
+    traced(trace_slow_ms=60_000, trace_sample_rate=0)
+    with TestClient(app) as client:
+        client.post("/api/v1/chat", json={"message": "hi"})
+        assert client.get("/api/v1/status/traces").json()["traces"] == []